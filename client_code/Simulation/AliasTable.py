@@ -0,0 +1,163 @@
+class AliasTable:
+  '''Walker alias table for drawing from a discrete distribution in constant time.
+
+  Each outcome has a column which is split between the outcome itself
+  and one alias outcome, so a draw only needs one random column
+  and one comparison
+
+  Attributes
+  ----------
+  weights : List[float]
+    The probability of each outcome
+  probability : List[float]
+    The probability of keeping the outcome of each column instead of its alias
+  alias : List[int]
+    The alias outcome of each column
+
+  Methods
+  -------
+  __init__(weights)
+    Builds the table for a list of weights
+  fromCumulative(cumulative, size)
+    Builds the table for a list of cumulative probabilities
+  weightsFromCumulative(cumulative, size)
+    Finds the weight of each outcome from a list of cumulative probabilities
+  draw(rng)
+    Draws one outcome
+  sample(rng, count)
+    Draws many outcomes with numpy
+  '''
+
+  def __init__(self, weights):
+    '''Builds the table for a list of weights.
+
+    Parameters
+    ----------
+    weights : List[float]
+      The weight of each outcome, which do not have to add up to one
+
+    Returns
+    -------
+    None
+    '''
+
+    total = sum(weights)
+    if total <= 0:
+      raise ValueError('The weights of an alias table must have a positive sum')
+
+    # Scale the weights so that the average column is full
+    outcomeCount = len(weights)
+    self.weights = [weight / total for weight in weights]
+    scaled = [weight * outcomeCount for weight in self.weights]
+    self.probability = [1.0] * outcomeCount
+    self.alias = list(range(outcomeCount))
+
+    # Fill each column which is not full with an outcome which overflows
+    small = [outcome for outcome in range(outcomeCount) if scaled[outcome] < 1]
+    large = [outcome for outcome in range(outcomeCount) if scaled[outcome] >= 1]
+    while small and large:
+      smallOutcome = small.pop()
+      largeOutcome = large.pop()
+      self.probability[smallOutcome] = scaled[smallOutcome]
+      self.alias[smallOutcome] = largeOutcome
+      scaled[largeOutcome] -= 1 - scaled[smallOutcome]
+      if scaled[largeOutcome] < 1:
+        small.append(largeOutcome)
+      else:
+        large.append(largeOutcome)
+
+  @staticmethod
+  def fromCumulative(cumulative, size):
+    '''Builds the table for a list of cumulative probabilities.
+
+    Parameters
+    ----------
+    cumulative : List[float]
+      The cumulative probability of each outcome
+    size : int
+      The number of outcomes in the table, such as the number of cells in the grid
+
+    Returns
+    -------
+    AliasTable
+      The table for the first outcomes
+    '''
+
+    return AliasTable(AliasTable.weightsFromCumulative(cumulative, size))
+
+  @staticmethod
+  def weightsFromCumulative(cumulative, size):
+    '''Finds the weight of each outcome from a list of cumulative probabilities.
+
+    Only the first outcomes are kept, which gives the same distribution
+    as drawing again whenever an outcome outside the table is drawn
+
+    Parameters
+    ----------
+    cumulative : List[float]
+      The cumulative probability of each outcome
+    size : int
+      The number of outcomes to keep
+
+    Returns
+    -------
+    List[float]
+      The weight of each of the first outcomes
+    '''
+
+    cumulative = list(cumulative[:size])
+    weights = [
+      probability - previous
+      for previous, probability in zip([0] + cumulative[:-1], cumulative)
+    ]
+
+    return weights + [0] * (size - len(weights))
+
+  def draw(self, rng):
+    '''Draws one outcome.
+
+    Parameters
+    ----------
+    rng : random.Random
+      The random number generator used for the draw
+
+    Returns
+    -------
+    int
+      The outcome
+    '''
+
+    # The integer part picks the column and the fraction picks the outcome in it
+    column = rng.random() * len(self.probability)
+    outcome = int(column)
+    if column - outcome < self.probability[outcome]:
+      return outcome
+
+    return self.alias[outcome]
+
+  def sample(self, rng, count):
+    '''Draws many outcomes with numpy.
+
+    Parameters
+    ----------
+    rng : numpy.random.Generator
+      The random number generator used for the draws
+    count : int
+      The number of outcomes to draw
+
+    Returns
+    -------
+    numpy.ndarray[int]
+      The outcomes
+    '''
+
+    # Numpy is not available on the client, so it is only imported here
+    import numpy as np
+
+    column = rng.random(count) * len(self.probability)
+    outcome = column.astype(np.int64)
+    return np.where(
+      column - outcome < np.asarray(self.probability)[outcome],
+      outcome,
+      np.asarray(self.alias, dtype = np.int64)[outcome]
+    )
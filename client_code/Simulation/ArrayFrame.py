@@ -0,0 +1,134 @@
+import numpy as np
+
+class ArrayFrame:
+  '''Stores information about each frame in the array engine.
+
+  Like Frame, each frame copies the lockdowns of the previous frame,
+  so the lockdowns of a frame which is kept do not change
+
+  Attributes
+  ----------
+  population : Population
+    The columns of the agents in the simulation
+  isLockedDown : numpy.ndarray[bool]
+    Whether each cell is under lockdown, with the cells numbered row by row like in the object engine
+  stateCounts : List[int]
+    The number of people in each state at the start of the frame
+  effectiveReproductionNumber : float
+    Effective reproduction number of the disease (Re)
+  averageContacts : float
+    Average number of susceptible contacts per infected person
+  reproductiveSum : int
+    Number of agents infected by agents that have stopped being infected
+  contactSum : int
+    Number of susceptible agents contacted by infected agents
+  removedAgents : int
+    Number of infected agents that have recovered / died
+  doublingTime : float
+    Time it takes for the disease to double (Td)
+  hospitalOccupancy : float
+    Percentage of the population that is in the hospital
+  peakInfection : int
+    Maximum infected patients till the current frame
+  agentsTouched : int
+    Number of agents moved or changed to another state in the frame
+  contactsTested : int
+    Number of pairs of susceptible and infected agents checked for contact in the frame
+  infectionsDrawn : int
+    Number of random draws of whether a contact spreads the disease in the frame
+
+  Methods
+  -------
+  __init__(population, params, stateCounts, previous)
+    Initializes the ArrayFrame object with some properties
+  members(state)
+    Finds the people in a state
+  snapshot()
+    Copies the positions, homes and states of the people and the lockdowns
+  '''
+
+  def __init__(self, population, params, stateCounts, previous = None):
+    '''Sets some initial parameters for the frame.
+
+    Parameters
+    ----------
+    population : Population
+      The columns of the agents in the simulation
+    params : Params
+      The parameters of the simulation
+    stateCounts : numpy.ndarray[int]
+      The number of people in each state, kept up to date by the simulation
+    previous : ArrayFrame
+      The previous frame, whose lockdowns are copied, or None to start with no lockdowns
+
+    Returns
+    -------
+    None
+    '''
+
+    self.population = population
+    if previous is None:
+      self.isLockedDown = np.zeros(params.GRID_SIZE * params.GRID_SIZE, dtype = bool)
+    else:
+      self.isLockedDown = previous.isLockedDown.copy()
+    self.stateCounts = stateCounts.tolist()
+
+    # Initialize metrics
+    self.effectiveReproductionNumber = 0
+    self.averageContacts = 0
+    self.reproductiveSum = 0
+    self.contactSum = 0
+    self.removedAgents = 0
+    self.doublingTime = 0
+    self.hospitalOccupancy = 0
+    self.peakInfection = 0
+    self.agentsTouched = 0
+    self.contactsTested = 0
+    self.infectionsDrawn = 0
+
+  def members(self, state):
+    '''Finds the people in a state.
+
+    Parameters
+    ----------
+    state : Person.State
+      The state
+
+    Returns
+    -------
+    numpy.ndarray[int]
+      The indices of the people who are currently in the state
+    '''
+
+    return np.flatnonzero(self.population.state == state.id)
+
+  def snapshot(self):
+    '''Copies the positions, homes and states of the people and the lockdowns.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    x : List[float]
+      The x coordinate of each person, by index
+    y : List[float]
+      The y coordinate of each person, by index
+    homeX : List[float]
+      The x coordinate of the home of each person, by index
+    homeY : List[float]
+      The y coordinate of the home of each person, by index
+    states : List[int]
+      The id of the state of each person, by index
+    isLockedDown : List[bool]
+      Whether each cell is under lockdown, numbered row by row
+    '''
+
+    return (
+      self.population.x.tolist(),
+      self.population.y.tolist(),
+      self.population.homeX.tolist(),
+      self.population.homeY.tolist(),
+      self.population.state.tolist(),
+      self.isLockedDown.tolist()
+    )
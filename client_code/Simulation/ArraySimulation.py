@@ -0,0 +1,915 @@
+import numpy as np
+
+from ArrayFrame import ArrayFrame # type: ignore
+from ContactIndex import ContactIndex # type: ignore
+from EventCalendar import EventCalendar # type: ignore
+from Person import Person # type: ignore
+from Params import Params # type: ignore
+from Population import Population # type: ignore
+from Simulation import Simulation # type: ignore
+
+class ArraySimulation(Simulation):
+  '''Simulation which stores the population as numpy columns.
+
+  The array engine runs the same model as the object engine,
+  but every phase of a frame is a whole-array operation over the
+  columns of a Population instead of a loop over Person objects
+
+  Attributes
+  ----------
+  rng : numpy.random.Generator
+    The random number generator of the simulation
+  frameCount : int
+    The number of the frame which is being calculated
+  residents : numpy.ndarray[int]
+    The number of people whose home is in each cell
+  infectedResidents : numpy.ndarray[int]
+    The number of infected people whose home is in each cell, updated by every transition
+  stateCounts : numpy.ndarray[int]
+    The number of people in each state, updated by every transition
+  cellOrder : numpy.ndarray[int]
+    The index of every agent, sorted by the home cell of the agent
+  travelStart : numpy.ndarray[int]
+    The position of the first destination of each cell in the travel arrays,
+    and the number of destinations at the end
+  travelOrigins : numpy.ndarray[int]
+    The origin cell of each destination in the travel arrays
+  travelDestinations : numpy.ndarray[int]
+    The destinations of each cell where people can live, after each other
+  travelWeights : numpy.ndarray[float]
+    The probability of travelling to each destination from its origin cell
+  travelCumulative : numpy.ndarray[float]
+    The origin cell of each destination plus the cumulative probability of its origin cell
+  periods : Dict[int, int]
+    The number of frames people spend in each timed state
+  calendars : Dict[int, EventCalendar]
+    The indices of the people in each timed state by the frame in which their time runs out
+
+  Methods
+  -------
+  getEngineState(frame)
+    Finds the state of the population and the random number generator
+  setEngineState(state, columns)
+    Restores the population and the random number generator
+  createAliasTables()
+    Creates the tables and weights for drawing random cells
+  createCalendars()
+    Creates empty event calendars for the timed states
+  createPopulation()
+    Allocates the columns of the population
+  createFirstFrame()
+    Creates the population and the first frame of the simulation
+  nextFrame(frame)
+    Calculates the next frame of the simulation
+  advanceFrame(frame)
+    Calculates the next frame of the simulation in the current frame
+  countStates(frame)
+    Finds the current number of people in each state
+  sampleWithoutReplacement(groupStart, groupSize, sampleSize)
+    Picks distinct random positions in each group of a grouped array
+  drawDestinations(origins, isLockedDown)
+    Draws the destination of people travelling from some cells
+  schedule(state, agents, frameCount)
+    Schedules the end of the time of people in a timed state
+  due(frame, state)
+    Finds the people whose time in a timed state runs out in the current frame
+  movePeople(frame)
+    Moves the people around
+  vaccinate(frame)
+    Finds out who is vaccinated
+  lockdown(frame, frameCount)
+    Lockdown cells in the grid
+  findExposed(frame)
+    Finds out who will be exposed to the virus
+  findInfected(frame)
+    Finds out who will be infected
+  findRemoved(frame)
+    Finds out who will be recovered / dead
+  findSusceptible(frame)
+    Finds out who loses immunity
+  '''
+
+  # The maximum number of candidate contacts which are checked at once by the sweep
+  CONTACT_CHUNK_SIZE = 1 << 20
+
+  def getEngineState(self, frame):
+    '''Find the state of the population and the random number generator.
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    state : Dict
+      The lockdowns, the state of the random number generator
+      and the size of each bucket of the event calendars
+    columns : Dict[str, numpy.ndarray]
+      The columns of the population and the agents in each event calendar
+    '''
+
+    columns = {name: getattr(frame.population, name) for name in Population.COLUMNS}
+
+    # The agents of a bucket are checked together, so each bucket is saved as one array
+    calendarSizes = {}
+    for stateID, calendar in self.calendars.items():
+      buckets = [
+        np.concatenate(bucket) if bucket else np.empty(0, dtype = np.int64)
+        for bucket in calendar.buckets
+      ]
+      columns[f'calendar{stateID}'] = np.concatenate(buckets)
+      calendarSizes[stateID] = [bucket.size for bucket in buckets]
+
+    return {
+      'isLockedDown': frame.isLockedDown.tolist(),
+      'rngState': self.rng.bit_generator.state,
+      'calendarSizes': calendarSizes
+    }, columns
+
+  def setEngineState(self, state, columns):
+    '''Restore the population and the random number generator.
+
+    Parameters
+    ----------
+    state : Dict
+      The lockdowns, the state of the random number generator
+      and the size of each bucket of the event calendars
+    columns : Dict[str, numpy.ndarray]
+      The columns of the population and the agents in each event calendar
+
+    Returns
+    -------
+    ArrayFrame
+      The current frame of the simulation
+    '''
+
+    self.rng = np.random.default_rng()
+    self.rng.bit_generator.state = state['rngState']
+    self.createAliasTables()
+
+    # Copy the columns out of the checkpoint file
+    population = self.createPopulation()
+    for name in Population.COLUMNS:
+      getattr(population, name)[:] = columns[name]
+    self.residents = np.bincount(population.cell, minlength = self.params.GRID_SIZE ** 2)
+    self.cellOrder = np.argsort(population.cell, kind = 'stable')
+    self.stateCounts = np.bincount(population.state, minlength = len(Person.states))
+    self.infectedResidents = np.bincount(
+      population.cell[population.state == Person.INFECTED.id],
+      minlength = self.residents.size
+    )
+
+    # Restore the buckets of the event calendars
+    self.createCalendars()
+    for stateID, calendar in self.calendars.items():
+      events = columns[f'calendar{stateID}']
+      start = 0
+      for bucket, size in enumerate(state['calendarSizes'][str(stateID)]):
+        if size > 0:
+          calendar.buckets[bucket] = [np.array(events[start:start + size])]
+        start += size
+
+    frame = ArrayFrame(population, self.params, self.stateCounts)
+    # Earlier checkpoints saved the lockdowns as rows of the grid
+    frame.isLockedDown[:] = np.ravel(state['isLockedDown'])
+    return frame
+
+  def createAliasTables(self):
+    '''Create the tables and weights for drawing random cells.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    Simulation.createAliasTables(self)
+
+    # Store the destinations of the cells where people can live as sparse rows
+    origins = [cell for cell, weight in enumerate(self.travelModel.cellWeights) if weight > 0]
+    (
+      self.travelStart,
+      self.travelDestinations,
+      self.travelWeights,
+      self.travelCumulative
+    ) = self.travelModel.toArrays(origins)
+    self.travelOrigins = np.repeat(np.arange(self.travelStart.size - 1), np.diff(self.travelStart))
+
+  def createCalendars(self):
+    '''Create empty event calendars for the timed states.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    self.periods = {
+      Person.EXPOSED.id: self.params.INCUBATION_PERIOD,
+      Person.INFECTED.id: self.params.INFECTION_PERIOD,
+      Person.RECOVERED.id: self.params.IMMUNITY_PERIOD,
+      Person.VACCINATED.id: self.params.IMMUNITY_PERIOD
+    }
+    self.calendars = {
+      stateID: EventCalendar(period + 1) for stateID, period in self.periods.items()
+    }
+
+  def createPopulation(self):
+    '''Allocate the columns of the population.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    Population
+      The population, with no agents placed yet
+    '''
+
+    return Population(self.params.POPULATION_SIZE)
+
+  def createFirstFrame(self):
+    '''Create the population and the first frame of the simulation.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    ArrayFrame
+      The first frame of the simulation
+    '''
+
+    self.rng = np.random.default_rng(self.params.RANDOM_SEED)
+    self.frameCount = 0
+    gridSize = self.params.GRID_SIZE
+    cellCount = gridSize * gridSize
+    self.createAliasTables()
+
+    # Intialize the population with people and whether they follow rules
+    population = self.createPopulation()
+    population.cell[:] = self.cellTable.sample(self.rng, population.size)
+    cellRow = population.cell // gridSize
+    cellCol = population.cell % gridSize
+    population.homeX[:] = self.params.CELL_SIZE * cellCol + self.rng.random(population.size) / gridSize
+    population.homeY[:] = self.params.CELL_SIZE * cellRow + self.rng.random(population.size) / gridSize
+    population.x[:] = population.homeX
+    population.y[:] = population.homeY
+    population.followsRules[:] = self.rng.random(population.size) < self.params.RULE_COMPLIANCE_RATE
+    population.age[:] = np.searchsorted(
+      self.params.POPULATION_DEMOGRAPHICS,
+      self.rng.random(population.size)
+    )
+    self.residents = np.bincount(population.cell, minlength = cellCount)
+    self.cellOrder = np.argsort(population.cell, kind = 'stable')
+
+    # There are some people who are exposed or vaccinated at the beginning
+    chosen = self.rng.choice(
+      population.size,
+      self.params.INITIAL_INFECTED + self.params.INITIAL_VACCINATED,
+      replace = False
+    )
+    population.state[chosen[:self.params.INITIAL_INFECTED]] = Person.EXPOSED.id
+    population.state[chosen[self.params.INITIAL_INFECTED:]] = Person.VACCINATED.id
+    self.stateCounts = np.bincount(population.state, minlength = len(Person.states))
+    self.infectedResidents = np.zeros(cellCount, dtype = np.int64)
+
+    # Schedule the end of the time of the people in timed states
+    self.createCalendars()
+    self.schedule(Person.EXPOSED, chosen[:self.params.INITIAL_INFECTED], 0)
+    self.schedule(Person.VACCINATED, chosen[self.params.INITIAL_INFECTED:], 0)
+
+    return ArrayFrame(population, self.params, self.stateCounts)
+
+  def nextFrame(self, frame):
+    '''Calculate the next frame of the simulation.
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    ArrayFrame
+      The next frame in the simulation
+    '''
+
+    # Calculate the next frame in a new frame, so that the current frame
+    # and its lockdowns stay as they were when it was yielded
+    res = ArrayFrame(frame.population, self.params, self.stateCounts, frame)
+    res.effectiveReproductionNumber = frame.effectiveReproductionNumber
+    res.averageContacts = frame.averageContacts
+    res.doublingTime = frame.doublingTime
+    res.hospitalOccupancy = frame.hospitalOccupancy
+    res.peakInfection = frame.peakInfection
+    self.advanceFrame(res)
+
+    # Return the next frame with the state counts at its end
+    res.stateCounts = self.countStates(res)
+    return res
+
+  def advanceFrame(self, frame):
+    '''Calculate the next frame of the simulation in the current frame.
+
+    The people, lockdowns and metrics of the frame are updated,
+    but its state counts stay those of the start of the frame
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    self.frameCount += 1
+    profiler = self.profiler
+    frame.agentsTouched = 0
+    frame.contactsTested = 0
+    frame.infectionsDrawn = 0
+
+    # Move agents
+    if profiler is not None:
+      profiler.lap('movePeople', self, frame)
+    self.movePeople(frame)
+
+    # Initialize metrics
+    frame.effectiveReproductionNumber = 0
+    frame.reproductiveSum = 0
+    frame.contactSum = 0
+    frame.removedAgents = 0
+    frame.doublingTime = 0
+    frame.hospitalOccupancy = 0
+
+    # Run different intervention functions if they are enabled
+    if profiler is not None:
+      profiler.lap('vaccinate', self, frame)
+    if (self.params.VACCINATION_ENABLED and
+        len(self.infectionCountList) >= self.params.VACCINATION_START):
+      self.interventionCost += self.vaccinate(frame)
+    if profiler is not None:
+      profiler.lap('lockdown', self, frame)
+    if self.params.LOCKDOWN_ENABLED:
+      self.interventionCost += self.lockdown(frame, len(self.infectionCountList))
+
+    # Find which agents can transition between infection states
+    # Timed transitions are found from the event calendars
+    if profiler is not None:
+      profiler.lap('findExposed', self, frame)
+    self.interventionCost += self.findExposed(frame)
+    if profiler is not None:
+      profiler.lap('findInfected', self, frame)
+    self.findInfected(frame)
+    if profiler is not None:
+      profiler.lap('findRemoved', self, frame)
+    self.findRemoved(frame)
+    if profiler is not None:
+      profiler.lap('findSusceptible', self, frame)
+    self.findSusceptible(frame)
+
+    # Add to hospitalization cost
+    if profiler is not None:
+      profiler.lap('updateMetrics', self, frame)
+    self.interventionCost += round(
+      frame.stateCounts[Person.INFECTED.id] *
+      self.params.HOSPITALIZATION_COST *
+      self.params.HOSPITALIZATION_RATE
+    )
+
+    # Calculate metrics
+    self.updateMetrics(frame, frame.stateCounts[Person.INFECTED.id])
+    if profiler is not None:
+      profiler.lap(None, self, frame)
+
+  def countStates(self, frame):
+    '''Finds the current number of people in each state.
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    List[int]
+      The number of people in each state
+    '''
+
+    return self.stateCounts.tolist()
+
+  def sampleWithoutReplacement(self, groupStart, groupSize, sampleSize):
+    '''Picks distinct random positions in each group of a grouped array
+
+    Parameters
+    ----------
+    groupStart : numpy.ndarray[int]
+      The position at which each group starts
+    groupSize : numpy.ndarray[int]
+      The number of elements in each group
+    sampleSize : numpy.ndarray[int]
+      The number of positions to pick from each group (at most its size)
+
+    Returns
+    -------
+    numpy.ndarray[int]
+      The picked positions, ordered by group
+    '''
+
+    # Pick positions with replacement and then pick the repeated positions again
+    # The number of repeats is small when few elements of each group are picked
+    group = np.repeat(np.arange(groupSize.size), sampleSize)
+    positions = groupStart[group] + self.rng.integers(0, groupSize[group])
+    while True:
+      _, firstPositions = np.unique(positions, return_index = True)
+      repeated = np.ones(positions.size, dtype = bool)
+      repeated[firstPositions] = False
+      repeated = np.flatnonzero(repeated)
+      if repeated.size == 0:
+        return positions
+      positions[repeated] = groupStart[group[repeated]] + self.rng.integers(
+        0, groupSize[group[repeated]]
+      )
+
+  def schedule(self, state, agents, frameCount):
+    '''Schedules the end of the time of people in a timed state
+
+    Parameters
+    ----------
+    state : Person.State
+      The timed state
+    agents : numpy.ndarray[int]
+      The indices of the people who entered the state
+    frameCount : int
+      The frame in which the people entered the state
+
+    Returns
+    -------
+    None
+    '''
+
+    if agents.size > 0:
+      self.calendars[state.id].schedule(agents, frameCount + self.periods[state.id])
+
+  def due(self, frame, state):
+    '''Finds the people whose time in a timed state runs out in the current frame
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+    state : Person.State
+      The timed state
+
+    Returns
+    -------
+    numpy.ndarray[int]
+      The sorted indices of the people whose time in the state runs out
+    '''
+
+    events = self.calendars[state.id].pop(self.frameCount)
+    if not events:
+      return np.empty(0, dtype = np.int64)
+
+    # Skip people who have left the state since they were scheduled
+    population = frame.population
+    agents = np.unique(np.concatenate(events))
+    return agents[
+      (population.state[agents] == state.id) &
+      (population.stateFrame[agents] == self.frameCount - self.periods[state.id])
+    ]
+
+  def movePeople(self, frame):
+    '''Move the people around
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    population = frame.population
+    gridSize = self.params.GRID_SIZE
+    isLockedDown = frame.isLockedDown
+
+    # Find the number of cells not under lockdown
+    # and the cells from which people can travel
+    cellsToTravelTo = isLockedDown.size - np.count_nonzero(isLockedDown)
+    canTravel = cellsToTravelTo - (~isLockedDown) > 0
+
+    # Dead people do not move
+    # Group the people who can travel by their home cell
+    alive = population.state != Person.DEAD.id
+    frame.agentsTouched += np.count_nonzero(alive)
+    eligible = self.cellOrder[
+      alive[self.cellOrder] & canTravel[population.cell[self.cellOrder]]
+    ]
+    eligibleCount = np.bincount(population.cell[eligible], minlength = isLockedDown.size)
+    eligibleStart = np.cumsum(eligibleCount) - eligibleCount
+
+    # Find the number of people who travel from each cell and pick them
+    travellers = eligible[self.sampleWithoutReplacement(
+      eligibleStart,
+      eligibleCount,
+      self.rng.binomial(eligibleCount, self.params.TRAVEL_RATE)
+    )]
+    travelling = np.zeros(population.size, dtype = bool)
+    travelling[travellers] = True
+
+    # People who follow rules cannot travel under travel restrictions
+    # They stay where they are and the cost is updated
+    travelWeights = self.travelWeights
+    lockedDestinations = None
+    if self.params.TRAVEL_RESTRICTIONS_ENABLED:
+      restricted = travellers[population.followsRules[travellers]]
+      travellers = travellers[~population.followsRules[travellers]]
+      population.visiting[restricted] = -1
+      self.interventionCost += self.params.TRAVEL_RESTRICTIONS_COST * restricted.size
+
+      # People cannot travel to cells under lockdown
+      lockedDestinations = isLockedDown
+      travelWeights = travelWeights * ~isLockedDown[self.travelDestinations]
+
+    # People from cells with no destination left stay at home
+    travelTotal = np.bincount(self.travelOrigins, weights = travelWeights, minlength = isLockedDown.size)
+    blocked = travelTotal <= 0
+    if blocked.any():
+      travelling[travellers[blocked[population.cell[travellers]]]] = False
+      travellers = travellers[~blocked[population.cell[travellers]]]
+
+    # Draw the destination of each traveller from the destinations of their home cell
+    destinations = self.drawDestinations(population.cell[travellers], lockedDestinations)
+
+    # The people who travel go to a random position in the new cell
+    population.visiting[travellers] = destinations
+    population.x[travellers] = self.params.CELL_SIZE * (
+      destinations % gridSize + self.rng.random(travellers.size)
+    )
+    population.y[travellers] = self.params.CELL_SIZE * (
+      destinations // gridSize + self.rng.random(travellers.size)
+    )
+
+    # The people who do not travel reset their location to home
+    staying = np.flatnonzero(alive & ~travelling)
+    population.visiting[staying] = -1
+    population.x[staying] = population.homeX[staying]
+    population.y[staying] = population.homeY[staying]
+
+    # Change the position of the people who are free to move by a random amount
+    # and keep them inside their home cell
+    moving = staying[
+      ~population.followsRules[staying] | ~isLockedDown[population.cell[staying]]
+    ]
+    cells = population.cell[moving]
+    xMin = (cells % gridSize) * self.params.CELL_SIZE
+    yMin = (cells // gridSize) * self.params.CELL_SIZE
+    population.x[moving] = np.clip(
+      population.x[moving] + self.rng.uniform(
+        -self.params.MAX_MOVEMENT, self.params.MAX_MOVEMENT, moving.size
+      ),
+      xMin,
+      xMin + self.params.CELL_SIZE
+    )
+    population.y[moving] = np.clip(
+      population.y[moving] + self.rng.uniform(
+        -self.params.MAX_MOVEMENT, self.params.MAX_MOVEMENT, moving.size
+      ),
+      yMin,
+      yMin + self.params.CELL_SIZE
+    )
+
+  def drawDestinations(self, origins, isLockedDown):
+    '''Draws the destination of people travelling from some cells.
+
+    Each destination is found by a binary search of the cumulative probabilities
+    of the origin cell, and destinations under lockdown are drawn again
+
+    Parameters
+    ----------
+    origins : numpy.ndarray[int]
+      The origin cell of each person, which has a destination which is not under lockdown
+    isLockedDown : numpy.ndarray[bool]
+      Whether each cell is under lockdown, or None if people can travel to any cell
+
+    Returns
+    -------
+    numpy.ndarray[int]
+      The destination of each person
+    '''
+
+    destinations = np.zeros(origins.size, dtype = np.int64)
+    remaining = np.arange(origins.size)
+    while remaining.size > 0:
+      # The cumulative probabilities of each origin cell go from the cell to the next cell
+      # Rounding can reach the next cell, so the position is kept in the row
+      position = np.searchsorted(
+        self.travelCumulative,
+        origins[remaining] + self.rng.random(remaining.size),
+        'right'
+      )
+      position = np.minimum(position, self.travelStart[origins[remaining] + 1] - 1)
+      destinations[remaining] = self.travelDestinations[position]
+
+      if isLockedDown is None:
+        break
+      remaining = remaining[isLockedDown[destinations[remaining]]]
+
+    return destinations
+
+  def vaccinate(self, frame):
+    '''Find out who is vaccinated
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    int
+      Cost of the vaccinations in the frame
+    '''
+
+    # Find out which susceptible people are vaccinated
+    # Either draw the number of vaccinations and pick that many people,
+    # or draw for each person
+    population = frame.population
+    susceptible = np.flatnonzero(population.state == Person.SUSCEPTIBLE.id)
+    if self.params.VACCINATION_SAMPLING == 'skip':
+      vaccinationRate = min(max(self.params.VACCINATION_RATE, 0), 1)
+      vaccinated = np.sort(self.rng.choice(
+        susceptible,
+        self.rng.binomial(susceptible.size, vaccinationRate),
+        replace = False
+      ))
+    elif self.params.VACCINATION_SAMPLING == 'bernoulli':
+      vaccinated = susceptible[
+        self.rng.random(susceptible.size) < self.params.VACCINATION_RATE
+      ]
+    else:
+      raise ValueError(f'Unknown vaccination sampling: {self.params.VACCINATION_SAMPLING}')
+
+    # Vaccination happens before the timers of the frame start,
+    # so the vaccinated people enter their state in the previous frame
+    population.state[vaccinated] = Person.VACCINATED.id
+    population.stateFrame[vaccinated] = self.frameCount - 1
+    self.schedule(Person.VACCINATED, vaccinated, self.frameCount - 1)
+    self.stateCounts[Person.SUSCEPTIBLE.id] -= vaccinated.size
+    self.stateCounts[Person.VACCINATED.id] += vaccinated.size
+    frame.agentsTouched += vaccinated.size
+
+    # Return cost
+    return vaccinated.size * self.params.VACCINATION_COST
+
+  def lockdown(self, frame, frameCount):
+    '''Find out which cells are under lockdown
+
+    Each cell is under lockdown if its infected population
+    is greater than a certain percentage
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+    frameCount : int
+      The current frame count of the simulation
+
+    Returns
+    -------
+    int
+      Cost of the lockdown of cells in the frame
+    '''
+
+    isLockedDown = frame.isLockedDown
+    if self.params.LOCAL_LOCKDOWN:
+      # Find the fraction of infected people in each cell
+      infectedFraction = np.divide(
+        self.infectedResidents,
+        self.residents,
+        out = np.zeros(self.residents.size),
+        where = self.residents > 0
+      )
+      isLockedDown[:] = (self.residents > 0) & (infectedFraction >= self.params.LOCKDOWN_LEVEL)
+    else:
+      # For global lockdowns, read the compiled schedule
+      isLockedDown[:] = self.params.LOCKDOWN_DAYS[frameCount]
+
+    # Return cost
+    return (
+      self.params.LOCKDOWN_COST *
+      self.params.RULE_COMPLIANCE_RATE *
+      int(self.residents[isLockedDown].sum())
+    )
+
+  def findExposed(self, frame):
+    '''Find out who will be exposed to the virus next
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    int
+      Cost of hygiene measures if enabled
+    '''
+
+    population = frame.population
+    susceptible = np.flatnonzero(population.state == Person.SUSCEPTIBLE.id)
+    infected = np.flatnonzero(population.state == Person.INFECTED.id)
+    if susceptible.size == 0 or infected.size == 0:
+      return 0
+
+    # Find the pairs of agents in contact
+    contactIndex = ContactIndex(
+      population,
+      susceptible,
+      infected,
+      population.activeCell(),
+      self.params
+    )
+    infected = contactIndex.infected
+    contacted = np.zeros(infected.size, dtype = np.int64)
+    infections = np.zeros(infected.size, dtype = np.int64)
+    isLockedDown = frame.isLockedDown
+    cost = 0
+    for pairInfected, pairSusceptible in contactIndex.findContacts(
+        self.params.CONTACT_INDEX, self.CONTACT_CHUNK_SIZE):
+      infectedAgent = infected[pairInfected]
+      susceptibleAgent = contactIndex.susceptible[pairSusceptible]
+      frame.contactsTested += pairInfected.size
+
+      # Check for lockdown
+      bothFollowRules = (
+        population.followsRules[infectedAgent] & population.followsRules[susceptibleAgent]
+      )
+      inContact = ~(isLockedDown[contactIndex.activeCell[infectedAgent]] & bothFollowRules)
+      pairInfected = pairInfected[inContact]
+      susceptibleAgent = susceptibleAgent[inContact]
+      bothFollowRules = bothFollowRules[inContact]
+
+      # Find which contacts spread the disease
+      infectionRate = np.full(pairInfected.size, self.params.INFECTION_RATE)
+      if self.params.HYGIENE_ENABLED:
+        infectionRate[bothFollowRules] *= self.params.HYGIENE_RATE
+      spreads = self.rng.random(pairInfected.size) < infectionRate
+      frame.infectionsDrawn += pairInfected.size
+
+      # The disease spreads to the susceptible agents and they become exposed
+      # Agents can be exposed more than once, but are only counted once
+      exposed = susceptibleAgent[spreads]
+      newlyExposed = np.unique(exposed[population.state[exposed] == Person.SUSCEPTIBLE.id])
+      self.stateCounts[Person.SUSCEPTIBLE.id] -= newlyExposed.size
+      self.stateCounts[Person.EXPOSED.id] += newlyExposed.size
+      frame.agentsTouched += newlyExposed.size
+      population.state[newlyExposed] = Person.EXPOSED.id
+      population.stateFrame[newlyExposed] = self.frameCount
+      self.schedule(Person.EXPOSED, newlyExposed, self.frameCount)
+      contacted += np.bincount(pairInfected, minlength = infected.size)
+      infections += np.bincount(pairInfected[spreads], minlength = infected.size)
+      cost += self.params.HYGIENE_COST * exposed.size
+
+    # Increment the agents contacted and agents infected counters of the infected agents
+    population.agentsContacted[infected] += contacted.astype(np.int32)
+    population.agentsInfected[infected] += infections.astype(np.int32)
+
+    # Return cost
+    return cost
+
+  def findInfected(self, frame):
+    '''Find out who will be infected in the next frame.
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    # Find the exposed people whose incubation period is over
+    population = frame.population
+    infected = self.due(frame, Person.EXPOSED)
+
+    # The people become symptomatic
+    population.state[infected] = Person.INFECTED.id
+    self.stateCounts[Person.EXPOSED.id] -= infected.size
+    self.stateCounts[Person.INFECTED.id] += infected.size
+    frame.agentsTouched += infected.size
+    np.add.at(self.infectedResidents, population.cell[infected], 1)
+    population.stateFrame[infected] = self.frameCount
+    self.schedule(Person.INFECTED, infected, self.frameCount)
+    population.agentsInfected[infected] = 0
+    population.agentsContacted[infected] = 0
+
+  def findRemoved(self, frame):
+    '''Find out who will be recovered / dead next
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    # If no. of hospitalized agents is more than hospital capacity
+    # Increase the mortality rate
+    numInfected = frame.stateCounts[Person.INFECTED.id]
+    numHospitalized = int(numInfected * self.params.HOSPITALIZATION_RATE)
+    totalHospitalCapacity = int(self.params.HOSPITAL_CAPACITY * self.params.POPULATION_SIZE)
+    if numHospitalized > totalHospitalCapacity:
+      mortalityRate = self.params.MORTALITY_RATE * (
+        totalHospitalCapacity +
+        (numHospitalized - totalHospitalCapacity) * self.params.MORTALITY_COEFFICIENT
+      ) / numHospitalized
+    else:
+      mortalityRate = self.params.MORTALITY_RATE
+
+    # Find the infected people who have no time left for disease
+    population = frame.population
+    removed = self.due(frame, Person.INFECTED)
+    population.stateFrame[removed] = self.frameCount
+
+    # Add to the total agents infected for this frame
+    frame.reproductiveSum += int(population.agentsInfected[removed].sum())
+    frame.contactSum += int(population.agentsContacted[removed].sum())
+    frame.removedAgents += removed.size
+    frame.agentsTouched += removed.size
+
+    # Find if the people recover or die
+    comorbidityCoefficients = np.asarray(self.params.COMORBIDITY_COEFFICIENTS)
+    dies = self.rng.random(removed.size) < (
+      mortalityRate * comorbidityCoefficients[population.age[removed]]
+    )
+    population.state[removed] = np.where(dies, Person.DEAD.id, Person.RECOVERED.id)
+    deadCount = np.count_nonzero(dies)
+    self.stateCounts[Person.INFECTED.id] -= removed.size
+    np.subtract.at(self.infectedResidents, population.cell[removed], 1)
+    self.stateCounts[Person.DEAD.id] += deadCount
+    self.stateCounts[Person.RECOVERED.id] += removed.size - deadCount
+    self.schedule(Person.RECOVERED, removed[~dies], self.frameCount)
+
+  def findSusceptible(self, frame):
+    '''Find out who loses immunity from recovery or vaccination
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    # Find the recovered and vaccinated people who have lost immunity
+    population = frame.population
+    recovered = self.due(frame, Person.RECOVERED)
+    vaccinated = self.due(frame, Person.VACCINATED)
+    susceptible = np.concatenate((recovered, vaccinated))
+
+    # The people lose immunity and become susceptible again
+    self.stateCounts[Person.RECOVERED.id] -= recovered.size
+    self.stateCounts[Person.VACCINATED.id] -= vaccinated.size
+    self.stateCounts[Person.SUSCEPTIBLE.id] += susceptible.size
+    frame.agentsTouched += susceptible.size
+    population.state[susceptible] = Person.SUSCEPTIBLE.id
+    population.stateFrame[susceptible] = self.frameCount
+
+if __name__ == '__main__':
+  # Only performed when this file is run directly
+  # Used for testing locally
+  # Create a simulation object and runs the simulation
+  from time import time
+
+  from Utils import Utils # type: ignore
+
+  # Parameters for running the simulation
+  params = Params(
+    POPULATION_SIZE=1000000,
+    ENGINE='array'
+  )
+
+  simulation = ArraySimulation(params)
+  startTime = time()
+  frames = list(simulation.run())
+  print(f'Time taken: {time() - startTime:.2f}s')
+
+  Utils.drawFramesMatplotlib(frames, params)
@@ -0,0 +1,144 @@
+import json
+import struct
+
+class Checkpoint:
+  '''Reads and writes the binary checkpoint files of simulations.
+
+  A checkpoint file starts with a magic string, the format version and the
+  length of a JSON header. The header holds the scalar state of the simulation
+  and the data type, shape and offset of each column. The columns follow the header
+  as raw little endian arrays, each aligned so that it can be memory mapped
+
+  Attributes
+  ----------
+
+  Methods
+  -------
+  write(path, header, columns)
+    Writes a checkpoint file
+  read(path)
+    Reads a checkpoint file, memory mapping its columns
+  align(offset)
+    Rounds an offset up to the alignment of the columns
+  '''
+
+  MAGIC = b'SIMAIDCK'
+  VERSION = 1
+  ALIGNMENT = 64
+
+  @staticmethod
+  def write(path, header, columns):
+    '''Writes a checkpoint file.
+
+    Parameters
+    ----------
+    path : str
+      The path of the file
+    header : Dict
+      The scalar state of the simulation, which must be JSON serializable
+    columns : Dict[str, numpy.ndarray]
+      The columns of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    # Numpy is not available on the client, so it is only imported here
+    import numpy as np
+
+    # Find where each column starts after the header
+    arrays = {}
+    layout = {}
+    dataSize = 0
+    for name, values in columns.items():
+      array = np.ascontiguousarray(values)
+      array = array.astype(array.dtype.newbyteorder('<'), copy = False)
+      dataSize = Checkpoint.align(dataSize)
+      arrays[name] = array
+      layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': dataSize}
+      dataSize += array.nbytes
+
+    # Numpy scalars and arrays in the header, such as a lockdown schedule,
+    # are written as the equivalent python values
+    headerBytes = json.dumps(
+      {'header': header, 'columns': layout},
+      default = lambda value: value.tolist()
+    ).encode('utf-8')
+    dataStart = Checkpoint.align(len(Checkpoint.MAGIC) + 12 + len(headerBytes))
+
+    with open(path, 'wb') as checkpointFile:
+      checkpointFile.write(Checkpoint.MAGIC)
+      checkpointFile.write(struct.pack('<IQ', Checkpoint.VERSION, len(headerBytes)))
+      checkpointFile.write(headerBytes)
+      for name, array in arrays.items():
+        checkpointFile.seek(dataStart + layout[name]['offset'])
+        checkpointFile.write(array.tobytes())
+      checkpointFile.truncate(dataStart + dataSize)
+
+  @staticmethod
+  def read(path):
+    '''Reads a checkpoint file, memory mapping its columns.
+
+    The columns are mapped copy on write, so they can be changed
+    without changing the file and are only read from the disk when they are used
+
+    Parameters
+    ----------
+    path : str
+      The path of the file
+
+    Returns
+    -------
+    header : Dict
+      The scalar state of the simulation
+    columns : Dict[str, numpy.ndarray]
+      The columns of the simulation
+    '''
+
+    # Numpy is not available on the client, so it is only imported here
+    import numpy as np
+
+    with open(path, 'rb') as checkpointFile:
+      if checkpointFile.read(len(Checkpoint.MAGIC)) != Checkpoint.MAGIC:
+        raise ValueError(f'{path} is not a checkpoint file')
+      version, headerLength = struct.unpack('<IQ', checkpointFile.read(12))
+      if version != Checkpoint.VERSION:
+        raise ValueError(f'Unsupported checkpoint version: {version}')
+      contents = json.loads(checkpointFile.read(headerLength).decode('utf-8'))
+
+    # Map each column from the file
+    dataStart = Checkpoint.align(len(Checkpoint.MAGIC) + 12 + headerLength)
+    columns = {}
+    for name, column in contents['columns'].items():
+      shape = tuple(column['shape'])
+      if np.prod(shape) == 0:
+        # Empty columns cannot be memory mapped
+        columns[name] = np.empty(shape, dtype = column['dtype'])
+      else:
+        columns[name] = np.memmap(
+          path,
+          dtype = column['dtype'],
+          mode = 'c',
+          offset = dataStart + column['offset'],
+          shape = shape
+        )
+
+    return contents['header'], columns
+
+  @staticmethod
+  def align(offset):
+    '''Rounds an offset up to the alignment of the columns.
+
+    Parameters
+    ----------
+    offset : int
+      The offset in bytes
+
+    Returns
+    -------
+    int
+      The smallest aligned offset which is not before the offset
+    '''
+
+    return -(-offset // Checkpoint.ALIGNMENT) * Checkpoint.ALIGNMENT
@@ -0,0 +1,304 @@
+import numpy as np
+
+class ContactIndex:
+  '''Finds the susceptible and infected agents who are in contact in the array engine.
+
+  The agents are sorted by their cell and then by their x coordinate,
+  and every backend returns the same pairs in the same order:
+  ordered by infected agent and then by susceptible agent in the sorted order.
+  The random numbers drawn for the pairs therefore do not depend on the backend
+
+  Backends
+  --------
+    sweep : Checks every susceptible agent in the x contact radius of each infected agent
+    grid : Buckets the agents into squares with the side of the contact radius
+      and only checks the 3 x 3 squares around each infected agent
+    kdtree : Uses a scipy cKDTree to find the agents in the contact radius
+
+  Attributes
+  ----------
+  population : Population
+    The columns of the agents in the simulation
+  activeCell : numpy.ndarray[int]
+    The cell in which each agent currently is
+  susceptible : numpy.ndarray[int]
+    The sorted indices of the susceptible agents
+  infected : numpy.ndarray[int]
+    The sorted indices of the infected agents
+  susceptibleKey : numpy.ndarray[float]
+    The sort key of each susceptible agent (cell * 4 + x)
+  infectedKey : numpy.ndarray[float]
+    The sort key of each infected agent (cell * 4 + x)
+  radius : float
+    The contact radius
+  radiusSquared : float
+    The square of the contact radius
+
+  Methods
+  -------
+  __init__(population, susceptible, infected, activeCell, params)
+    Sorts the agents for the contact search
+  findContacts(backend, chunkSize)
+    Finds the pairs of agents in contact
+  filterContacts(pairInfected, pairSusceptible)
+    Keeps the pairs of agents which are in the contact radius
+  sweepCandidates(chunkSize)
+    Finds the candidate pairs in the x contact radius
+  gridCandidates()
+    Finds the candidate pairs in the neighbouring squares
+  getSquares(agents, squaresPerSide)
+    Finds the square of each agent for the grid backend
+  kdtreeCandidates()
+    Finds the candidate pairs with a cKDTree
+  '''
+
+  BACKENDS = ('sweep', 'grid', 'kdtree')
+
+  def __init__(self, population, susceptible, infected, activeCell, params):
+    '''Sorts the agents for the contact search.
+
+    Parameters
+    ----------
+    population : Population
+      The columns of the agents in the simulation
+    susceptible : numpy.ndarray[int]
+      The indices of the susceptible agents
+    infected : numpy.ndarray[int]
+      The indices of the infected agents
+    activeCell : numpy.ndarray[int]
+      The cell in which each agent currently is
+    params : Params
+      The parameters of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    self.population = population
+    self.activeCell = activeCell
+    self.radius = params.CONTACT_RADIUS
+    self.radiusSquared = params.CONTACT_RADIUS_SQUARED
+
+    # Sort the agents by their cell and then by the x coordinate
+    # Cells are placed 4 units apart, so the contact radius never crosses cells
+    susceptibleKey = activeCell[susceptible] * 4.0 + population.x[susceptible]
+    order = np.argsort(susceptibleKey, kind = 'stable')
+    self.susceptible = susceptible[order]
+    self.susceptibleKey = susceptibleKey[order]
+    infectedKey = activeCell[infected] * 4.0 + population.x[infected]
+    order = np.argsort(infectedKey, kind = 'stable')
+    self.infected = infected[order]
+    self.infectedKey = infectedKey[order]
+
+  def findContacts(self, backend, chunkSize):
+    '''Finds the pairs of agents in contact.
+
+    Parameters
+    ----------
+    backend : str
+      The backend used to find the candidate pairs
+    chunkSize : int
+      The maximum number of candidate pairs checked at once by the sweep
+
+    Yields
+    ------
+    pairInfected : numpy.ndarray[int]
+      The position of the infected agent of each pair in the sorted infected agents
+    pairSusceptible : numpy.ndarray[int]
+      The position of the susceptible agent of each pair in the sorted susceptible agents
+    '''
+
+    if backend == 'sweep':
+      candidates = self.sweepCandidates(chunkSize)
+    elif backend == 'grid':
+      candidates = [self.gridCandidates()]
+    elif backend == 'kdtree':
+      candidates = [self.kdtreeCandidates()]
+    else:
+      raise ValueError(f'Unknown contact index: {backend}')
+
+    for pairInfected, pairSusceptible in candidates:
+      yield self.filterContacts(pairInfected, pairSusceptible)
+
+  def filterContacts(self, pairInfected, pairSusceptible):
+    '''Keeps the pairs of agents which are in the contact radius
+
+    Parameters
+    ----------
+    pairInfected : numpy.ndarray[int]
+      The position of the infected agent of each candidate pair
+    pairSusceptible : numpy.ndarray[int]
+      The position of the susceptible agent of each candidate pair
+
+    Returns
+    -------
+    pairInfected : numpy.ndarray[int]
+      The position of the infected agent of each pair in contact
+    pairSusceptible : numpy.ndarray[int]
+      The position of the susceptible agent of each pair in contact
+    '''
+
+    # The pairs must be in the x contact radius of the sorted order
+    # and in the contact radius
+    infectedKey = self.infectedKey[pairInfected]
+    susceptibleKey = self.susceptibleKey[pairSusceptible]
+    infectedAgent = self.infected[pairInfected]
+    susceptibleAgent = self.susceptible[pairSusceptible]
+    inContact = (
+      (susceptibleKey >= infectedKey - self.radius) &
+      (susceptibleKey <= infectedKey + self.radius) &
+      ((
+        (self.population.x[susceptibleAgent] - self.population.x[infectedAgent]) ** 2 +
+        (self.population.y[susceptibleAgent] - self.population.y[infectedAgent]) ** 2
+      ) <= self.radiusSquared)
+    )
+
+    return pairInfected[inContact], pairSusceptible[inContact]
+
+  def sweepCandidates(self, chunkSize):
+    '''Finds the candidate pairs in the x contact radius
+
+    Parameters
+    ----------
+    chunkSize : int
+      The maximum number of candidate pairs returned at once
+
+    Yields
+    ------
+    pairInfected : numpy.ndarray[int]
+      The position of the infected agent of each candidate pair
+    pairSusceptible : numpy.ndarray[int]
+      The position of the susceptible agent of each candidate pair
+    '''
+
+    # All susceptible agents in the x contact radius of each infected agent
+    # are between the left and right indices
+    leftIndex = np.searchsorted(self.susceptibleKey, self.infectedKey - self.radius, 'left')
+    rightIndex = np.searchsorted(self.susceptibleKey, self.infectedKey + self.radius, 'right')
+    candidateCount = rightIndex - leftIndex
+    candidateEnd = np.cumsum(candidateCount)
+
+    # Return the candidates in chunks of infected agents to bound memory
+    chunkStart = 0
+    while chunkStart < self.infected.size:
+      chunkEnd = max(chunkStart + 1, int(np.searchsorted(
+        candidateEnd,
+        candidateEnd[chunkStart] - candidateCount[chunkStart] + chunkSize,
+        'right'
+      )))
+
+      # Expand the windows into (infected, susceptible) pairs
+      counts = candidateCount[chunkStart: chunkEnd]
+      pairInfected = np.repeat(np.arange(chunkStart, chunkEnd), counts)
+      pairOffset = np.arange(pairInfected.size) - np.repeat(np.cumsum(counts) - counts, counts)
+      chunkStart = chunkEnd
+
+      yield pairInfected, leftIndex[pairInfected] + pairOffset
+
+  def gridCandidates(self):
+    '''Finds the candidate pairs in the neighbouring squares
+
+    The agents are bucketed into squares with the side of the contact radius,
+    so all agents in contact with an agent are in the 3 x 3 squares around it
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    pairInfected : numpy.ndarray[int]
+      The position of the infected agent of each candidate pair
+    pairSusceptible : numpy.ndarray[int]
+      The position of the susceptible agent of each candidate pair
+    '''
+
+    # Find the square of each agent
+    squaresPerSide = int(1 / self.radius) + 3
+    susceptibleSquares = self.getSquares(self.susceptible, squaresPerSide)
+    infectedSquares = self.getSquares(self.infected, squaresPerSide)
+
+    # Sort the susceptible agents by square
+    # and find the range of susceptible agents in each neighbouring square of each infected agent
+    order = np.argsort(susceptibleSquares, kind = 'stable')
+    susceptibleSquares = susceptibleSquares[order]
+    pairInfected = []
+    pairSusceptible = []
+    for xOffset in (-1, 0, 1):
+      for yOffset in (-1, 0, 1):
+        neighbours = infectedSquares + xOffset * squaresPerSide + yOffset
+        leftIndex = np.searchsorted(susceptibleSquares, neighbours, 'left')
+        counts = np.searchsorted(susceptibleSquares, neighbours, 'right') - leftIndex
+        pairs = np.repeat(np.arange(self.infected.size), counts)
+        pairOffset = np.arange(pairs.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        pairInfected.append(pairs)
+        pairSusceptible.append(order[leftIndex[pairs] + pairOffset])
+    pairInfected = np.concatenate(pairInfected)
+    pairSusceptible = np.concatenate(pairSusceptible)
+
+    # Order the pairs by infected agent and then by susceptible agent
+    order = np.lexsort((pairSusceptible, pairInfected))
+    return pairInfected[order], pairSusceptible[order]
+
+  def getSquares(self, agents, squaresPerSide):
+    '''Finds the square of each agent for the grid backend
+
+    Squares are numbered by cell, then column, then row
+    with an empty border so that neighbouring squares never wrap around
+
+    Parameters
+    ----------
+    agents : numpy.ndarray[int]
+      The indices of the agents
+    squaresPerSide : int
+      The number of squares in each row and column of a cell, including the border
+
+    Returns
+    -------
+    numpy.ndarray[int]
+      The number of the square of each agent
+    '''
+
+    return (
+      (self.activeCell[agents].astype(np.int64) * squaresPerSide +
+       (self.population.x[agents] / self.radius).astype(np.int64) + 1) * squaresPerSide +
+      (self.population.y[agents] / self.radius).astype(np.int64) + 1
+    )
+
+  def kdtreeCandidates(self):
+    '''Finds the candidate pairs with a cKDTree
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    pairInfected : numpy.ndarray[int]
+      The position of the infected agent of each candidate pair
+    pairSusceptible : numpy.ndarray[int]
+      The position of the susceptible agent of each candidate pair
+    '''
+
+    from scipy.spatial import cKDTree
+
+    # Build the trees on the sort keys, so that agents in different cells are far apart
+    infectedTree = cKDTree(np.column_stack((
+      self.infectedKey,
+      self.population.y[self.infected]
+    )))
+    susceptibleTree = cKDTree(np.column_stack((
+      self.susceptibleKey,
+      self.population.y[self.susceptible]
+    )))
+
+    # Slightly enlarge the radius so that rounding never drops a pair
+    # The exact contact radius is checked afterwards
+    distances = infectedTree.sparse_distance_matrix(
+      susceptibleTree,
+      self.radius * (1 + 1e-9),
+      output_type = 'ndarray'
+    )
+
+    # Order the pairs by infected agent and then by susceptible agent
+    order = np.lexsort((distances['j'], distances['i']))
+    return distances['i'][order].astype(np.int64), distances['j'][order].astype(np.int64)
@@ -0,0 +1,497 @@
+import multiprocessing
+import os
+import queue
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ArrayFrame import ArrayFrame # type: ignore
+from ArraySimulation import ArraySimulation # type: ignore
+from DistributedWorker import DistributedWorker # type: ignore
+from Ensemble import Ensemble # type: ignore
+from Person import Person # type: ignore
+from Population import Population # type: ignore
+from Simulation import Simulation # type: ignore
+
+class DistributedSimulation(ArraySimulation):
+  '''Simulation which splits the grid into tiles run by worker processes.
+
+  The grid is split into bands of rows with about the same number of residents,
+  and each band is given to a DistributedWorker, which owns the agents who live in it.
+  The population is in shared memory, so the workers only send each other
+  the ids of the agents who travel to their tiles. Each worker moves its agents,
+  runs the interventions and finds the contacts in its tile, and runs the timed transitions
+  of its agents. The simulation adds up the state counts and metrics of the workers.
+  Each worker has its own random number generator, so the frames depend on the number of workers.
+  The workers keep running between frames, until close is called or the simulation is deleted.
+  Distributed simulations cannot be copied, so they cannot be branched by a ScenarioTree,
+  and they cannot run in the processes of an Ensemble
+
+  Attributes
+  ----------
+  workerCount : int
+    The number of worker processes
+  cellBounds : numpy.ndarray[int]
+    The first cell of the tile of each worker, and the number of cells at the end
+  population : Population
+    The columns of the agents, in shared memory while the workers are running
+  lockdownMask : numpy.ndarray[bool]
+    Whether each cell is under lockdown, in shared memory while the workers are running
+  memories : List[multiprocessing.shared_memory.SharedMemory]
+    The shared memory of the population and of the lockdowns
+  processes : List[multiprocessing.Process]
+    The worker processes, or None if they are not running
+  commands : List[multiprocessing.Queue]
+    The queue of the commands of each worker
+  results : multiprocessing.Queue
+    The queue of the results of every worker
+  finalizer : weakref.finalize
+    Stops the workers and frees the shared memory when the simulation is deleted
+
+  Methods
+  -------
+  __deepcopy__(memo)
+    Refuses to copy the simulation
+  getEngineState(frame)
+    Finds the state of the population and the random number generators of the workers
+  setEngineState(state, columns)
+    Restores the population and starts the workers
+  createAliasTables()
+    Creates the table for drawing home cells
+  createPopulation()
+    Allocates the columns of the population in shared memory
+  createFirstFrame()
+    Creates the population and the first frame of the simulation, and starts the workers
+  findCellBounds(workerCount)
+    Splits the grid into bands of rows with about the same number of residents
+  startWorkers(frame, rngStates)
+    Starts the worker processes
+  request(command, arguments)
+    Sends a command to every worker and waits for their results
+  advanceFrame(frame)
+    Calculates the next frame of the simulation in the current frame
+  close()
+    Stops the workers and frees the shared memory
+  release(processes, commands, memories)
+    Stops some worker processes and frees their shared memory
+  '''
+
+  # The number of seconds to wait for results before checking that the workers are alive
+  POLL_INTERVAL = 1
+
+  # The number of seconds to wait for the workers to stop before terminating them
+  STOP_TIMEOUT = 5
+
+  def __init__(self, params, randomSeed = None):
+    '''Initializes the simulation with no workers.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the simulation
+    randomSeed : int
+      The seed of the random number generator, or None to pick a new seed
+
+    Returns
+    -------
+    None
+    '''
+
+    super().__init__(params, randomSeed)
+    self.population = None
+    self.lockdownMask = None
+    self.memories = []
+    self.processes = None
+    self.commands = []
+    self.results = None
+    self.finalizer = None
+
+  def __deepcopy__(self, memo):
+    '''Refuses to copy the simulation, whose workers cannot be copied.
+
+    Parameters
+    ----------
+    memo : Dict
+      The objects which have already been copied
+
+    Returns
+    -------
+    None
+    '''
+
+    raise TypeError('Distributed simulations cannot be copied')
+
+  def getEngineState(self, frame):
+    '''Find the state of the population and the random number generators of the workers.
+
+    The event calendars are not saved, because the workers find them from the population
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    state : Dict
+      The lockdowns and the state of the random number generator of each worker
+    columns : Dict[str, numpy.ndarray]
+      The columns of the population
+    '''
+
+    if self.processes is None:
+      raise RuntimeError('The workers of the simulation have stopped')
+
+    rngStates = self.request('rngState', {})
+    return {
+      'isLockedDown': frame.isLockedDown.tolist(),
+      'rngStates': rngStates
+    }, {name: getattr(frame.population, name).copy() for name in Population.COLUMNS}
+
+  def setEngineState(self, state, columns):
+    '''Restore the population and start the workers.
+
+    The same number of workers is started as when the state was saved,
+    so the simulation continues exactly like the saved simulation
+
+    Parameters
+    ----------
+    state : Dict
+      The lockdowns and the state of the random number generator of each worker
+    columns : Dict[str, numpy.ndarray]
+      The columns of the population
+
+    Returns
+    -------
+    ArrayFrame
+      The current frame of the simulation
+    '''
+
+    self.rng = np.random.default_rng(self.params.RANDOM_SEED)
+    self.createAliasTables()
+
+    # Copy the columns out of the checkpoint file into shared memory
+    population = self.createPopulation()
+    for name in Population.COLUMNS:
+      getattr(population, name)[:] = columns[name]
+    self.residents = np.bincount(population.cell, minlength = self.params.GRID_SIZE ** 2)
+    self.stateCounts = np.bincount(population.state, minlength = len(Person.states))
+
+    frame = ArrayFrame(population, self.params, self.stateCounts)
+    # Earlier checkpoints saved the lockdowns as rows of the grid
+    frame.isLockedDown[:] = np.ravel(state['isLockedDown'])
+    self.startWorkers(frame, state['rngStates'])
+    return frame
+
+  def createAliasTables(self):
+    '''Create the table for drawing home cells.
+
+    The destinations of travellers are only drawn by the workers,
+    so the travel arrays are made by each worker for its own tile
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    Simulation.createAliasTables(self)
+
+  def createPopulation(self):
+    '''Allocate the columns of the population in shared memory.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    Population
+      The population, with no agents placed yet
+    '''
+
+    size = self.params.POPULATION_SIZE
+    memory = shared_memory.SharedMemory(create = True, size = max(Population.bufferSize(size), 1))
+    self.memories.append(memory)
+    population = Population(size, memory.buf)
+    for name in Population.COLUMNS:
+      getattr(population, name)[:] = 0
+    population.visiting[:] = -1
+    self.population = population
+    return population
+
+  def createFirstFrame(self):
+    '''Create the population and the first frame of the simulation, and start the workers.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    ArrayFrame
+      The first frame of the simulation
+    '''
+
+    frame = super().createFirstFrame()
+    workerCount = self.params.DISTRIBUTED_WORKERS or os.cpu_count() or 1
+    self.startWorkers(frame, [
+      Ensemble.spawnSeed(self.params.RANDOM_SEED, workerID)
+      for workerID in range(min(workerCount, self.params.GRID_SIZE))
+    ])
+    return frame
+
+  def findCellBounds(self, workerCount):
+    '''Split the grid into bands of rows with about the same number of residents.
+
+    Parameters
+    ----------
+    workerCount : int
+      The number of bands, at most the number of rows of the grid
+
+    Returns
+    -------
+    numpy.ndarray[int]
+      The first cell of each band, and the number of cells at the end
+    '''
+
+    gridSize = self.params.GRID_SIZE
+    rowResidents = np.cumsum(self.residents.reshape(gridSize, gridSize).sum(axis = 1))
+
+    # End each band at the row where its share of the residents is reached,
+    # and keep at least one row in every band
+    rowBounds = [0]
+    for workerID in range(1, workerCount):
+      row = int(np.searchsorted(rowResidents, rowResidents[-1] * workerID / workerCount)) + 1
+      rowBounds.append(min(max(row, rowBounds[-1] + 1), gridSize - workerCount + workerID))
+    rowBounds.append(gridSize)
+
+    return np.array(rowBounds, dtype = np.int64) * gridSize
+
+  def startWorkers(self, frame, rngStates):
+    '''Start the worker processes.
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation, whose population is in shared memory
+    rngStates : List[int | Dict]
+      The seed or the state of the random number generator of each worker
+
+    Returns
+    -------
+    None
+    '''
+
+    # Share the lockdowns of the frame with the workers
+    gridSize = self.params.GRID_SIZE
+    lockdownMemory = shared_memory.SharedMemory(create = True, size = gridSize * gridSize)
+    self.memories.append(lockdownMemory)
+    self.lockdownMask = np.ndarray(gridSize * gridSize, dtype = bool, buffer = lockdownMemory.buf)
+    self.lockdownMask[:] = frame.isLockedDown
+
+    self.workerCount = len(rngStates)
+    self.cellBounds = self.findCellBounds(self.workerCount)
+    self.commands = [multiprocessing.Queue() for _ in range(self.workerCount)]
+    self.results = multiprocessing.Queue()
+    inboxes = [multiprocessing.Queue() for _ in range(self.workerCount)]
+    barrier = multiprocessing.Barrier(self.workerCount)
+    self.processes = [
+      multiprocessing.Process(
+        target = DistributedWorker.serve,
+        args = (
+          self.params,
+          self.frameCount,
+          workerID,
+          self.cellBounds,
+          self.memories[0].name,
+          lockdownMemory.name,
+          rngStates[workerID],
+          self.commands[workerID],
+          self.results,
+          inboxes,
+          barrier
+        ),
+        daemon = True
+      )
+      for workerID in range(self.workerCount)
+    ]
+    for process in self.processes:
+      process.start()
+
+    # Stop the workers even if close is never called
+    self.finalizer = weakref.finalize(
+      self,
+      DistributedSimulation.release,
+      self.processes,
+      self.commands,
+      self.memories
+    )
+
+  def request(self, command, arguments):
+    '''Send a command to every worker and wait for their results.
+
+    Parameters
+    ----------
+    command : str
+      The command, 'step' or 'rngState'
+    arguments : Dict
+      The arguments of the command
+
+    Returns
+    -------
+    List
+      The result of each worker
+    '''
+
+    for commands in self.commands:
+      commands.put((command, arguments))
+
+    results = [None] * self.workerCount
+    for _ in range(self.workerCount):
+      # Check that the workers are still alive while waiting
+      while True:
+        try:
+          workerID, kind, result = self.results.get(timeout = DistributedSimulation.POLL_INTERVAL)
+          break
+        except queue.Empty:
+          if not all(process.is_alive() for process in self.processes):
+            self.close()
+            raise RuntimeError('A worker of the simulation stopped unexpectedly')
+
+      if kind == 'error':
+        self.close()
+        raise RuntimeError(f'Worker {workerID} of the simulation failed:\n{result}')
+      results[workerID] = result
+
+    return results
+
+  def advanceFrame(self, frame):
+    '''Calculate the next frame of the simulation in the current frame.
+
+    Every phase runs in the workers, so the profiler only times the whole step
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The current frame of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    self.frameCount += 1
+    profiler = self.profiler
+
+    # Initialize metrics
+    frame.effectiveReproductionNumber = 0
+    frame.reproductiveSum = 0
+    frame.contactSum = 0
+    frame.removedAgents = 0
+    frame.doublingTime = 0
+    frame.hospitalOccupancy = 0
+    frame.agentsTouched = 0
+    frame.contactsTested = 0
+    frame.infectionsDrawn = 0
+
+    # Run the frame in every tile and add up the results
+    if profiler is not None:
+      profiler.lap('step', self, frame)
+    results = self.request('step', {
+      'frameCount': self.frameCount,
+      'stateCounts': frame.stateCounts,
+      'vaccinate': (
+        self.params.VACCINATION_ENABLED and
+        len(self.infectionCountList) >= self.params.VACCINATION_START
+      ),
+      'lockdown': self.params.LOCKDOWN_ENABLED,
+      'lockdownFrame': len(self.infectionCountList)
+    })
+    self.stateCounts = np.sum([result['stateCounts'] for result in results], axis = 0)
+    for result in results:
+      self.interventionCost += result['interventionCost']
+      frame.reproductiveSum += result['reproductiveSum']
+      frame.contactSum += result['contactSum']
+      frame.removedAgents += result['removedAgents']
+      frame.agentsTouched += result['agentsTouched']
+      frame.contactsTested += result['contactsTested']
+      frame.infectionsDrawn += result['infectionsDrawn']
+    frame.isLockedDown[:] = self.lockdownMask
+
+    # Add to hospitalization cost
+    if profiler is not None:
+      profiler.lap('updateMetrics', self, frame)
+    self.interventionCost += round(
+      frame.stateCounts[Person.INFECTED.id] *
+      self.params.HOSPITALIZATION_COST *
+      self.params.HOSPITALIZATION_RATE
+    )
+
+    # Calculate metrics
+    self.updateMetrics(frame, frame.stateCounts[Person.INFECTED.id])
+    if profiler is not None:
+      profiler.lap(None, self, frame)
+
+  def close(self):
+    '''Stop the workers and free the shared memory.
+
+    The population is copied out of the shared memory first,
+    so the frames of the simulation can still be read
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    if self.population is not None:
+      for name in Population.COLUMNS:
+        setattr(self.population, name, getattr(self.population, name).copy())
+    if self.lockdownMask is not None:
+      self.lockdownMask = self.lockdownMask.copy()
+    if self.finalizer is not None:
+      self.finalizer()
+    else:
+      DistributedSimulation.release([], [], self.memories)
+    self.processes = None
+    self.memories = []
+
+  @staticmethod
+  def release(processes, commands, memories):
+    '''Stop some worker processes and free their shared memory.
+
+    Parameters
+    ----------
+    processes : List[multiprocessing.Process]
+      The worker processes
+    commands : List[multiprocessing.Queue]
+      The queue of the commands of each worker
+    memories : List[multiprocessing.shared_memory.SharedMemory]
+      The shared memory of the workers
+
+    Returns
+    -------
+    None
+    '''
+
+    for process, processCommands in zip(processes, commands):
+      if process.is_alive():
+        processCommands.put(('stop', {}))
+    for process in processes:
+      process.join(DistributedSimulation.STOP_TIMEOUT)
+      if process.is_alive():
+        process.terminate()
+        process.join()
+
+    # Views of the shared memory which are still used keep it open,
+    # but it is unlinked so that it is freed when they are gone
+    for memory in memories:
+      try:
+        memory.close()
+      except BufferError:
+        pass
+      memory.unlink()
@@ -0,0 +1,656 @@
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ArrayFrame import ArrayFrame # type: ignore
+from ArraySimulation import ArraySimulation # type: ignore
+from ContactIndex import ContactIndex # type: ignore
+from Person import Person # type: ignore
+from Population import Population # type: ignore
+from Simulation import Simulation # type: ignore
+
+class DistributedWorker(ArraySimulation):
+  '''Runs the phases of a frame for one tile of the grid in a worker process.
+
+  The tile is a band of rows of the grid, and the worker owns the agents who live in it.
+  The agents are in shared memory, so the worker moves its own agents,
+  sends the ids of those who travel to other tiles to the workers of those tiles,
+  and then finds the contacts in its cells between the agents who are in them.
+  Agents are only in one cell at a time, so no two workers change the same agent
+  in the contact phase. The workers wait for each other at a barrier
+  before and after the contact phase. The timed transitions of each agent
+  are only run by its owner, which also schedules the agents exposed by other workers
+
+  Attributes
+  ----------
+  workerID : int
+    The number of the worker
+  cellBounds : numpy.ndarray[int]
+    The first cell of the tile of each worker, and the number of cells at the end
+  cellStart : int
+    The first cell of the tile of the worker
+  cellEnd : int
+    The cell after the last cell of the tile of the worker
+  lockdownMask : numpy.ndarray[bool]
+    Whether each cell is under lockdown, in shared memory
+  frame : ArrayFrame
+    The frame of the worker, whose population and lockdowns are in shared memory
+  agents : numpy.ndarray[int]
+    The sorted ids of the agents of the worker
+  orderedCells : numpy.ndarray[int]
+    The home cell of each agent of the worker, in the order of cellOrder
+  visitors : numpy.ndarray[int]
+    The sorted ids of the agents of other workers who are visiting the tile
+  inboxes : List[multiprocessing.Queue]
+    The queue of the travellers sent to each worker
+  barrier : multiprocessing.Barrier
+    The barrier at which the workers wait for each other
+
+  Methods
+  -------
+  __init__(params, frameCount, workerID, cellBounds, population, lockdownMask, rngState, inboxes, barrier)
+    Finds the agents and the cells of the worker
+  serve(params, frameCount, workerID, cellBounds, populationName, lockdownName, rngState,
+        commands, results, inboxes, barrier)
+    Runs the commands of the simulation in a worker process
+  step(frameCount, stateCounts, vaccinate, lockdown, lockdownFrame)
+    Calculates the next frame in the tile of the worker
+  createAliasTables()
+    Creates the tables and weights for drawing random cells from the tile
+  scheduleTimedStates()
+    Schedules the end of the time of the agents of the worker in timed states
+  exchangeTravellers(travellers, destinations)
+    Sends the travellers to the workers of their destinations and receives the visitors
+  movePeople(frame)
+    Moves the agents of the worker around
+  vaccinate(frame)
+    Finds out which agents of the worker are vaccinated
+  lockdown(frame, frameCount)
+    Lockdown the cells of the tile
+  findExposed(frame)
+    Finds out who will be exposed to the virus in the tile
+  '''
+
+  def __init__(self, params, frameCount, workerID, cellBounds, population, lockdownMask, rngState, inboxes, barrier):
+    '''Finds the agents and the cells of the worker.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the simulation
+    frameCount : int
+      The number of the last frame which was calculated
+    workerID : int
+      The number of the worker
+    cellBounds : numpy.ndarray[int]
+      The first cell of the tile of each worker, and the number of cells at the end
+    population : Population
+      The columns of the agents, in shared memory
+    lockdownMask : numpy.ndarray[bool]
+      Whether each cell is under lockdown, in shared memory
+    rngState : int | Dict
+      The seed or the state of the random number generator of the worker
+    inboxes : List[multiprocessing.Queue]
+      The queue of the travellers sent to each worker
+    barrier : multiprocessing.Barrier
+      The barrier at which the workers wait for each other
+
+    Returns
+    -------
+    None
+    '''
+
+    Simulation.__init__(self, params)
+    self.frameCount = frameCount
+    self.workerID = workerID
+    self.cellBounds = cellBounds
+    self.cellStart = int(cellBounds[workerID])
+    self.cellEnd = int(cellBounds[workerID + 1])
+    self.lockdownMask = lockdownMask
+    self.inboxes = inboxes
+    self.barrier = barrier
+    self.visitors = np.empty(0, dtype = np.int64)
+
+    self.rng = np.random.default_rng()
+    if isinstance(rngState, dict):
+      self.rng.bit_generator.state = rngState
+    else:
+      self.rng = np.random.default_rng(rngState)
+
+    # The lockdowns of the frame are the shared lockdowns
+    self.frame = ArrayFrame(population, params, np.zeros(len(Person.states), dtype = np.int64))
+    self.frame.isLockedDown = lockdownMask
+
+    # Find the agents who live in the tile, sorted by their home cell
+    self.agents = np.flatnonzero((population.cell >= self.cellStart) & (population.cell < self.cellEnd))
+    self.cellOrder = self.agents[np.argsort(population.cell[self.agents], kind = 'stable')]
+    self.orderedCells = population.cell[self.cellOrder].astype(np.int64)
+    cellCount = params.GRID_SIZE ** 2
+    self.residents = np.bincount(self.orderedCells, minlength = cellCount)
+    states = population.state[self.cellOrder]
+    self.stateCounts = np.bincount(states, minlength = len(Person.states))
+    self.infectedResidents = np.bincount(
+      self.orderedCells[states == Person.INFECTED.id],
+      minlength = cellCount
+    )
+
+    self.createAliasTables()
+    self.createCalendars()
+    self.scheduleTimedStates()
+
+  @staticmethod
+  def serve(params, frameCount, workerID, cellBounds, populationName, lockdownName, rngState,
+            commands, results, inboxes, barrier):
+    '''Runs the commands of the simulation in a worker process.
+
+    The commands are 'step' with the arguments of step, 'rngState' and 'stop'.
+    The result of each command is put in the results queue with the number of the worker.
+    If a command fails, the barrier is broken so that the other workers stop waiting,
+    and the error is put in the results queue
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the simulation
+    frameCount : int
+      The number of the last frame which was calculated
+    workerID : int
+      The number of the worker
+    cellBounds : numpy.ndarray[int]
+      The first cell of the tile of each worker, and the number of cells at the end
+    populationName : str
+      The name of the shared memory of the population
+    lockdownName : str
+      The name of the shared memory of the lockdowns
+    rngState : int | Dict
+      The seed or the state of the random number generator of the worker
+    commands : multiprocessing.Queue
+      The commands sent to the worker
+    results : multiprocessing.Queue
+      The results of the commands of all workers
+    inboxes : List[multiprocessing.Queue]
+      The queue of the travellers sent to each worker
+    barrier : multiprocessing.Barrier
+      The barrier at which the workers wait for each other
+
+    Returns
+    -------
+    None
+    '''
+
+    populationMemory = shared_memory.SharedMemory(name = populationName)
+    lockdownMemory = shared_memory.SharedMemory(name = lockdownName)
+    try:
+      worker = DistributedWorker(
+        params,
+        frameCount,
+        workerID,
+        cellBounds,
+        Population(params.POPULATION_SIZE, populationMemory.buf),
+        np.ndarray(params.GRID_SIZE ** 2, dtype = bool, buffer = lockdownMemory.buf),
+        rngState,
+        inboxes,
+        barrier
+      )
+      while True:
+        command, arguments = commands.get()
+        if command == 'stop':
+          break
+        if command == 'step':
+          results.put((workerID, 'step', worker.step(**arguments)))
+        elif command == 'rngState':
+          results.put((workerID, 'rngState', worker.rng.bit_generator.state))
+    except Exception:
+      barrier.abort()
+      results.put((workerID, 'error', traceback.format_exc()))
+    finally:
+      # Release the views of the shared memory before closing it
+      worker = None
+      for memory in (populationMemory, lockdownMemory):
+        try:
+          memory.close()
+        except BufferError:
+          pass
+
+  def step(self, frameCount, stateCounts, vaccinate, lockdown, lockdownFrame):
+    '''Calculates the next frame in the tile of the worker.
+
+    Parameters
+    ----------
+    frameCount : int
+      The number of the frame which is being calculated
+    stateCounts : List[int]
+      The number of people in each state at the start of the frame, in the whole grid
+    vaccinate : bool
+      Whether people are vaccinated in the frame
+    lockdown : bool
+      Whether cells are locked down in the frame
+    lockdownFrame : int
+      The frame of the lockdown schedule
+
+    Returns
+    -------
+    Dict[str, int | List[int]]
+      The state counts of the agents of the worker, the cost of the interventions,
+      and the sums of the tile from which the metrics are calculated
+    '''
+
+    self.frameCount = frameCount
+    self.interventionCost = 0
+    frame = self.frame
+    frame.stateCounts = stateCounts
+    frame.reproductiveSum = 0
+    frame.contactSum = 0
+    frame.removedAgents = 0
+    frame.agentsTouched = 0
+    frame.contactsTested = 0
+    frame.infectionsDrawn = 0
+
+    # Move the agents and swap the travellers with the other workers
+    travellers, destinations = self.movePeople(frame)
+    self.exchangeTravellers(travellers, destinations)
+
+    # Run the interventions
+    if vaccinate:
+      self.interventionCost += self.vaccinate(frame)
+    if lockdown:
+      self.interventionCost += self.lockdown(frame, lockdownFrame)
+
+    # Every worker must be done changing its agents before the contacts are found,
+    # and done with the contacts before the agents change again
+    self.barrier.wait()
+    self.interventionCost += self.findExposed(frame)
+    self.barrier.wait()
+
+    # Run the timed transitions of the agents of the worker
+    self.scheduleExposed()
+    self.findInfected(frame)
+    self.findRemoved(frame)
+    self.findSusceptible(frame)
+
+    population = frame.population
+    return {
+      'stateCounts': np.bincount(
+        population.state[self.agents],
+        minlength = len(Person.states)
+      ).tolist(),
+      'interventionCost': self.interventionCost,
+      'reproductiveSum': frame.reproductiveSum,
+      'contactSum': frame.contactSum,
+      'removedAgents': frame.removedAgents,
+      'agentsTouched': frame.agentsTouched,
+      'contactsTested': frame.contactsTested,
+      'infectionsDrawn': frame.infectionsDrawn
+    }
+
+  def createAliasTables(self):
+    '''Create the tables and weights for drawing random cells from the tile.
+
+    Only the destinations of the cells of the tile are stored
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    Simulation.createAliasTables(self)
+    origins = [
+      cell for cell in range(self.cellStart, self.cellEnd)
+      if self.travelModel.cellWeights[cell] > 0
+    ]
+    (
+      self.travelStart,
+      self.travelDestinations,
+      self.travelWeights,
+      self.travelCumulative
+    ) = self.travelModel.toArrays(origins)
+    self.travelOrigins = np.repeat(np.arange(self.travelStart.size - 1), np.diff(self.travelStart))
+
+  def scheduleTimedStates(self):
+    '''Schedules the end of the time of the agents of the worker in timed states.
+
+    The calendars only depend on the state of each agent and the frame in which
+    the agent entered it, so they are found from the population
+    both when the simulation starts and when it is restored
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    population = self.frame.population
+    for stateID, period in self.periods.items():
+      agents = self.agents[population.state[self.agents] == stateID]
+      dueFrame = population.stateFrame[agents].astype(np.int64) + period
+      for frameCount in np.unique(dueFrame[dueFrame > self.frameCount]):
+        self.calendars[stateID].schedule(agents[dueFrame == frameCount], int(frameCount))
+
+  def scheduleExposed(self):
+    '''Schedules the agents of the worker who were exposed in the current frame.
+
+    The agents may have been exposed by any worker
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    population = self.frame.population
+    exposed = self.agents[
+      (population.state[self.agents] == Person.EXPOSED.id) &
+      (population.stateFrame[self.agents] == self.frameCount)
+    ]
+    self.schedule(Person.EXPOSED, exposed, self.frameCount)
+
+  def exchangeTravellers(self, travellers, destinations):
+    '''Sends the travellers to the workers of their destinations and receives the visitors.
+
+    Only the ids of the travellers are sent, because their destinations
+    are in the shared visiting column
+
+    Parameters
+    ----------
+    travellers : numpy.ndarray[int]
+      The ids of the agents of the worker who travel
+    destinations : numpy.ndarray[int]
+      The cell to which each agent travels
+
+    Returns
+    -------
+    None
+    '''
+
+    workerCount = len(self.inboxes)
+    owners = np.searchsorted(self.cellBounds, destinations, 'right') - 1
+    for workerID in range(workerCount):
+      if workerID != self.workerID:
+        self.inboxes[workerID].put(travellers[owners == workerID])
+
+    # Every worker has sent its travellers once all have reached the barrier
+    # The visitors are sorted, so their order does not depend on the order they arrive in
+    self.barrier.wait()
+    self.visitors = np.sort(np.concatenate(
+      [self.inboxes[self.workerID].get() for _ in range(workerCount - 1)] +
+      [np.empty(0, dtype = np.int64)]
+    ))
+
+  def movePeople(self, frame):
+    '''Move the agents of the worker around.
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The frame of the worker
+
+    Returns
+    -------
+    travellers : numpy.ndarray[int]
+      The ids of the agents who travel
+    destinations : numpy.ndarray[int]
+      The cell to which each agent travels
+    '''
+
+    population = frame.population
+    gridSize = self.params.GRID_SIZE
+    isLockedDown = self.lockdownMask
+
+    # Find the number of cells not under lockdown
+    # and the cells from which people can travel
+    cellsToTravelTo = isLockedDown.size - np.count_nonzero(isLockedDown)
+    canTravel = cellsToTravelTo - (~isLockedDown) > 0
+
+    # Dead people do not move
+    # The agents are found by their position in the cell order of the worker
+    alive = population.state[self.cellOrder] != Person.DEAD.id
+    frame.agentsTouched += np.count_nonzero(alive)
+    eligible = np.flatnonzero(alive & canTravel[self.orderedCells])
+    eligibleCount = np.bincount(
+      self.orderedCells[eligible] - self.cellStart,
+      minlength = self.cellEnd - self.cellStart
+    )
+    eligibleStart = np.cumsum(eligibleCount) - eligibleCount
+
+    # Find the number of people who travel from each cell and pick them
+    picked = eligible[self.sampleWithoutReplacement(
+      eligibleStart,
+      eligibleCount,
+      self.rng.binomial(eligibleCount, self.params.TRAVEL_RATE)
+    )]
+    travelling = np.zeros(self.cellOrder.size, dtype = bool)
+    travelling[picked] = True
+
+    # People who follow rules cannot travel under travel restrictions
+    # They stay where they are and the cost is updated
+    travelWeights = self.travelWeights
+    lockedDestinations = None
+    if self.params.TRAVEL_RESTRICTIONS_ENABLED:
+      followsRules = population.followsRules[self.cellOrder[picked]]
+      population.visiting[self.cellOrder[picked[followsRules]]] = -1
+      self.interventionCost += self.params.TRAVEL_RESTRICTIONS_COST * np.count_nonzero(followsRules)
+      picked = picked[~followsRules]
+
+      # People cannot travel to cells under lockdown
+      lockedDestinations = isLockedDown
+      travelWeights = travelWeights * ~isLockedDown[self.travelDestinations]
+
+    # People from cells with no destination left stay at home
+    travelTotal = np.bincount(self.travelOrigins, weights = travelWeights, minlength = self.cellEnd)
+    blocked = travelTotal[self.orderedCells[picked]] <= 0
+    if blocked.any():
+      travelling[picked[blocked]] = False
+      picked = picked[~blocked]
+
+    # Draw the destination of each traveller from the destinations of their home cell
+    travellers = self.cellOrder[picked]
+    destinations = self.drawDestinations(self.orderedCells[picked], lockedDestinations)
+
+    # The people who travel go to a random position in the new cell
+    population.visiting[travellers] = destinations
+    population.x[travellers] = self.params.CELL_SIZE * (
+      destinations % gridSize + self.rng.random(travellers.size)
+    )
+    population.y[travellers] = self.params.CELL_SIZE * (
+      destinations // gridSize + self.rng.random(travellers.size)
+    )
+
+    # The people who do not travel reset their location to home
+    stayingOrder = np.flatnonzero(alive & ~travelling)
+    staying = self.cellOrder[stayingOrder]
+    population.visiting[staying] = -1
+    population.x[staying] = population.homeX[staying]
+    population.y[staying] = population.homeY[staying]
+
+    # Change the position of the people who are free to move by a random amount
+    # and keep them inside their home cell
+    isFree = ~population.followsRules[staying] | ~isLockedDown[self.orderedCells[stayingOrder]]
+    moving = staying[isFree]
+    cells = self.orderedCells[stayingOrder[isFree]]
+    xMin = (cells % gridSize) * self.params.CELL_SIZE
+    yMin = (cells // gridSize) * self.params.CELL_SIZE
+    population.x[moving] = np.clip(
+      population.x[moving] + self.rng.uniform(
+        -self.params.MAX_MOVEMENT, self.params.MAX_MOVEMENT, moving.size
+      ),
+      xMin,
+      xMin + self.params.CELL_SIZE
+    )
+    population.y[moving] = np.clip(
+      population.y[moving] + self.rng.uniform(
+        -self.params.MAX_MOVEMENT, self.params.MAX_MOVEMENT, moving.size
+      ),
+      yMin,
+      yMin + self.params.CELL_SIZE
+    )
+
+    return travellers, destinations
+
+  def vaccinate(self, frame):
+    '''Find out which agents of the worker are vaccinated
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The frame of the worker
+
+    Returns
+    -------
+    int
+      Cost of the vaccinations in the frame
+    '''
+
+    # Find out which susceptible people are vaccinated
+    # Either draw the number of vaccinations and pick that many people,
+    # or draw for each person
+    population = frame.population
+    susceptible = self.agents[population.state[self.agents] == Person.SUSCEPTIBLE.id]
+    if self.params.VACCINATION_SAMPLING == 'skip':
+      vaccinationRate = min(max(self.params.VACCINATION_RATE, 0), 1)
+      vaccinated = np.sort(self.rng.choice(
+        susceptible,
+        self.rng.binomial(susceptible.size, vaccinationRate),
+        replace = False
+      ))
+    elif self.params.VACCINATION_SAMPLING == 'bernoulli':
+      vaccinated = susceptible[
+        self.rng.random(susceptible.size) < self.params.VACCINATION_RATE
+      ]
+    else:
+      raise ValueError(f'Unknown vaccination sampling: {self.params.VACCINATION_SAMPLING}')
+
+    # Vaccination happens before the timers of the frame start,
+    # so the vaccinated people enter their state in the previous frame
+    population.state[vaccinated] = Person.VACCINATED.id
+    population.stateFrame[vaccinated] = self.frameCount - 1
+    self.schedule(Person.VACCINATED, vaccinated, self.frameCount - 1)
+    frame.agentsTouched += vaccinated.size
+
+    # Return cost
+    return vaccinated.size * self.params.VACCINATION_COST
+
+  def lockdown(self, frame, frameCount):
+    '''Lockdown the cells of the tile
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The frame of the worker
+    frameCount : int
+      The frame of the lockdown schedule
+
+    Returns
+    -------
+    int
+      Cost of the lockdown of the cells of the tile in the frame
+    '''
+
+    isLockedDown = self.lockdownMask[self.cellStart:self.cellEnd]
+    residents = self.residents[self.cellStart:self.cellEnd]
+    if self.params.LOCAL_LOCKDOWN:
+      # Find the fraction of infected people in each cell
+      infectedFraction = np.divide(
+        self.infectedResidents[self.cellStart:self.cellEnd],
+        residents,
+        out = np.zeros(residents.size),
+        where = residents > 0
+      )
+      isLockedDown[:] = (residents > 0) & (infectedFraction >= self.params.LOCKDOWN_LEVEL)
+    else:
+      # For global lockdowns, read the compiled schedule
+      isLockedDown[:] = self.params.LOCKDOWN_DAYS[frameCount]
+
+    # Return cost
+    return (
+      self.params.LOCKDOWN_COST *
+      self.params.RULE_COMPLIANCE_RATE *
+      int(residents[isLockedDown].sum())
+    )
+
+  def findExposed(self, frame):
+    '''Find out who will be exposed to the virus next in the tile
+
+    The agents in the tile are the agents of the worker who are in it and the visitors.
+    They are copied into a small population, so that the contact index
+    only sorts the agents in the tile. The exposed agents are scheduled by their owners
+
+    Parameters
+    ----------
+    frame : ArrayFrame
+      The frame of the worker
+
+    Returns
+    -------
+    int
+      Cost of hygiene measures if enabled
+    '''
+
+    # Find the agents who are in the tile
+    population = frame.population
+    visiting = population.visiting[self.cellOrder]
+    atHome = (visiting < 0) | ((visiting >= self.cellStart) & (visiting < self.cellEnd))
+    present = np.sort(np.concatenate((self.cellOrder[atHome], self.visitors)))
+    state = population.state[present]
+    susceptible = np.flatnonzero(state == Person.SUSCEPTIBLE.id)
+    infected = np.flatnonzero(state == Person.INFECTED.id)
+    if susceptible.size == 0 or infected.size == 0:
+      return 0
+
+    # Find the pairs of agents in contact, by their position in the agents in the tile
+    tile = Population(present.size)
+    tile.x[:] = population.x[present]
+    tile.y[:] = population.y[present]
+    tile.visiting[:] = population.visiting[present]
+    tile.cell[:] = population.cell[present]
+    followsRules = population.followsRules[present]
+    contactIndex = ContactIndex(tile, susceptible, infected, tile.activeCell(), self.params)
+    infected = contactIndex.infected
+    contacted = np.zeros(infected.size, dtype = np.int64)
+    infections = np.zeros(infected.size, dtype = np.int64)
+    isLockedDown = self.lockdownMask
+    cost = 0
+    for pairInfected, pairSusceptible in contactIndex.findContacts(
+        self.params.CONTACT_INDEX, self.CONTACT_CHUNK_SIZE):
+      infectedAgent = infected[pairInfected]
+      susceptibleAgent = contactIndex.susceptible[pairSusceptible]
+      frame.contactsTested += pairInfected.size
+
+      # Check for lockdown
+      bothFollowRules = followsRules[infectedAgent] & followsRules[susceptibleAgent]
+      inContact = ~(isLockedDown[contactIndex.activeCell[infectedAgent]] & bothFollowRules)
+      pairInfected = pairInfected[inContact]
+      susceptibleAgent = susceptibleAgent[inContact]
+      bothFollowRules = bothFollowRules[inContact]
+
+      # Find which contacts spread the disease
+      infectionRate = np.full(pairInfected.size, self.params.INFECTION_RATE)
+      if self.params.HYGIENE_ENABLED:
+        infectionRate[bothFollowRules] *= self.params.HYGIENE_RATE
+      spreads = self.rng.random(pairInfected.size) < infectionRate
+      frame.infectionsDrawn += pairInfected.size
+
+      # The disease spreads to the susceptible agents and they become exposed
+      # Agents can be exposed more than once, but are only counted once
+      exposed = present[susceptibleAgent[spreads]]
+      newlyExposed = np.unique(exposed[population.state[exposed] == Person.SUSCEPTIBLE.id])
+      population.state[newlyExposed] = Person.EXPOSED.id
+      population.stateFrame[newlyExposed] = self.frameCount
+      frame.agentsTouched += newlyExposed.size
+      contacted += np.bincount(pairInfected, minlength = infected.size)
+      infections += np.bincount(pairInfected[spreads], minlength = infected.size)
+      cost += self.params.HYGIENE_COST * exposed.size
+
+    # Increment the agents contacted and agents infected counters of the infected agents
+    population.agentsContacted[present[infected]] += contacted.astype(np.int32)
+    population.agentsInfected[present[infected]] += infections.astype(np.int32)
+
+    # Return cost
+    return cost
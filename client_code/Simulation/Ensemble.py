@@ -0,0 +1,381 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from hashlib import sha256
+from random import Random
+
+from Person import Person # type: ignore
+from Profiler import Profiler # type: ignore
+from SeriesStatistics import SeriesStatistics # type: ignore
+from Simulation import Simulation # type: ignore
+
+class Ensemble:
+  '''Runs many simulations with the same parameters in a process pool.
+
+  Each replicate runs in a worker process and only sends back the state counts
+  and metrics of its frames. They are added to the statistics of each frame
+  as soon as the replicate finishes, so the frames of the replicates are never kept.
+  A replicate which is ended early by a stop condition keeps the values of its last frame
+  in the later frames, so the statistics of every frame include every replicate
+
+  Attributes
+  ----------
+  params : Params
+    The parameters of every simulation
+  replicates : int
+    The number of simulations
+  quantiles : List[float]
+    The quantiles of each value which are estimated
+  maxWorkers : int
+    The number of processes, or None to use every core
+  randomSeed : int
+    The root seed from which the seed of each simulation is spawned
+  randomSeeds : List[int]
+    The seed of each simulation
+  outcome : Callable[[Dict[str, List[float]]], Dict[str, float]]
+    Finds values which summarize a whole simulation from its series, or None
+  stopConditions : List[Callable[[FrameSummary], bool]]
+    Conditions which end each simulation early
+  profiler : Profiler
+    Collects the phases of every simulation, or None to not profile the simulations
+  statistics : Dict[str, List[SeriesStatistics]]
+    The statistics of each state count and metric in each frame
+  outcomes : Dict[str, SeriesStatistics]
+    The statistics of each value returned by the outcome function
+  futures : List[Future]
+    The replicates which have been submitted but not collected
+
+  Methods
+  -------
+  __init__(params, replicates, quantiles, maxWorkers, randomSeed, outcome, stopConditions, profiler)
+    Creates an ensemble with no finished replicates
+  run(executor)
+    Runs all replicates and aggregates their frames
+  submit(executor)
+    Starts all replicates in a process pool
+  collect()
+    Aggregates the replicates as they finish
+  spawnSeeds(randomSeed, count)
+    Finds independent seeds for the simulations of a root seed
+  spawnSeed(randomSeed, index)
+    Finds the seed of one simulation of a root seed
+  runReplicate(params, randomSeed, outcome, stopConditions)
+    Runs one simulation and finds the series of its frames
+  runProfiledReplicate(params, randomSeed, outcome, stopConditions, threadID)
+    Runs one simulation with a profiler and finds the series of its frames
+  findSeries(summaries)
+    Finds the series of the state counts and metrics of some frames
+  addReplicate(series, outcomes)
+    Adds the series of one simulation to the statistics
+  '''
+
+  # The metrics of each frame which are aggregated
+  METRICS = (
+    'effectiveReproductionNumber',
+    'averageContacts',
+    'doublingTime',
+    'hospitalOccupancy',
+    'peakInfection'
+  )
+
+  def __init__(self, params, replicates, quantiles = (0.05, 0.5, 0.95), maxWorkers = None,
+               randomSeed = None, outcome = None, stopConditions = (), profiler = None):
+    '''Creates an ensemble with no finished replicates.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of every simulation
+    replicates : int
+      The number of simulations
+    quantiles : List[float]
+      The quantiles of each value which are estimated
+    maxWorkers : int
+      The number of processes, or None to use every core
+    randomSeed : int
+      The root seed of the simulations, or None to pick a new one
+    outcome : Callable[[Dict[str, List[float]]], Dict[str, float]]
+      Finds values which summarize a whole simulation from its series.
+      It runs in the worker processes, so it must be defined at the top level of a module
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions which end each simulation early, so that simulations can have fewer frames.
+      The values of the last frame of a stopped simulation are used for its later frames.
+      Like the outcome function, other functions than those of StopCondition
+      must be defined at the top level of a module
+    profiler : Profiler
+      Collects the phases of every simulation, or None to not profile the simulations.
+      Each simulation is profiled in its worker process, and its phases and trace events
+      are merged into the profiler when it finishes. The callback of the profiler is not called
+
+    Returns
+    -------
+    None
+    '''
+
+    self.params = params
+    self.replicates = replicates
+    self.quantiles = quantiles
+    self.maxWorkers = maxWorkers
+    self.outcome = outcome
+    self.stopConditions = stopConditions
+    self.profiler = profiler
+    self.statistics = {}
+    self.outcomes = {}
+    self.futures = []
+
+    # Give each replicate its own seed, spawned from the root seed
+    if randomSeed is None:
+      randomSeed = Random().randrange(Simulation.MAX_RANDOM_SEED)
+    self.randomSeed = randomSeed
+    self.randomSeeds = Ensemble.spawnSeeds(randomSeed, replicates)
+
+  def run(self, executor = None):
+    '''Runs all replicates and aggregates their frames.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+      The pool in which the replicates run, or None to create one
+
+    Returns
+    -------
+    Dict[str, List[SeriesStatistics]]
+      The statistics of each state count and metric in each frame
+    '''
+
+    if executor is None:
+      with ProcessPoolExecutor(max_workers = self.maxWorkers) as executor:
+        self.submit(executor)
+        return self.collect()
+
+    self.submit(executor)
+    return self.collect()
+
+  def submit(self, executor):
+    '''Starts all replicates in a process pool.
+
+    Several ensembles can be submitted to the same pool before they are collected,
+    so that all of their replicates run at the same time
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+      The pool in which the replicates run
+
+    Returns
+    -------
+    None
+    '''
+
+    if self.profiler is not None:
+      # Each replicate is a thread of the trace
+      self.futures += [
+        executor.submit(
+          Ensemble.runProfiledReplicate,
+          self.params,
+          randomSeed,
+          self.outcome,
+          self.stopConditions,
+          index
+        )
+        for index, randomSeed in enumerate(self.randomSeeds)
+      ]
+      return
+
+    self.futures += [
+      executor.submit(
+        Ensemble.runReplicate,
+        self.params,
+        randomSeed,
+        self.outcome,
+        self.stopConditions
+      )
+      for randomSeed in self.randomSeeds
+    ]
+
+  def collect(self):
+    '''Aggregates the replicates as they finish.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    Dict[str, List[SeriesStatistics]]
+      The statistics of each state count and metric in each frame
+    '''
+
+    for future in as_completed(self.futures):
+      if self.profiler is not None:
+        series, outcomes, profiler = future.result()
+        self.profiler.merge(profiler)
+        self.addReplicate(series, outcomes)
+      else:
+        self.addReplicate(*future.result())
+    self.futures = []
+
+    return self.statistics
+
+  @staticmethod
+  def spawnSeeds(randomSeed, count):
+    '''Finds independent seeds for the simulations of a root seed.
+
+    Each seed is a hash of the root seed and the number of the simulation,
+    so the same root seed always spawns the same seeds,
+    and nearby root seeds do not share any of them
+
+    Parameters
+    ----------
+    randomSeed : int
+      The root seed
+    count : int
+      The number of seeds
+
+    Returns
+    -------
+    List[int]
+      The seed of each simulation
+    '''
+
+    return [Ensemble.spawnSeed(randomSeed, index) for index in range(count)]
+
+  @staticmethod
+  def spawnSeed(randomSeed, index):
+    '''Finds the seed of one simulation of a root seed.
+
+    Parameters
+    ----------
+    randomSeed : int
+      The root seed
+    index : int
+      The number of the simulation
+
+    Returns
+    -------
+    int
+      The seed of the simulation
+    '''
+
+    return int.from_bytes(sha256(f'{randomSeed}/{index}'.encode()).digest()[:8], 'little') >> 1
+
+  @staticmethod
+  def runReplicate(params, randomSeed, outcome, stopConditions = ()):
+    '''Runs one simulation and finds the series of its frames.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the simulation
+    randomSeed : int
+      The seed of the simulation
+    outcome : Callable[[Dict[str, List[float]]], Dict[str, float]]
+      Finds values which summarize the simulation from its series, or None
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions which end the simulation early
+
+    Returns
+    -------
+    series : Dict[str, List[float]]
+      The value of each state count, metric and the total intervention cost in each frame
+    outcomes : Dict[str, float]
+      The values returned by the outcome function
+    '''
+
+    # The simulation changes some parameters, so it gets its own copy
+    simulation = Simulation.create(deepcopy(params), randomSeed)
+    series = Ensemble.findSeries(simulation.run(True, stopConditions))
+
+    return series, (outcome(series) if outcome is not None else {})
+
+  @staticmethod
+  def runProfiledReplicate(params, randomSeed, outcome, stopConditions, threadID):
+    '''Runs one simulation with a profiler and finds the series of its frames.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the simulation
+    randomSeed : int
+      The seed of the simulation
+    outcome : Callable[[Dict[str, List[float]]], Dict[str, float]]
+      Finds values which summarize the simulation from its series, or None
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions which end the simulation early
+    threadID : int
+      The thread of the trace events of the simulation
+
+    Returns
+    -------
+    series : Dict[str, List[float]]
+      The value of each state count, metric and the total intervention cost in each frame
+    outcomes : Dict[str, float]
+      The values returned by the outcome function
+    profiler : Profiler
+      The phases and trace events of the simulation
+    '''
+
+    simulation = Simulation.create(deepcopy(params), randomSeed)
+    simulation.profiler = Profiler(threadID = threadID)
+    series = Ensemble.findSeries(simulation.run(True, stopConditions))
+
+    return series, (outcome(series) if outcome is not None else {}), simulation.profiler
+
+  @staticmethod
+  def findSeries(summaries):
+    '''Finds the series of the state counts and metrics of some frames.
+
+    Parameters
+    ----------
+    summaries : Iterable[FrameSummary]
+      The summaries of the frames
+
+    Returns
+    -------
+    Dict[str, List[float]]
+      The value of each state count, metric and the total intervention cost in each frame
+    '''
+
+    series = {state.name: [] for state in Person.states}
+    series.update({metric: [] for metric in Ensemble.METRICS})
+    series['interventionCost'] = []
+
+    # Only keep the values of each frame
+    for summary in summaries:
+      for state in Person.states:
+        series[state.name].append(summary.stateCounts[state.id])
+      for metric in Ensemble.METRICS:
+        series[metric].append(getattr(summary, metric))
+      series['interventionCost'].append(summary.interventionCost)
+
+    return series
+
+  def addReplicate(self, series, outcomes):
+    '''Adds the series of one simulation to the statistics.
+
+    A series which ended early is extended to the length of the simulation with its last values
+
+    Parameters
+    ----------
+    series : Dict[str, List[float]]
+      The value of each state count and metric in each frame
+    outcomes : Dict[str, float]
+      The values returned by the outcome function
+
+    Returns
+    -------
+    None
+    '''
+
+    # A simulation which stopped early keeps the values of its last frame,
+    # so that the later frames are not only found from the simulations which were still running
+    frameCount = self.params.SIMULATION_LENGTH + 1
+    for name, values in series.items():
+      if values and len(values) < frameCount:
+        values = values + [values[-1]] * (frameCount - len(values))
+      frameStatistics = self.statistics.setdefault(name, [])
+      while len(frameStatistics) < len(values):
+        frameStatistics.append(SeriesStatistics(self.quantiles))
+      for statistics, value in zip(frameStatistics, values):
+        statistics.add(value)
+
+    for name, value in outcomes.items():
+      self.outcomes.setdefault(name, SeriesStatistics(self.quantiles)).add(value)
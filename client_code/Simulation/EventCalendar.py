@@ -0,0 +1,73 @@
+class EventCalendar:
+  '''Time wheel which stores events by the frame in which they are due.
+
+  The wheel has one bucket for each frame up to the furthest frame
+  for which an event can be scheduled, and the buckets are reused
+  as the simulation moves forward
+
+  Attributes
+  ----------
+  buckets : List[List]
+    The events in each bucket of the wheel
+
+  Methods
+  -------
+  __init__(length)
+    Creates an empty wheel
+  schedule(event, frameCount)
+    Adds an event to the bucket of a frame
+  pop(frameCount)
+    Removes and returns the events due in a frame
+  '''
+
+  def __init__(self, length):
+    '''Creates an empty wheel.
+
+    Parameters
+    ----------
+    length : int
+      The number of buckets, which must be more than the furthest
+      number of frames ahead that an event is scheduled
+
+    Returns
+    -------
+    None
+    '''
+
+    self.buckets = [[] for _ in range(length)]
+
+  def schedule(self, event, frameCount):
+    '''Adds an event to the bucket of a frame.
+
+    Parameters
+    ----------
+    event
+      The event
+    frameCount : int
+      The frame in which the event is due
+
+    Returns
+    -------
+    None
+    '''
+
+    self.buckets[frameCount % len(self.buckets)].append(event)
+
+  def pop(self, frameCount):
+    '''Removes and returns the events due in a frame.
+
+    Parameters
+    ----------
+    frameCount : int
+      The current frame count of the simulation
+
+    Returns
+    -------
+    List
+      The events due in the frame, in the order in which they were scheduled
+    '''
+
+    bucket = frameCount % len(self.buckets)
+    events = self.buckets[bucket]
+    self.buckets[bucket] = []
+    return events
@@ -1,18 +1,30 @@
-from Person import Person # type: ignore
-
 class Frame:
   '''Stores information about each frame in the simulation.
 
+  The grid state is made once and reused by the next frames.
+  The visiting grid is shared by all frames and only its visited cells are cleared.
+  Each frame copies the lockdowns of the previous frame, so the lockdowns
+  of a frame which is kept do not change. Runs which only yield metrics
+  update a single frame in place, so they do not copy the lockdowns at all
+
   Attributes
   ----------
   grid : List[List[List[Person]]]
     list of people in each cell of the grid
   visitingGrid : List[List[List[Person]]]
     list of people in each cell of the grid who are visiting the cell
-  isLockedDown : List[List[bool]]
-    Whether the cell is under lockdown
-  stateGroupss : List[List[Tuple[int, int, int]]]
-    list of indexes of the people in each states
+  occupiedCells : List[int]
+    The cells where people live, numbered row by row, shared by all frames
+  visitedCells : List[int]
+    The cells with people visiting them, in the order they were visited, shared by all frames
+  isLockedDown : List[bool]
+    Whether each cell is under lockdown, with the cells numbered row by row
+  lockedCount : int
+    The number of cells under lockdown
+  stateGroups : StateGroups
+    The people in each state, shared by all frames of the simulation
+  stateCounts : List[int]
+    The number of people in each state at the start of the frame
   effectiveReproductionNumber : float
     Effective reproduction number of the disease (Re)
   averageContacts : float
@@ -29,31 +41,64 @@ class Frame:
     Percentage of the population that is in the hospital
   peakInfection : int
     Maximum infected patients till the current frame
+  agentsTouched : int
+    Number of agents moved or changed to another state in the frame
+  contactsTested : int
+    Number of pairs of susceptible and infected agents checked for contact in the frame
+  infectionsDrawn : int
+    Number of random draws of whether a contact spreads the disease in the frame
 
   Methods
   -------
-  __init__(people)
+  __init__(grid, params, stateGroups, previous)
     Initializes the Frame object with some properties
+  snapshot()
+    Copies the positions, homes and states of the people and the lockdowns
   '''
 
-  def __init__(self, grid, params):
+  def __init__(self, grid, params, stateGroups, previous = None):
     '''Sets some initial parameters for the frame.
     
     Parameters
     ----------
-    people : list(Person.State)
-      list of people in the population in the current frame
+    grid : List[List[List[Person]]]
+      list of people in each cell of the grid
+    params : Params
+      The parameters of the simulation
+    stateGroups : StateGroups
+      The people in each state
+    previous : Frame
+      The previous frame, whose grid state is reused and whose lockdowns are copied,
+      or None to make a new grid state
     
     Returns
     -------
     None
     '''
 
-    # Initialize the variables and set every state in Person.State to an empty list
+    # Initialize the variables
+    # The state groups are kept up to date by the transitions, so only the counts are copied
     self.grid = grid
-    self.visitingGrid = [[[] for i in range(params.GRID_SIZE)] for j in range(params.GRID_SIZE)]
-    self.isLockedDown = [[False for i in range(params.GRID_SIZE)] for j in range(params.GRID_SIZE)]
-    self.stateGroups = [[] for _ in Person.states]
+    if previous is None:
+      cellCount = params.GRID_SIZE * params.GRID_SIZE
+      self.visitingGrid = [[[] for i in range(params.GRID_SIZE)] for j in range(params.GRID_SIZE)]
+      self.occupiedCells = [
+        rowCount * params.GRID_SIZE + colCount
+        for rowCount, row in enumerate(grid)
+        for colCount, cell in enumerate(row) if cell
+      ]
+      self.visitedCells = []
+      self.isLockedDown = [False] * cellCount
+      self.lockedCount = 0
+    else:
+      # Copy the lockdowns, so that they stay those of the previous frame
+      self.visitingGrid = previous.visitingGrid
+      self.occupiedCells = previous.occupiedCells
+      self.visitedCells = previous.visitedCells
+      self.isLockedDown = previous.isLockedDown[:]
+      self.lockedCount = previous.lockedCount
+    self.stateGroups = stateGroups
+    self.stateCounts = stateGroups.counts()
 
     # Initialize metrics
     self.effectiveReproductionNumber = 0
@@ -64,9 +109,45 @@ class Frame:
     self.doublingTime = 0
     self.hospitalOccupancy = 0
     self.peakInfection = 0
+    self.agentsTouched = 0
+    self.contactsTested = 0
+    self.infectionsDrawn = 0
+
+  def snapshot(self):
+    '''Copies the positions, homes and states of the people and the lockdowns.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    x : List[float]
+      The x coordinate of each person, by id
+    y : List[float]
+      The y coordinate of each person, by id
+    homeX : List[float]
+      The x coordinate of the home of each person, by id
+    homeY : List[float]
+      The y coordinate of the home of each person, by id
+    states : List[int]
+      The id of the state of each person, by id
+    isLockedDown : List[bool]
+      Whether each cell is under lockdown, numbered row by row
+    '''
+
+    personCount = sum(len(cell) for row in self.grid for cell in row)
+    x = [0] * personCount
+    y = [0] * personCount
+    homeX = [0] * personCount
+    homeY = [0] * personCount
+    states = [0] * personCount
+    for row in self.grid:
+      for cell in row:
+        for person in cell:
+          x[person.id] = person.x
+          y[person.id] = person.y
+          homeX[person.id] = person.homeX
+          homeY[person.id] = person.homeY
+          states[person.id] = person.state.id
 
-    # Iterate through the list and add the person to the state group
-    for row in range(params.GRID_SIZE):
-      for col in range(params.GRID_SIZE):
-        for personCount, person in enumerate(self.grid[row][col]):
-          self.stateGroups[person.state.id].append((row, col, personCount))
+    return x, y, homeX, homeY, states, list(self.isLockedDown)
@@ -0,0 +1,183 @@
+from array import array
+
+from HistoryFrame import HistoryFrame # type: ignore
+
+class FrameHistory:
+  '''Records the frames of a simulation so that they can be replayed.
+
+  The frames yielded by a simulation share the same people, so they all
+  show the latest state. Almost every person moves a little in every frame,
+  so the history stores the position of every person in every frame,
+  as single precision offsets from their home in compact arrays.
+  The homes are stored once. The states rarely change, so the history copies
+  the states of the people every few frames (keyframes), and only the people
+  whose state changed in the other frames (deltas).
+  A frame is rebuilt from the keyframe before it and the deltas after the keyframe,
+  and seeking forward from the last rebuilt frame only applies the new deltas
+
+  Attributes
+  ----------
+  keyframeInterval : int
+    The number of frames between keyframes
+  homeX : array.array[float]
+    The x coordinate of the home of each person
+  homeY : array.array[float]
+    The y coordinate of the home of each person
+  offsets : List[Tuple[array.array[float], array.array[float]]]
+    The x and y distances of each person from their home in each frame
+  keyframes : List[array.array[int]]
+    The states of the people in each keyframe
+  stateChanges : List[Tuple[array.array[int], array.array[int]]]
+    The people who changed state in each frame and their new states
+  summaries : List[Tuple[List[int], List[bool], Dict[str, float]]]
+    The state counts, lockdowns and metrics of each frame
+  last : List[int]
+    The states of the people in the last recorded frame
+  cursor : List[int]
+    The states of the people in the last rebuilt frame
+  cursorFrame : int
+    The frame count of the last rebuilt frame
+
+  Methods
+  -------
+  __init__(keyframeInterval)
+    Creates an empty history
+  __len__()
+    Finds the number of recorded frames
+  record(frame)
+    Adds the next frame of the simulation to the history
+  seek(frameCount)
+    Rebuilds a recorded frame
+  '''
+
+  # The metrics of each frame which are recorded
+  METRICS = (
+    'effectiveReproductionNumber',
+    'averageContacts',
+    'doublingTime',
+    'hospitalOccupancy',
+    'peakInfection'
+  )
+
+  def __init__(self, keyframeInterval = 30):
+    '''Creates an empty history.
+
+    Parameters
+    ----------
+    keyframeInterval : int
+      The number of frames between keyframes
+
+    Returns
+    -------
+    None
+    '''
+
+    self.keyframeInterval = keyframeInterval
+    self.homeX = None
+    self.homeY = None
+    self.offsets = []
+    self.keyframes = []
+    self.stateChanges = []
+    self.summaries = []
+    self.last = None
+    self.cursor = None
+    self.cursorFrame = -1
+
+  def __len__(self):
+    '''Finds the number of recorded frames.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    int
+      The number of recorded frames
+    '''
+
+    return len(self.summaries)
+
+  def record(self, frame):
+    '''Adds the next frame of the simulation to the history.
+
+    Parameters
+    ----------
+    frame : Frame
+      The frame, from either engine
+
+    Returns
+    -------
+    None
+    '''
+
+    x, y, homeX, homeY, states, isLockedDown = frame.snapshot()
+    self.summaries.append((
+      list(frame.stateCounts),
+      isLockedDown,
+      {metric: getattr(frame, metric) for metric in FrameHistory.METRICS}
+    ))
+
+    # The homes of the people never change
+    if self.homeX is None:
+      self.homeX = array('d', homeX)
+      self.homeY = array('d', homeY)
+    self.offsets.append((
+      array('f', [personX - home for personX, home in zip(x, homeX)]),
+      array('f', [personY - home for personY, home in zip(y, homeY)])
+    ))
+
+    if (len(self.summaries) - 1) % self.keyframeInterval == 0:
+      # Copy every person in a keyframe
+      self.keyframes.append(array('b', states))
+      self.stateChanges.append((array('i'), array('b')))
+    else:
+      # Only keep the people who changed state since the last frame
+      changed = [person for person in range(len(states)) if states[person] != self.last[person]]
+      self.stateChanges.append((
+        array('i', changed),
+        array('b', [states[person] for person in changed])
+      ))
+
+    self.last = states
+
+  def seek(self, frameCount):
+    '''Rebuilds a recorded frame.
+
+    The states of the rebuilt frame are reused by the next seek,
+    so they are only valid until then
+
+    Parameters
+    ----------
+    frameCount : int
+      The frame count of the frame
+
+    Returns
+    -------
+    HistoryFrame
+      The rebuilt frame
+    '''
+
+    if not 0 <= frameCount < len(self.summaries):
+      raise IndexError(f'Frame {frameCount} has not been recorded')
+
+    # Start from the keyframe, unless the last rebuilt frame is between the keyframe and the frame
+    keyframeCount = frameCount - frameCount % self.keyframeInterval
+    if self.cursor is None or not keyframeCount <= self.cursorFrame <= frameCount:
+      self.cursor = self.keyframes[frameCount // self.keyframeInterval].tolist()
+      self.cursorFrame = keyframeCount
+
+    # Apply the state changes of each frame after the cursor
+    states = self.cursor
+    for deltaFrame in range(self.cursorFrame + 1, frameCount + 1):
+      changed, changedStates = self.stateChanges[deltaFrame]
+      for person, state in zip(changed, changedStates):
+        states[person] = state
+    self.cursorFrame = frameCount
+
+    # The positions are the homes moved by the offsets of the frame
+    offsetX, offsetY = self.offsets[frameCount]
+    x = [home + offset for home, offset in zip(self.homeX, offsetX)]
+    y = [home + offset for home, offset in zip(self.homeY, offsetY)]
+
+    stateCounts, isLockedDown, metrics = self.summaries[frameCount]
+    return HistoryFrame(x, y, states, isLockedDown, stateCounts, metrics)
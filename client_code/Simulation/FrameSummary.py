@@ -0,0 +1,67 @@
+class FrameSummary:
+  '''Stores the state counts and metrics of a frame, without the people.
+
+  Yielded by Simulation.run in the metrics only mode. It has a fixed size,
+  which does not depend on the population or the grid
+
+  Attributes
+  ----------
+  frameCount : int
+    The number of the frame
+  stateCounts : Tuple[int]
+    The number of people in each state at the start of the frame
+  effectiveReproductionNumber : float
+    Effective reproduction number of the disease (Re)
+  averageContacts : float
+    Average number of susceptible contacts per infected person
+  doublingTime : float
+    Time it takes for the disease to double (Td)
+  hospitalOccupancy : float
+    Percentage of the population that is in the hospital
+  peakInfection : int
+    Maximum infected patients till the current frame
+  interventionCost : int
+    The total cost of all interventions till the current frame
+
+  Methods
+  -------
+  __init__(frameCount, frame, interventionCost)
+    Copies the state counts and metrics of a frame
+  '''
+
+  __slots__ = (
+    'frameCount',
+    'stateCounts',
+    'effectiveReproductionNumber',
+    'averageContacts',
+    'doublingTime',
+    'hospitalOccupancy',
+    'peakInfection',
+    'interventionCost'
+  )
+
+  def __init__(self, frameCount, frame, interventionCost):
+    '''Copies the state counts and metrics of a frame.
+
+    Parameters
+    ----------
+    frameCount : int
+      The number of the frame
+    frame : Frame
+      The frame, from either engine
+    interventionCost : int
+      The total cost of all interventions till the frame
+
+    Returns
+    -------
+    None
+    '''
+
+    self.frameCount = frameCount
+    self.stateCounts = tuple(frame.stateCounts)
+    self.effectiveReproductionNumber = frame.effectiveReproductionNumber
+    self.averageContacts = frame.averageContacts
+    self.doublingTime = frame.doublingTime
+    self.hospitalOccupancy = frame.hospitalOccupancy
+    self.peakInfection = frame.peakInfection
+    self.interventionCost = interventionCost
@@ -0,0 +1,186 @@
+from math import erf, log, pi, sqrt
+
+import numpy as np
+
+class GaussianProcess:
+  '''Gaussian process regression of a noisy function of points in the unit cube.
+
+  The kernel is a squared exponential with one length scale, and the noise
+  is added to its diagonal. The length scale and the noise are picked from a grid
+  by the marginal likelihood of the values, which are standardized before fitting
+
+  Attributes
+  ----------
+  lengthScales : List[float]
+    The length scales which are tried
+  noises : List[float]
+    The noise variances (of the standardized values) which are tried
+  lengthScale : float
+    The length scale of the fitted kernel
+  noise : float
+    The noise variance of the fitted kernel
+  points : numpy.ndarray[float]
+    The points of the values, one row per point
+  mean : float
+    The mean of the values
+  scale : float
+    The standard deviation of the values
+  cholesky : numpy.ndarray[float]
+    The lower Cholesky factor of the kernel matrix of the points
+  weights : numpy.ndarray[float]
+    The kernel matrix of the points solved for the standardized values
+
+  Methods
+  -------
+  __init__(lengthScales, noises)
+    Creates an unfitted process
+  fit(points, values, optimize)
+    Fits the process to the values of some points
+  predict(points)
+    Finds the mean and standard deviation of the function at some points
+  kernel(a, b, lengthScale)
+    Finds the squared exponential kernel between two sets of points
+  expectedImprovement(mean, deviation, best)
+    Finds the expected improvement below the best value at some points
+  '''
+
+  def __init__(self, lengthScales = (0.05, 0.1, 0.2, 0.4, 0.8), noises = (1e-4, 1e-3, 1e-2, 0.1, 0.3)):
+    '''Creates an unfitted process.
+
+    Parameters
+    ----------
+    lengthScales : List[float]
+      The length scales which are tried
+    noises : List[float]
+      The noise variances (of the standardized values) which are tried
+
+    Returns
+    -------
+    None
+    '''
+
+    self.lengthScales = lengthScales
+    self.noises = noises
+    self.lengthScale = lengthScales[len(lengthScales) // 2]
+    self.noise = noises[len(noises) // 2]
+
+  def fit(self, points, values, optimize = True):
+    '''Fits the process to the values of some points.
+
+    Parameters
+    ----------
+    points : numpy.ndarray[float]
+      The points, one row per point, in the unit cube
+    values : numpy.ndarray[float]
+      The value of the function at each point
+    optimize : bool
+      Whether to pick the length scale and the noise again,
+      instead of keeping those of the last fit
+
+    Returns
+    -------
+    None
+    '''
+
+    self.points = np.asarray(points, dtype = np.float64)
+    values = np.asarray(values, dtype = np.float64)
+    self.mean = values.mean()
+    self.scale = values.std() if values.std() > 0 else 1
+    standardized = (values - self.mean) / self.scale
+
+    # Pick the length scale and noise with the highest marginal likelihood
+    if optimize:
+      bestLikelihood = -np.inf
+      for lengthScale in self.lengthScales:
+        for noise in self.noises:
+          cholesky = np.linalg.cholesky(
+            GaussianProcess.kernel(self.points, self.points, lengthScale) +
+            noise * np.eye(len(self.points))
+          )
+          weights = np.linalg.solve(cholesky.T, np.linalg.solve(cholesky, standardized))
+          likelihood = (
+            -0.5 * standardized @ weights -
+            np.log(np.diag(cholesky)).sum() -
+            0.5 * len(self.points) * log(2 * pi)
+          )
+          if likelihood > bestLikelihood:
+            bestLikelihood = likelihood
+            self.lengthScale = lengthScale
+            self.noise = noise
+
+    self.cholesky = np.linalg.cholesky(
+      GaussianProcess.kernel(self.points, self.points, self.lengthScale) +
+      self.noise * np.eye(len(self.points))
+    )
+    self.weights = np.linalg.solve(self.cholesky.T, np.linalg.solve(self.cholesky, standardized))
+
+  def predict(self, points):
+    '''Finds the mean and standard deviation of the function at some points.
+
+    The standard deviation is that of the function, without the noise
+
+    Parameters
+    ----------
+    points : numpy.ndarray[float]
+      The points, one row per point, in the unit cube
+
+    Returns
+    -------
+    mean : numpy.ndarray[float]
+      The mean of the function at each point
+    deviation : numpy.ndarray[float]
+      The standard deviation of the function at each point
+    '''
+
+    crossKernel = GaussianProcess.kernel(np.asarray(points, dtype = np.float64), self.points, self.lengthScale)
+    mean = crossKernel @ self.weights
+    solved = np.linalg.solve(self.cholesky, crossKernel.T)
+    variance = np.maximum(1 - (solved ** 2).sum(axis = 0), 1e-12)
+
+    return self.mean + self.scale * mean, self.scale * np.sqrt(variance)
+
+  @staticmethod
+  def kernel(a, b, lengthScale):
+    '''Finds the squared exponential kernel between two sets of points.
+
+    Parameters
+    ----------
+    a : numpy.ndarray[float]
+      The first points, one row per point
+    b : numpy.ndarray[float]
+      The second points, one row per point
+    lengthScale : float
+      The length scale of the kernel
+
+    Returns
+    -------
+    numpy.ndarray[float]
+      The kernel between each point of a (row) and each point of b (column)
+    '''
+
+    squaredDistance = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis = 2)
+    return np.exp(-0.5 * squaredDistance / lengthScale ** 2)
+
+  @staticmethod
+  def expectedImprovement(mean, deviation, best):
+    '''Finds the expected improvement below the best value at some points.
+
+    Parameters
+    ----------
+    mean : numpy.ndarray[float]
+      The mean of the function at each point
+    deviation : numpy.ndarray[float]
+      The standard deviation of the function at each point
+    best : float
+      The best (lowest) value so far
+
+    Returns
+    -------
+    numpy.ndarray[float]
+      The expected improvement at each point
+    '''
+
+    z = (best - mean) / deviation
+    cumulative = 0.5 * (1 + np.vectorize(erf)(z / sqrt(2)))
+    density = np.exp(-0.5 * z ** 2) / sqrt(2 * pi)
+    return (best - mean) * cumulative + deviation * density
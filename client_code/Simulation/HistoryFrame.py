@@ -0,0 +1,67 @@
+class HistoryFrame:
+  '''A frame of a simulation rebuilt from a FrameHistory.
+
+  Attributes
+  ----------
+  x : List[float]
+    The x coordinate of each person, by id
+  y : List[float]
+    The y coordinate of each person, by id
+  states : List[int]
+    The id of the state of each person, by id
+  isLockedDown : List[bool]
+    Whether each cell is under lockdown, numbered row by row
+  stateCounts : List[int]
+    The number of people in each state at the start of the frame
+  effectiveReproductionNumber : float
+    Effective reproduction number of the disease (Re)
+  averageContacts : float
+    Average number of susceptible contacts per infected person
+  doublingTime : float
+    Time it takes for the disease to double (Td)
+  hospitalOccupancy : float
+    Percentage of the population that is in the hospital
+  peakInfection : int
+    Maximum infected patients till the current frame
+
+  Methods
+  -------
+  __init__(x, y, states, isLockedDown, stateCounts, metrics)
+    Initializes the HistoryFrame object with some properties
+  '''
+
+  def __init__(self, x, y, states, isLockedDown, stateCounts, metrics):
+    '''Sets the people, lockdowns and metrics of the frame.
+
+    Parameters
+    ----------
+    x : List[float]
+      The x coordinate of each person, by id
+    y : List[float]
+      The y coordinate of each person, by id
+    states : List[int]
+      The id of the state of each person, by id
+    isLockedDown : List[bool]
+      Whether each cell is under lockdown, numbered row by row
+    stateCounts : List[int]
+      The number of people in each state at the start of the frame
+    metrics : Dict[str, float]
+      The value of each metric of the frame
+
+    Returns
+    -------
+    None
+    '''
+
+    self.x = x
+    self.y = y
+    self.states = states
+    self.isLockedDown = isLockedDown
+    self.stateCounts = stateCounts
+
+    # Set metrics
+    self.effectiveReproductionNumber = metrics['effectiveReproductionNumber']
+    self.averageContacts = metrics['averageContacts']
+    self.doublingTime = metrics['doublingTime']
+    self.hospitalOccupancy = metrics['hospitalOccupancy']
+    self.peakInfection = metrics['peakInfection']
@@ -1,6 +1,5 @@
-from random import random
-
 from Person import Person # type: ignore
+from Utils import Utils # type: ignore
 
 class Interventions:
   '''This class contains the functions for the intervention strategies
@@ -10,22 +9,36 @@ class Interventions:
 
   Methods
   -------
-  vaccinate(frame, params)
+  vaccinate(frame, frameCount, params, rng)
     Finds out who is vaccinated
-  lockdown(frame, params)
+  lockdown(frame, frameCount, params)
     Lockdown cells in the grid
+  compileLockdownSchedule(params, lockdownStrategies)
+    Finds whether there is a global lockdown in each frame
+  alternatingLockdown(params, frameCount)
+    Lockdown strategy: Alternating lockdown
+  daysOfWeekLockdown(params, frameCount)
+    Lockdown strategy: Days of the week lockdown
+  blockLockdown(params, frameCount)
+    Lockdown strategy: Block lockdown
+  scheduledLockdown(params, frameCount)
+    Lockdown strategy: Scheduled lockdown
   '''
 
   @staticmethod
-  def vaccinate(frame, params):
+  def vaccinate(frame, frameCount, params, rng):
     '''Find out who is vaccinated
 
     Parameters
     ----------
     frame : Frame
       The current frame of the simulation
+    frameCount : int
+      The current frame count of the simulation
     params : Params
       The parameters of the simulation
+    rng : random.Random
+      The random number generator of the simulation
     
     Returns
     -------
@@ -33,25 +46,38 @@ class Interventions:
       Cost of the vaccinations and hospitalization   in the frame
     '''
 
-    # Iterate through all susceptible people
-    # And find out who is vaccinated
+    # Find out which susceptible people are vaccinated
+    # Either draw for each person or skip between the vaccinated people
+    susceptible = frame.stateGroups.members(Person.SUSCEPTIBLE)
+    if params.VACCINATION_SAMPLING == 'skip':
+      vaccinated = Utils.sampleBernoulli(susceptible, params.VACCINATION_RATE, rng)
+    elif params.VACCINATION_SAMPLING == 'bernoulli':
+      vaccinated = [person for person in susceptible if rng.random() < params.VACCINATION_RATE]
+    else:
+      raise ValueError(f'Unknown vaccination sampling: {params.VACCINATION_SAMPLING}')
+
+    # Vaccination happens before the timers of the frame start,
+    # so the vaccinated people enter their state in the previous frame
     cost = 0
-    for row, col, personCount in frame.stateGroups[Person.SUSCEPTIBLE.id]:
-      person = frame.grid[row][col][personCount]
-      if random() < params.VACCINATION_RATE:
-        person.state = Person.VACCINATED
-        person.framesSinceLastState = 0
-        cost += params.VACCINATION_COST
+    for person in vaccinated:
+      frame.stateGroups.move(person, Person.VACCINATED, frameCount - 1)
+      cost += params.VACCINATION_COST
+    frame.agentsTouched += len(vaccinated)
     
     # Return cost
     return cost
   
   @staticmethod
-  def lockdown(frame, frameCount, params, lockdownStrategies):
+  def lockdown(frame, frameCount, params):
     '''Find out which cells are under lockdown
 
     Each cell is under lockdown if its infected population 
-    is greater than a certain percentage
+    is greater than a certain percentage.
+    The infected people in each cell are counted by the state groups,
+    so the people in the cells do not have to be checked,
+    and cells where nobody lives are never under lockdown.
+    Global lockdowns are read from the schedule compiled before the simulation starts,
+    and the cells are only changed when the lockdown starts or stops
     
     Parameters
     ----------
@@ -61,8 +87,6 @@ class Interventions:
       The current frame count of the simulation
     params : Params
       The parameters of the simulation
-    lockdownStrategies : Dict[str, func]
-      Dictionary of all lockdown strategies
     
     Returns
     -------
@@ -70,37 +94,72 @@ class Interventions:
       Cost of the lockdown of cells in the frame
     '''
 
-    # For global lockdowns, find if there is a lockdown
+    # For global lockdowns, every cell has the same lockdown
+    cellCount = len(frame.isLockedDown)
     if not params.LOCAL_LOCKDOWN:
-      lockdownStrategy = lockdownStrategies[params.LOCKDOWN_STRATEGY]
-      lockdownStatus = lockdownStrategy(params, frameCount)
-      params.LOCKDOWN_DAYS[frameCount] = lockdownStatus
+      lockdownStatus = params.LOCKDOWN_DAYS[frameCount]
+      if frame.lockedCount != (cellCount if lockdownStatus else 0):
+        frame.isLockedDown[:] = [lockdownStatus] * cellCount
+        frame.lockedCount = cellCount if lockdownStatus else 0
+      if not lockdownStatus:
+        return 0
+      return params.LOCKDOWN_COST * params.RULE_COMPLIANCE_RATE * params.POPULATION_SIZE
+
+    # Lift a global lockdown, which also locked down the cells where nobody lives
+    if frame.lockedCount > len(frame.occupiedCells):
+      frame.isLockedDown[:] = [False] * cellCount
+
+    # Find out which cells are under lockdown from the number of infected people in each cell,
+    # which the state groups keep up to date
+    infectedCounts = frame.stateGroups.cellCounts[Person.INFECTED.id]
+    lockedDownCount = 0
+    frame.lockedCount = 0
+    for cellIndex in frame.occupiedCells:
+      cellRow, cellCol = divmod(cellIndex, params.GRID_SIZE)
+      residents = len(frame.grid[cellRow][cellCol])
+      isLockedDown = infectedCounts[cellIndex] / residents >= params.LOCKDOWN_LEVEL
+      frame.isLockedDown[cellIndex] = isLockedDown
+
+      # Count the cells and the people in the cells under lockdown
+      if isLockedDown:
+        frame.lockedCount += 1
+        lockedDownCount += residents
 
-    # Iterate through all cells and find out which are under lockdown
-    cost = 0
-    for rowCount, row in enumerate(frame.grid):
-      for colCount, cell in enumerate(row):
-        # Find the number of infected people in the cell
-        infectedCount = 0
-        for person in cell:
-          infectedCount += person.state == Person.INFECTED
-        
-        # Check whether the cell should be under lockdown
-        if params.LOCAL_LOCKDOWN:
-          frame.isLockedDown[rowCount][colCount] = (
-            len(cell) > 0 and
-            infectedCount / len(cell) >= params.LOCKDOWN_LEVEL
-          )
-        else:
-          frame.isLockedDown[rowCount][colCount] = lockdownStatus
-
-        # Add to the cost if the cell is under lockdown
-        if frame.isLockedDown[rowCount][colCount]:
-          cost += params.LOCKDOWN_COST * params.RULE_COMPLIANCE_RATE * len(cell)
-    
     # Return cost
-    return cost
+    return params.LOCKDOWN_COST * params.RULE_COMPLIANCE_RATE * lockedDownCount
     
+  @staticmethod
+  def compileLockdownSchedule(params, lockdownStrategies):
+    '''Finds whether there is a global lockdown in each frame.
+
+    The schedule is compiled before the simulation starts,
+    and is used by the simulation, its cost and the graph of the lockdowns
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the simulation
+    lockdownStrategies : Dict[str, func]
+      Dictionary of all lockdown strategies
+
+    Returns
+    -------
+    List[bool]
+      Whether there is a global lockdown in each frame
+    '''
+
+    # There is no global lockdown if the lockdowns are disabled or local
+    if not params.LOCKDOWN_ENABLED or params.LOCAL_LOCKDOWN:
+      return [False] * params.SIMULATION_LENGTH
+
+    if params.LOCKDOWN_STRATEGY not in lockdownStrategies:
+      raise ValueError(f'Unknown lockdown strategy: {params.LOCKDOWN_STRATEGY}')
+    lockdownStrategy = lockdownStrategies[params.LOCKDOWN_STRATEGY]
+    return [
+      bool(lockdownStrategy(params, frameCount))
+      for frameCount in range(params.SIMULATION_LENGTH)
+    ]
+
   @staticmethod
   def alternatingLockdown(params, frameCount):
     '''Lockdown strategy: Alternating lockdown
@@ -112,13 +171,13 @@ class Interventions:
     ----------
     params : Params
       The parameters of the simulation
-    frameCount : int
-      The current frame count of the simulation
+    frameCount : int or numpy.ndarray[int]
+      The current frame count of the simulation, or an array of frame counts
 
     Returns
     -------
-    bool
-      Whether there is a lockdown
+    bool or numpy.ndarray[bool]
+      Whether there is a lockdown in each frame
     '''
 
     # Get start, stop values
@@ -127,16 +186,16 @@ class Interventions:
     framesOn = params.ALT_LOCKDOWN_FRAMES_ON
     framesOff = params.ALT_LOCKDOWN_FRAMES_OFF
 
-    # Check if the current frameCount is in the [start, stop] range
-    if frameCount < start or stop < frameCount:
-      return False
-    
-    # Check if frameCount is in the lockdown phase
-    return (frameCount - start) % (framesOn + framesOff) < framesOn
+    # Check if the frame count is in the [start, stop] range and in the lockdown phase
+    # The operators work on both numbers and arrays
+    return (
+      (start <= frameCount) & (frameCount <= stop) &
+      ((frameCount - start) % (framesOn + framesOff) < framesOn)
+    )
   
   @staticmethod
   def daysOfWeekLockdown(params, frameCount):
-    '''Lockdown strategy: Alternating lockdown
+    '''Lockdown strategy: Days of the week lockdown
 
     The entire simulation is on lockdown for certain days of the week
     in a given [start, stop] range, assuming Monday is the first day of the simulation
@@ -145,30 +204,32 @@ class Interventions:
     ----------
     params : Params
       The parameters of the simulation
-    frameCount : int
-      The current frame count of the simulation
+    frameCount : int or numpy.ndarray[int]
+      The current frame count of the simulation, or an array of frame counts
 
     Returns
     -------
-    bool
-      Whether there is a lockdown
+    bool or numpy.ndarray[bool]
+      Whether there is a lockdown in each frame
     '''
 
     # Get start, stop values
     start = params.LOCKDOWN_START
     stop = params.LOCKDOWN_STOP
 
-    # Check if the current frameCount is in the [start, stop] range
-    if frameCount < start or stop < frameCount:
-      return False
-    
-    # Check if frameCount is in the lockdown day of the week
-    day = frameCount % 7
-    return params.DAY_LOCKDOWN[day]
+    # Store the lockdown days of the week as the bits of a number,
+    # so that the day of each frame can be looked up in an array too
+    lockdownDays = sum(1 << day for day, isLockedDown in enumerate(params.DAY_LOCKDOWN) if isLockedDown)
+
+    # Check if the frame count is in the [start, stop] range and on a lockdown day of the week
+    return (
+      (start <= frameCount) & (frameCount <= stop) &
+      (((lockdownDays >> (frameCount % 7)) & 1) == 1)
+    )
     
   @staticmethod
   def blockLockdown(params, frameCount):
-    '''Lockdown strategy: Alternating lockdown
+    '''Lockdown strategy: Block lockdown
 
     The entire simulation is on lockdown in the [start, stop] range
 
@@ -176,18 +237,51 @@ class Interventions:
     ----------
     params : Params
       The parameters of the simulation
-    frameCount : int
-      The current frame count of the simulation
+    frameCount : int or numpy.ndarray[int]
+      The current frame count of the simulation, or an array of frame counts
 
     Returns
     -------
-    bool
-      Whether there is a lockdown
+    bool or numpy.ndarray[bool]
+      Whether there is a lockdown in each frame
     '''
 
     # Get start, stop values
     start = params.LOCKDOWN_START
     stop = params.LOCKDOWN_STOP
 
-    # Check if the current frameCount is in the [start, stop] range
-    return start <= frameCount and frameCount <= stop
+    # Check if the frame count is in the [start, stop] range
+    return (start <= frameCount) & (frameCount <= stop)
+
+  @staticmethod
+  def scheduledLockdown(params, frameCount):
+    '''Lockdown strategy: Scheduled lockdown
+
+    The entire simulation is on lockdown in the frames which are locked down
+    in the given schedule, and not after the end of the schedule
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the simulation
+    frameCount : int or numpy.ndarray[int]
+      The current frame count of the simulation, or an array of frame counts
+
+    Returns
+    -------
+    bool or numpy.ndarray[bool]
+      Whether there is a lockdown in each frame
+    '''
+
+    schedule = params.LOCKDOWN_SCHEDULE
+    if not hasattr(frameCount, 'shape'):
+      return frameCount < len(schedule) and bool(schedule[frameCount])
+
+    # Numpy is not available on the client, so it is only imported here
+    import numpy as np
+
+    frameCount = np.asarray(frameCount)
+    inSchedule = frameCount < len(schedule)
+    isLockedDown = np.zeros(frameCount.shape, dtype = bool)
+    isLockedDown[inSchedule] = np.asarray(schedule, dtype = bool)[frameCount[inSchedule]]
+    return isLockedDown
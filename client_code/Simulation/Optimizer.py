@@ -0,0 +1,343 @@
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from random import Random
+
+import numpy as np
+
+from Ensemble import Ensemble # type: ignore
+from GaussianProcess import GaussianProcess # type: ignore
+from Simulation import Simulation # type: ignore
+
+class Optimizer:
+  '''Bayesian optimization of numeric parameters of a simulation.
+
+  A Gaussian process is fitted to the objective of every evaluated set of parameters,
+  and the next batch of parameters is picked by its expected improvement.
+  The batch is picked one candidate at a time, assuming that each picked candidate
+  returns the best value so far (constant liar), so that the batch is spread out.
+  Every candidate is run with the same seeds, so the differences between
+  candidates are mostly caused by their parameters, and the noise which is left
+  is fitted by the Gaussian process
+
+  Attributes
+  ----------
+  params : Params
+    The parameters which are not searched
+  names : List[str]
+    The names of the searched parameters
+  lower : numpy.ndarray[float]
+    The lowest value of each searched parameter
+  upper : numpy.ndarray[float]
+    The highest value of each searched parameter
+  isInteger : numpy.ndarray[bool]
+    Whether each searched parameter is rounded to an integer
+  objective : Callable[[Dict[str, List[float]]], float]
+    Finds the value to minimize from the series of a simulation
+  batchSize : int
+    The number of candidates which are evaluated at once
+  replicates : int
+    The number of simulations of each candidate, whose objectives are averaged
+  initialPoints : int
+    The number of candidates picked at random before the Gaussian process is used
+  candidateCount : int
+    The number of random points at which the expected improvement is compared
+  maxWorkers : int
+    The number of processes, or None to use every core
+  stopConditions : List[Callable[[FrameSummary], bool]]
+    Conditions which end each simulation early
+  randomSeed : int
+    The root seed from which the seeds of the simulations are spawned
+  rng : numpy.random.Generator
+    The random number generator of the candidates
+  initialDesign : numpy.ndarray[float]
+    The latin hypercube of the candidates picked before the Gaussian process is used,
+    scaled to the unit cube
+  process : GaussianProcess
+    The model of the objective
+  points : List[numpy.ndarray[float]]
+    Each evaluated candidate, scaled to the unit cube
+  values : List[float]
+    The objective of each evaluated candidate
+
+  Methods
+  -------
+  __init__(params, bounds, objective, batchSize, replicates, initialPoints,
+           candidateCount, maxWorkers, stopConditions, randomSeed)
+    Creates an optimizer with no evaluated candidates
+  run(evaluations, executor)
+    Evaluates candidates until the budget runs out
+  suggest(count)
+    Picks the next candidates
+  evaluate(executor, points)
+    Finds the objective of some candidates
+  roundPoint(point)
+    Moves a point to the nearest point whose integer parameters are integers
+  findParameters(point)
+    Finds the values of the searched parameters of a point
+  best()
+    Finds the evaluated candidate with the lowest expected objective
+  evaluateReplicate(params, randomSeed, objective, stopConditions)
+    Runs one simulation of a candidate and finds its objective
+  '''
+
+  def __init__(self, params, bounds, objective, batchSize = 4, replicates = 1, initialPoints = None,
+               candidateCount = 2000, maxWorkers = None, stopConditions = (), randomSeed = None):
+    '''Creates an optimizer with no evaluated candidates.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters which are not searched
+    bounds : Dict[str, Tuple[float, float]]
+      The lowest and highest value of each searched parameter.
+      Parameters whose value in params is an integer are rounded
+    objective : Callable[[Dict[str, List[float]]], float]
+      Finds the value to minimize from the series of a simulation.
+      It runs in the worker processes, so it must be defined at the top level of a module
+    batchSize : int
+      The number of candidates which are evaluated at once
+    replicates : int
+      The number of simulations of each candidate, whose objectives are averaged
+    initialPoints : int
+      The number of candidates picked at random before the Gaussian process is used,
+      or None for one more than twice the number of searched parameters
+    candidateCount : int
+      The number of random points at which the expected improvement is compared
+    maxWorkers : int
+      The number of processes, or None to use every core
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions which end each simulation early
+    randomSeed : int
+      The root seed of the simulations and the candidates, or None to pick a new one
+
+    Returns
+    -------
+    None
+    '''
+
+    for name, (low, high) in bounds.items():
+      if not hasattr(params, name):
+        raise ValueError(f'Unknown parameter: {name}')
+      if not low < high:
+        raise ValueError(f'The bounds of {name} are empty: {low}, {high}')
+
+    self.params = params
+    self.names = list(bounds)
+    self.lower = np.array([bounds[name][0] for name in self.names], dtype = np.float64)
+    self.upper = np.array([bounds[name][1] for name in self.names], dtype = np.float64)
+    self.isInteger = np.array([
+      isinstance(getattr(params, name), int) and not isinstance(getattr(params, name), bool)
+      for name in self.names
+    ])
+    self.objective = objective
+    self.batchSize = batchSize
+    self.replicates = replicates
+    self.initialPoints = initialPoints if initialPoints is not None else 2 * len(self.names) + 1
+    self.candidateCount = candidateCount
+    self.maxWorkers = maxWorkers
+    self.stopConditions = stopConditions
+
+    if randomSeed is None:
+      randomSeed = Random().randrange(Simulation.MAX_RANDOM_SEED)
+    self.randomSeed = randomSeed
+    self.rng = np.random.default_rng(randomSeed)
+
+    # The initial candidates are one latin hypercube, which covers the range of every parameter,
+    # and each batch takes the next candidates of it
+    dimensions = len(self.names)
+    strata = np.array([self.rng.permutation(self.initialPoints) for _ in range(dimensions)]).T
+    self.initialDesign = (strata + self.rng.random((self.initialPoints, dimensions))) / self.initialPoints
+    self.process = GaussianProcess()
+    self.points = []
+    self.values = []
+
+  def run(self, evaluations, executor = None):
+    '''Evaluates candidates until the budget runs out.
+
+    Parameters
+    ----------
+    evaluations : int
+      The number of candidates to evaluate, each of which runs replicates simulations
+    executor : concurrent.futures.Executor
+      The pool in which the simulations run, or None to create one
+
+    Returns
+    -------
+    parameters : Dict[str, float]
+      The value of each searched parameter of the best candidate
+    value : float
+      The expected objective of the best candidate
+    '''
+
+    if executor is None:
+      with ProcessPoolExecutor(max_workers = self.maxWorkers) as executor:
+        return self.run(evaluations, executor)
+
+    while len(self.points) < evaluations:
+      points = self.suggest(min(self.batchSize, evaluations - len(self.points)))
+      self.values += self.evaluate(executor, points)
+      self.points += points
+
+    return self.best()
+
+  def suggest(self, count):
+    '''Picks the next candidates.
+
+    Parameters
+    ----------
+    count : int
+      The number of candidates
+
+    Returns
+    -------
+    List[numpy.ndarray[float]]
+      The candidates, scaled to the unit cube
+    '''
+
+    dimensions = len(self.names)
+
+    # Start with the next candidates of the latin hypercube
+    if len(self.points) < self.initialPoints:
+      return [
+        self.roundPoint(point)
+        for point in self.initialDesign[len(self.points):len(self.points) + count]
+      ]
+
+    # Pick each candidate with the highest expected improvement, and then
+    # assume it returns the best value so far before picking the next one
+    points = list(self.points)
+    values = list(self.values)
+    self.process.fit(np.array(points), np.array(values))
+    best = self.process.predict(np.array(points))[0].min()
+    suggestions = []
+    for _ in range(count):
+      candidates = self.rng.random((self.candidateCount, dimensions))
+      mean, deviation = self.process.predict(candidates)
+      point = self.roundPoint(candidates[np.argmax(
+        GaussianProcess.expectedImprovement(mean, deviation, best)
+      )])
+      suggestions.append(point)
+      points.append(point)
+      values.append(best)
+      self.process.fit(np.array(points), np.array(values), optimize = False)
+
+    return suggestions
+
+  def evaluate(self, executor, points):
+    '''Finds the objective of some candidates.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+      The pool in which the simulations run
+    points : List[numpy.ndarray[float]]
+      The candidates, scaled to the unit cube
+
+    Returns
+    -------
+    List[float]
+      The mean objective of the replicates of each candidate
+    '''
+
+    # Every candidate uses the same seeds
+    randomSeeds = Ensemble.spawnSeeds(self.randomSeed, self.replicates)
+    futures = []
+    for point in points:
+      params = deepcopy(self.params)
+      for name, value in self.findParameters(point).items():
+        setattr(params, name, value)
+      futures.append([
+        executor.submit(Optimizer.evaluateReplicate, params, randomSeed, self.objective, self.stopConditions)
+        for randomSeed in randomSeeds
+      ])
+
+    return [
+      sum(future.result() for future in replicates) / len(replicates)
+      for replicates in futures
+    ]
+
+  def roundPoint(self, point):
+    '''Moves a point to the nearest point whose integer parameters are integers.
+
+    Parameters
+    ----------
+    point : numpy.ndarray[float]
+      The point, scaled to the unit cube
+
+    Returns
+    -------
+    numpy.ndarray[float]
+      The moved point, scaled to the unit cube
+    '''
+
+    values = self.lower + point * (self.upper - self.lower)
+    values[self.isInteger] = np.round(values[self.isInteger])
+    return (values - self.lower) / (self.upper - self.lower)
+
+  def findParameters(self, point):
+    '''Finds the values of the searched parameters of a point.
+
+    Parameters
+    ----------
+    point : numpy.ndarray[float]
+      The point, scaled to the unit cube
+
+    Returns
+    -------
+    Dict[str, float]
+      The value of each searched parameter
+    '''
+
+    values = self.lower + point * (self.upper - self.lower)
+    return {
+      name: int(round(value)) if isInteger else float(value)
+      for name, value, isInteger in zip(self.names, values, self.isInteger)
+    }
+
+  def best(self):
+    '''Finds the evaluated candidate with the lowest expected objective.
+
+    The objective is noisy, so the candidates are compared by the mean of the Gaussian process
+    instead of their own objective
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    parameters : Dict[str, float]
+      The value of each searched parameter of the best candidate
+    value : float
+      The expected objective of the best candidate
+    '''
+
+    points = np.array(self.points)
+    self.process.fit(points, np.array(self.values))
+    mean = self.process.predict(points)[0]
+    bestIndex = int(np.argmin(mean))
+
+    return self.findParameters(points[bestIndex]), float(mean[bestIndex])
+
+  @staticmethod
+  def evaluateReplicate(params, randomSeed, objective, stopConditions):
+    '''Runs one simulation of a candidate and finds its objective.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the candidate
+    randomSeed : int
+      The seed of the simulation
+    objective : Callable[[Dict[str, List[float]]], float]
+      Finds the value to minimize from the series of the simulation
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions which end the simulation early
+
+    Returns
+    -------
+    float
+      The objective of the simulation
+    '''
+
+    series, _ = Ensemble.runReplicate(params, randomSeed, None, stopConditions)
+    return objective(series)
@@ -17,6 +17,12 @@ class Params:
     The maximum distance between two individuals who are in contact
   CONTACT_RADIUS_SQUARED : float
     The square of the CONTACT_RADIUS for easier calculations
+  CONTACT_INDEX : str
+    The method used to find agents in contact, 'sweep', 'grid' or 'kdtree' (requires scipy)
+  CONTACT_WORKERS : int
+    The number of threads which find the contacts in the cells at once in the object engine,
+    or None to check the cells one at a time. With threads, each cell draws from its own
+    random stream, so the results are the same for any number of threads
   TIME_PER_FRAME : float
     Time taken per frame
   GRID_SIZE : int
@@ -31,8 +37,22 @@ class Params:
     The probability of a person travelling to another cell
   TRAVEL_PROBABILITES : List[List[List[List[float]]]]
     The list of probabilities of going from one cell to another cell
+  TRAVEL_MODEL : str
+    How the destinations of travellers are found, 'matrix' (from TRAVEL_PROBABILITES)
+    or 'gravity' (generated from GRID_PROBABILITIES, for any grid size)
+  TRAVEL_CUTOFF : float
+    The furthest distance (in cells) travelled in the gravity model
+  TRAVEL_DISTANCE_EXPONENT : float
+    The power of the distance by which the gravity model divides the weight of a destination
+  TRAVEL_CACHE_SIZE : int
+    The number of origin cells whose destinations are cached
   RANDOM_SEED : int
     The seed for the random number generator used in the simulation
+  ENGINE : str
+    The engine used to run the simulation, 'object', 'array' (requires numpy)
+    or 'distributed' (requires numpy and runs tiles of the grid in worker processes)
+  DISTRIBUTED_WORKERS : int
+    The number of worker processes of the distributed engine, or None to use every core
   
   Metrics Parameters
   ------------------
@@ -86,6 +106,9 @@ class Params:
     The percentage of suseptible population which gets vaccinated in a day
   VACCINATION_COST : int
     The cost of one vaccination
+  VACCINATION_SAMPLING : str
+    How the vaccinated people are picked, 'skip' (geometric skips / binomial count)
+    or 'bernoulli' (one random number per susceptible person)
   INITIAL_VACCINATED : int
     The number of people who are vaccinated at the begining
 
@@ -95,8 +118,9 @@ class Params:
     Whether lockdown is enabled
   LOCKDOWN_COST : int
     The cost of lockdown per person per day
-  LOCKDOWN_DAYS : List[int]
-    The days on which a global lockdown are enabled
+  LOCKDOWN_DAYS : List[bool]
+    Whether a global lockdown is enabled on each day,
+    compiled from the lockdown strategy when the simulation starts
   LOCAL_LOCKDOWN : bool
     Whether the lockdown is local or global
   LOCKDOWN_STRATEGY : func
@@ -118,6 +142,8 @@ class Params:
     How long the lockdown is kept off for
   DAY_LOCKDOWN : List[bool]
     Which days of the week lockdown is enabled
+  LOCKDOWN_SCHEDULE : List[bool]
+    Whether lockdown is enabled on each day, for the 'schedule' strategy
   
   Hygiene measures Parameters
   ---------------------------
@@ -140,7 +166,8 @@ class Params:
   LOCKDOWN_STRATEGIES = {
     'alternating': Interventions.alternatingLockdown,
     'days-of-the-week': Interventions.daysOfWeekLockdown,
-    'block': Interventions.blockLockdown
+    'block': Interventions.blockLockdown,
+    'schedule': Interventions.scheduledLockdown
   }
   
   def __init__(self, **kwargs):
@@ -167,14 +194,22 @@ class Params:
     self.TRAVEL_RATE = 0.1
     self.COMORBIDITY_COEFFICIENTS = [0.7, 0.9, 1.1, 1.3]
     self.RANDOM_SEED = 0
+    self.ENGINE = 'object'
+    self.DISTRIBUTED_WORKERS = None
     self.GRID_PROBABILITIES = [0.1312769922816259, 0.1390833168942316, 0.3045853365542704, 0.4356598378729931, 0.5622315487782497, 0.661694550602876, 0.7233137507793976, 0.9097747150485921, 1.0]
     self.TRAVEL_PROBABILITES = [[[0.0, 0.10929820017699199, 0.27276162832436446, 0.3757530039414913, 0.4070611554404322, 0.5141784494471481, 0.6862885066982833, 0.8897540885298117, 1.0], [0.01276555432675935, 0.01276555432675935, 0.2549058943340527, 0.3165936951304174, 0.3313424092336104, 0.5261744388243516, 0.605427611942261, 0.8333672107397323, 1.0], [0.15892428359862334, 0.25671979924004384, 0.25671979924004384, 0.4112738227241321, 0.4689758058768651, 0.5133234764625129, 0.6529014952735729, 0.9486386571496084, 1.0]], [[0.10971379925019822, 0.2878653035220132, 0.32803681379718236, 0.32803681379718236, 0.41482954573864717, 0.5309870905775683, 0.6608006095631672, 0.75172681155559, 1.0], [0.009644405249296112, 0.2094320374511056, 0.4376333030633881, 0.45569664963375833, 0.45569664963375833, 0.7076895066463159, 0.8330073254559883, 0.901153496212128, 1.0], [0.06026892867591995, 0.19565788907547954, 0.32939093982734113, 0.5182163362815277, 0.6682045420575002, 0.6682045420575002, 0.8840014633111152, 0.9638518606813694, 1.0]], [[0.08414150309199522, 0.18637911894866807, 0.24348125544191232, 0.4330323728765049, 0.5914437868519774, 0.7308537039886345, 0.7308537039886345, 0.8950430045152277, 1.0], [0.19785810173842416, 0.2650401869246098, 0.319379404747021, 0.4786510388002174, 0.6844413299933607, 0.7661163638941053, 0.8477272086754665, 0.8477272086754665, 1.0], [0.2126451818934487, 0.26513495503947604, 0.3493490329508198, 0.6236939408914254, 0.6542097654894706, 0.688875326780259, 0.7852000076475122, 1.0, 1.0]]]
+    self.TRAVEL_MODEL = 'matrix'
+    self.TRAVEL_CUTOFF = 10
+    self.TRAVEL_DISTANCE_EXPONENT = 2
+    self.TRAVEL_CACHE_SIZE = 4096
     
     # Contact radius
     # The contact radius is a function of the population density
     # CONTACT_RADIUS = 3 / POPULATION_DENSITY
     self.CONTACT_RADIUS = 3 / self.POPULATION_SIZE
     self.CONTACT_RADIUS_SQUARED = self.CONTACT_RADIUS ** 2
+    self.CONTACT_INDEX = 'grid'
+    self.CONTACT_WORKERS = None
 
     # State transition related parameters
     self.INITIAL_INFECTED = 2
@@ -204,6 +239,7 @@ class Params:
     self.VACCINATION_START = 60
     self.VACCINATION_RATE = 0.01
     self.VACCINATION_COST = 1000
+    self.VACCINATION_SAMPLING = 'skip'
     self.INITIAL_VACCINATED = 0
 
     # Lockdown related parameters
@@ -220,6 +256,7 @@ class Params:
     self.ALT_LOCKDOWN_FRAMES_ON = 20
     self.ALT_LOCKDOWN_FRAMES_OFF = 10
     self.DAY_LOCKDOWN = [True, True, True, True, True, False, False]
+    self.LOCKDOWN_SCHEDULE = []
 
     # Hygiene related parameters
     self.HYGIENE_ENABLED = False
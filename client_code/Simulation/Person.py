@@ -6,21 +6,27 @@ class Person:
   and methods for each person / agent
   This includes properties like position, infection status,
   comorbidities, etc. and methods like move etc.
+  The attributes are slots, so people have no attribute dictionary,
+  and states are small integers, so they are compared like numbers
 
   Attributes
   ----------
-  cell : tuple(int)
-    The home cell of the person
+  id : int
+    The unique id of the person in the simulation
+  cell : int
+    The home cell of the person, numbered row by row
   x : int
     An integer which stores the X-coordinate of the person
   y : int
     An integer which stores the Y-coordinate of the person
-  home : tuple(int)
-    The location of the home of the person
+  homeX : float
+    The X-coordinate of the home of the person
+  homeY : float
+    The Y-coordinate of the home of the person
   state : State
     A variable which stores the current state of the person
-  framesSinceLastState : int
-    The number of days since the person was infected (default -1)
+  stateFrame : int
+    The frame in which the person entered the current state
   agentsInfected : int
     The number of agents infected from start of infection
   agentsContacted : int
@@ -43,7 +49,7 @@ class Person:
 
   Methods
   -------
-  __init__()
+  __init__(personID, cell, x, y, followsRules, state, age)
     Initializes the person object with some properties
 
   Classes
@@ -52,14 +58,17 @@ class Person:
     The state of the person
   '''
 
-  class State:
+  class State(int):
     '''Enum which contains various states of the disease and their colors.
+
+    Each state is the integer of its ID, so states are compared and hashed
+    like integers, and the states of the people can be looked up in Person.states
     
     Attributes
     ----------
     name : str
       The name of the state
-    stateID : int
+    id : int
       The ID of the current state
     color : str
       The color of the current state
@@ -68,61 +77,105 @@ class Person:
     
     Methods
     -------
-    __init__()
-      Initalizes the State
-    __eq__()
-      Checks if two states are the same
-    __hash__()
-      Hashes the state
+    __new__(name, stateID, color, toGraph)
+      Creates the State
+    __reduce__()
+      Pickles the state as its ID
+    __copy__()
+      Copies the state, which is the state itself
+    __deepcopy__(memo)
+      Copies the state, which is the state itself
+    fromID(stateID)
+      Finds the state with an ID
     '''
 
-    def __init__(self, name, stateID, color, toGraph):
-      '''Sets some initial parameters for the state
+    def __new__(cls, name, stateID, color, toGraph):
+      '''Creates the state
       
       Parameters
       ----------
-      state : str
-        The state of the state object
+      name : str
+        The name of the state
+      stateID : int
+        The ID of the state
+      color : str
+        The color of the state
+      toGraph : bool
+        Whether the state is to be graphed
       
       Returns
       -------
-      None
+      State
+        The state
       '''
 
-      self.name = name
-      self.id = stateID
-      self.color = color
-      self.toGraph = toGraph
-    
-    def __eq__(self, other):
-      '''Checks if 2 states are equal
+      state = int.__new__(cls, stateID)
+      state.name = name
+      state.id = stateID
+      state.color = color
+      state.toGraph = toGraph
+      return state
+
+    def __reduce__(self):
+      '''Pickles the state as its ID, so that it is the same state when it is unpickled
       
       Parameters
       ----------
-      other : State
-        The other state
+
+      Returns
+      -------
+      Tuple[Callable, Tuple[int]]
+        The function which finds the state and its ID
+      '''
+
+      return (Person.State.fromID, (self.id,))
+
+    def __copy__(self):
+      '''Copies the state, which is the state itself
       
+      Parameters
+      ----------
+
       Returns
       -------
-      bool
-        Whether the states are equal
+      State
+        The state
       '''
 
-      return self.id == other.id
-    
-    def __hash__(self):
-      '''Hashes the state for use in dict or set
+      return self
+
+    def __deepcopy__(self, memo):
+      '''Copies the state, which is the state itself
+      
+      Parameters
+      ----------
+      memo : Dict
+        The objects which have already been copied
+
+      Returns
+      -------
+      State
+        The state
+      '''
+
+      return self
+
+    @staticmethod
+    def fromID(stateID):
+      '''Finds the state with an ID
       
       Parameters
       ----------
+      stateID : int
+        The ID of the state
 
       Returns
       -------
-      int
-        The hash value
+      State
+        The state
       '''
 
-      return self.id
+      return Person.states[stateID]
   
   # Define the states
   SUSCEPTIBLE = State('SUSCEPTIBLE', 0, 'green', True)
@@ -141,28 +194,58 @@ class Person:
     VACCINATED
   ]
 
-  def __init__(self, cell, x, y, followsRules, state, age):
+  # The attributes of a person, which are stored in slots instead of a dictionary
+  __slots__ = (
+    'id',
+    'cell',
+    'x',
+    'y',
+    'homeX',
+    'homeY',
+    'state',
+    'stateFrame',
+    'agentsInfected',
+    'agentsContacted',
+    'followsRules',
+    'isVisiting',
+    'age'
+  )
+
+  def __init__(self, personID, cell, x, y, followsRules, state, age):
     '''Sets some initial parameters for the person.
 
     Parameters
     ----------
-    startX : int
-      The starting X coordinate
-    startY : int
-      The starting Y coordinate
+    personID : int
+      The unique id of the person
+    cell : int
+      The home cell of the person, numbered row by row
+    x : float
+      The starting X coordinate, which is the home of the person
+    y : float
+      The starting Y coordinate, which is the home of the person
+    followsRules : bool
+      Whether the person follows rules
+    state : State
+      The starting state of the person
+    age : int
+      The age category of the person
     
     Returns
     -------
     None
     '''
 
+    self.id = personID
     self.cell = cell
     self.x = x
     self.y = y
-    self.home = (self.x, self.y)
+    self.homeX = x
+    self.homeY = y
     self.state = state
-    self.framesSinceLastState = 0
+    self.stateFrame = 0
     self.agentsInfected = 0
     self.agentsContacted = 0
     self.followsRules = followsRules
+    self.isVisiting = False
     self.age = age
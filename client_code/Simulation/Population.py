@@ -0,0 +1,147 @@
+import numpy as np
+
+class Population:
+  '''Stores the agents of the simulation as contiguous numpy columns.
+
+  Every agent is identified by its index in the columns, which replaces
+  the Person objects of the object engine in the array engine.
+  The columns can be placed one after another in a buffer, such as shared memory,
+  so that several processes work on the same agents
+
+  Attributes
+  ----------
+  size : int
+    The number of agents in the population
+  x : numpy.ndarray[float]
+    The X-coordinate of each agent
+  y : numpy.ndarray[float]
+    The Y-coordinate of each agent
+  homeX : numpy.ndarray[float]
+    The X-coordinate of the home of each agent
+  homeY : numpy.ndarray[float]
+    The Y-coordinate of the home of each agent
+  state : numpy.ndarray[int]
+    The id of the current state of each agent
+  stateFrame : numpy.ndarray[int]
+    The frame in which each agent entered its current state
+  followsRules : numpy.ndarray[bool]
+    Whether each agent follows rules like social distancing and wearing mask
+  age : numpy.ndarray[int]
+    The age category of each agent
+  cell : numpy.ndarray[int]
+    The index (row * GRID_SIZE + col) of the home cell of each agent
+  visiting : numpy.ndarray[int]
+    The index of the cell each agent is visiting, -1 if the agent is at home
+  agentsInfected : numpy.ndarray[int]
+    The number of agents infected by each agent from the start of its infection
+  agentsContacted : numpy.ndarray[int]
+    The number of susceptible agents contacted by each agent from the start of its infection
+
+  Methods
+  -------
+  __init__(size, buffer)
+    Allocates the columns for the population
+  bufferSize(size)
+    Finds the number of bytes of a buffer for the columns of a population
+  activeCell()
+    Finds the cell in which each agent currently is
+  '''
+
+  # The names of the columns of the population
+  COLUMNS = (
+    'x',
+    'y',
+    'homeX',
+    'homeY',
+    'state',
+    'stateFrame',
+    'followsRules',
+    'age',
+    'cell',
+    'visiting',
+    'agentsInfected',
+    'agentsContacted'
+  )
+
+  # The type of each column
+  TYPES = {
+    'x': np.float64,
+    'y': np.float64,
+    'homeX': np.float64,
+    'homeY': np.float64,
+    'state': np.int8,
+    'stateFrame': np.int32,
+    'followsRules': bool,
+    'age': np.int8,
+    'cell': np.int32,
+    'visiting': np.int32,
+    'agentsInfected': np.int32,
+    'agentsContacted': np.int32
+  }
+
+  def __init__(self, size, buffer = None):
+    '''Allocates the columns for the population.
+
+    Parameters
+    ----------
+    size : int
+      The number of agents in the population
+    buffer : Buffer
+      The buffer in which the columns are placed, of at least bufferSize(size) bytes,
+      or None to allocate new columns. The columns in a buffer are not initialized
+
+    Returns
+    -------
+    None
+    '''
+
+    self.size = size
+    if buffer is None:
+      for name in Population.COLUMNS:
+        setattr(self, name, np.zeros(size, dtype = Population.TYPES[name]))
+      self.visiting[:] = -1
+      return
+
+    # Start each column at a multiple of 8 bytes
+    offset = 0
+    for name in Population.COLUMNS:
+      dtype = np.dtype(Population.TYPES[name])
+      setattr(self, name, np.ndarray(size, dtype = dtype, buffer = buffer, offset = offset))
+      offset += -(-size * dtype.itemsize // 8) * 8
+
+  @staticmethod
+  def bufferSize(size):
+    '''Finds the number of bytes of a buffer for the columns of a population.
+
+    Parameters
+    ----------
+    size : int
+      The number of agents in the population
+
+    Returns
+    -------
+    int
+      The number of bytes
+    '''
+
+    return sum(
+      -(-size * np.dtype(Population.TYPES[name]).itemsize // 8) * 8
+      for name in Population.COLUMNS
+    )
+
+  def activeCell(self):
+    '''Finds the cell in which each agent currently is.
+
+    Agents that are visiting another cell are in the cell they are visiting,
+    all other agents are in their home cell
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    numpy.ndarray[int]
+      The index of the cell in which each agent currently is
+    '''
+
+    return np.where(self.visiting >= 0, self.visiting, self.cell)
@@ -0,0 +1,183 @@
+import json
+from os import getpid
+from time import perf_counter, time
+
+class Profiler:
+  '''Times the phases of each frame of a simulation and counts their work.
+
+  A simulation is profiled by setting its profiler attribute.
+  The simulation marks the start of each phase of a frame with lap,
+  which ends the previous phase, and does nothing else when it has no profiler.
+  The wall time, the agents touched, the contacts tested and the infections drawn
+  of each phase are added to the totals of the phase, passed to the callback
+  after each frame, and recorded as Chrome trace events.
+  The phases count their own work in the counters of the frame, which the profiler reads.
+  The agents touched by a phase are the living agents it moves,
+  or the agents whose state it changes, even if another phase changes them back
+
+  Attributes
+  ----------
+  callback : Callable[[int, Dict[str, Dict[str, float]]], None]
+    Called after each frame with its frame count and the statistics of its phases, or None
+  trace : bool
+    Whether to record trace events
+  processID : int
+    The process of the trace events
+  threadID : int
+    The thread of the trace events, which separates the simulations of a process
+  origin : float
+    The wall clock time (in seconds) at which perf_counter was 0
+  phases : Dict[str, Dict[str, float]]
+    The number of calls, wall time (in seconds), agents touched, contacts tested
+    and infections drawn of each phase over all frames
+  events : List[Dict]
+    The trace events of the phases
+  phase : str
+    The phase which is running, or None
+  phaseStart : float
+    The time at which the phase started
+  before : Tuple[int, int, int]
+    The agents touched, contacts tested and infections drawn of the frame at the start of the phase
+  frameStatistics : Dict[str, Dict[str, float]]
+    The statistics of each phase of the current frame
+
+  Methods
+  -------
+  __init__(callback, trace, threadID)
+    Creates a profiler with no phases
+  lap(phase, simulation, frame)
+    Ends the running phase and starts the next one
+  merge(profiler)
+    Adds the phases and trace events of another profiler
+  exportTrace(path)
+    Writes the trace events as Chrome trace event JSON
+  '''
+
+  # The statistics of each phase
+  STATISTICS = ('calls', 'time', 'agentsTouched', 'contactsTested', 'infectionsDrawn')
+
+  def __init__(self, callback = None, trace = True, threadID = 0):
+    '''Creates a profiler with no phases.
+
+    Parameters
+    ----------
+    callback : Callable[[int, Dict[str, Dict[str, float]]], None]
+      Called after each frame with its frame count and the statistics of its phases, or None
+    trace : bool
+      Whether to record trace events
+    threadID : int
+      The thread of the trace events, which separates the simulations of a process
+
+    Returns
+    -------
+    None
+    '''
+
+    self.callback = callback
+    self.trace = trace
+    self.processID = getpid()
+    self.threadID = threadID
+    self.origin = time() - perf_counter()
+    self.phases = {}
+    self.events = []
+    self.phase = None
+    self.phaseStart = 0
+    self.before = None
+    self.frameStatistics = {}
+
+  def lap(self, phase, simulation, frame):
+    '''Ends the running phase and starts the next one.
+
+    Parameters
+    ----------
+    phase : str
+      The name of the next phase, or None to end the frame
+    simulation : Simulation
+      The simulation, from either engine
+    frame : Frame
+      The current frame of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    end = perf_counter()
+
+    if self.phase is not None:
+      # Find the work of the phase from the counters of the frame
+      beforeAgents, beforeContacts, beforeInfections = self.before
+      statistics = {
+        'calls': 1,
+        'time': end - self.phaseStart,
+        'agentsTouched': int(frame.agentsTouched - beforeAgents),
+        'contactsTested': int(frame.contactsTested - beforeContacts),
+        'infectionsDrawn': int(frame.infectionsDrawn - beforeInfections)
+      }
+
+      # Add the phase to the totals and to the frame
+      totals = self.phases.setdefault(self.phase, dict.fromkeys(Profiler.STATISTICS, 0))
+      for name, value in statistics.items():
+        totals[name] += value
+      self.frameStatistics[self.phase] = statistics
+
+      if self.trace:
+        self.events.append({
+          'name': self.phase,
+          'cat': 'simulation',
+          'ph': 'X',
+          'ts': (self.origin + self.phaseStart) * 1e6,
+          'dur': (end - self.phaseStart) * 1e6,
+          'pid': self.processID,
+          'tid': self.threadID,
+          'args': dict(statistics, frame = simulation.frameCount)
+        })
+
+    if phase is None:
+      # The frame is over
+      if self.callback is not None:
+        self.callback(simulation.frameCount, self.frameStatistics)
+      self.frameStatistics = {}
+    else:
+      self.before = (frame.agentsTouched, frame.contactsTested, frame.infectionsDrawn)
+
+    # Do not count the time of the profiler in the next phase
+    self.phase = phase
+    self.phaseStart = perf_counter()
+
+  def merge(self, profiler):
+    '''Adds the phases and trace events of another profiler.
+
+    Parameters
+    ----------
+    profiler : Profiler
+      The other profiler, for example of a simulation in a worker process
+
+    Returns
+    -------
+    None
+    '''
+
+    for phase, statistics in profiler.phases.items():
+      totals = self.phases.setdefault(phase, dict.fromkeys(Profiler.STATISTICS, 0))
+      for name, value in statistics.items():
+        totals[name] += value
+    self.events += profiler.events
+
+  def exportTrace(self, path):
+    '''Writes the trace events as Chrome trace event JSON.
+
+    The file can be opened in chrome://tracing or Perfetto
+
+    Parameters
+    ----------
+    path : str
+      The path of the file
+
+    Returns
+    -------
+    None
+    '''
+
+    with open(path, 'w') as traceFile:
+      json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, traceFile)
@@ -0,0 +1,242 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from math import inf, sqrt
+from os import cpu_count
+
+from Ensemble import Ensemble # type: ignore
+from ScenarioTree import ScenarioTree # type: ignore
+
+class ReplicateController:
+  '''Runs replicates of the scenarios of a sweep until their outcomes are precise enough.
+
+  The controller keeps starting replicates of the scenario tree, but each replicate
+  only runs the scenarios whose confidence interval of the mean outcome is still too wide.
+  The most uncertain scenarios are run first when the budget runs low,
+  so the simulations go to the scenarios which are still uncertain
+
+  Attributes
+  ----------
+  tree : ScenarioTree
+    The sweep whose scenarios are run
+  outcomeName : str
+    The name of the value returned by the outcome function of the tree whose mean is estimated
+  width : float
+    The widest confidence interval of the mean outcome which is precise enough
+  confidence : float
+    The probability that the confidence interval contains the mean outcome
+  minReplicates : int
+    The number of replicates of each scenario before its confidence interval is checked
+  budget : int
+    The most simulations of all scenarios, or None for no limit
+  simulations : int
+    The number of simulations which have been started
+  pending : List[int]
+    The number of running replicates of each scenario
+  futures : Dict[Future, List[int]]
+    The indices of the scenarios of each running replicate
+
+  Methods
+  -------
+  __init__(tree, outcomeName, width, confidence, minReplicates, budget)
+    Creates a controller with no running replicates
+  run(executor)
+    Runs replicates until every scenario is precise enough or the budget runs out
+  submit(executor, scenarios)
+    Starts a replicate of some scenarios
+  findUncertain()
+    Finds the scenarios which need another replicate
+  report()
+    Finds the precision of the mean outcome of each scenario
+  '''
+
+  def __init__(self, tree, outcomeName, width, confidence = 0.95, minReplicates = 3, budget = None):
+    '''Creates a controller with no running replicates.
+
+    The replicates which the tree has already collected are kept,
+    and the new replicates are spawned after them
+
+    Parameters
+    ----------
+    tree : ScenarioTree
+      The sweep whose scenarios are run
+    outcomeName : str
+      The name of the value returned by the outcome function of the tree whose mean is estimated
+    width : float
+      The widest confidence interval of the mean outcome which is precise enough
+    confidence : float
+      The probability that the confidence interval contains the mean outcome
+    minReplicates : int
+      The number of replicates of each scenario before its confidence interval is checked,
+      which must be at least 2
+    budget : int
+      The most simulations of all scenarios, or None for no limit
+
+    Returns
+    -------
+    None
+    '''
+
+    if minReplicates < 2:
+      raise ValueError(f'At least 2 replicates are needed for a confidence interval, not {minReplicates}')
+
+    self.tree = tree
+    self.outcomeName = outcomeName
+    self.width = width
+    self.confidence = confidence
+    self.minReplicates = minReplicates
+    self.budget = budget
+    self.simulations = 0
+    self.pending = [0] * len(tree.scenarios)
+    self.futures = {}
+
+  def run(self, executor = None):
+    '''Runs replicates until every scenario is precise enough or the budget runs out.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+      The pool in which the replicates run, or None to create one
+
+    Returns
+    -------
+    List[Dict[str, float]]
+      The precision of the mean outcome of each scenario
+    '''
+
+    if executor is None:
+      with ProcessPoolExecutor(max_workers = self.tree.maxWorkers) as executor:
+        return self.run(executor)
+
+    workers = self.tree.maxWorkers or cpu_count()
+    while True:
+      # Start replicates of the uncertain scenarios while there are free workers
+      while len(self.futures) < workers:
+        scenarios = self.findUncertain()
+        if not scenarios:
+          break
+        self.submit(executor, scenarios)
+      if not self.futures:
+        break
+
+      # Add the replicates which finish to their scenarios
+      done, _ = wait(self.futures, return_when = FIRST_COMPLETED)
+      for future in done:
+        scenarios = self.futures.pop(future)
+        for scenario, (series, outcomes) in zip(scenarios, future.result()):
+          if self.outcomeName not in outcomes:
+            raise ValueError(f'The outcome function does not return {self.outcomeName}')
+          self.pending[scenario] -= 1
+          self.tree.ensembles[scenario].addReplicate(series, outcomes)
+
+    return self.report()
+
+  def submit(self, executor, scenarios):
+    '''Starts a replicate of some scenarios.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+      The pool in which the replicate runs
+    scenarios : List[int]
+      The indices of the scenarios
+
+    Returns
+    -------
+    None
+    '''
+
+    # Every scenario of the replicate uses the same seed
+    randomSeed = Ensemble.spawnSeed(self.tree.randomSeed, self.tree.replicates)
+    self.tree.replicates += 1
+    self.tree.randomSeeds.append(randomSeed)
+    for scenario in scenarios:
+      ensemble = self.tree.ensembles[scenario]
+      ensemble.replicates += 1
+      ensemble.randomSeeds.append(randomSeed)
+      self.pending[scenario] += 1
+    self.simulations += len(scenarios)
+
+    future = executor.submit(
+      ScenarioTree.runReplicate,
+      [self.tree.scenarios[scenario] for scenario in scenarios],
+      randomSeed,
+      self.tree.outcome,
+      self.tree.stopConditions
+    )
+    self.futures[future] = scenarios
+
+  def findUncertain(self):
+    '''Finds the scenarios which need another replicate.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    List[int]
+      The indices of the scenarios, which fit in the rest of the budget
+    '''
+
+    uncertainty = {}
+    for scenario, ensemble in enumerate(self.tree.ensembles):
+      statistics = ensemble.outcomes.get(self.outcomeName)
+      count = statistics.count if statistics is not None else 0
+      expectedCount = count + self.pending[scenario]
+      if expectedCount < self.minReplicates:
+        uncertainty[scenario] = inf
+        continue
+      if count < 2:
+        # Wait for the running replicates
+        continue
+
+      # The interval narrows with the square root of the number of replicates,
+      # so the running replicates are expected to narrow it further
+      low, high = statistics.confidenceInterval(self.confidence)
+      width = (high - low) * sqrt(count / expectedCount)
+      if width > self.width:
+        uncertainty[scenario] = width / self.width
+
+    # Spend the rest of the budget on the most uncertain scenarios
+    scenarios = sorted(uncertainty, key = uncertainty.get, reverse = True)
+    if self.budget is not None:
+      scenarios = scenarios[:max(0, self.budget - self.simulations)]
+    return sorted(scenarios)
+
+  def report(self):
+    '''Finds the precision of the mean outcome of each scenario.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    List[Dict[str, float]]
+      The number of replicates, the mean outcome, the lowest and highest value
+      and the width of its confidence interval, and whether the width is narrow enough,
+      for each scenario
+    '''
+
+    report = []
+    for ensemble in self.tree.ensembles:
+      statistics = ensemble.outcomes.get(self.outcomeName)
+      if statistics is None:
+        report.append({
+          'replicates': 0,
+          'mean': None,
+          'low': None,
+          'high': None,
+          'width': inf,
+          'precise': False
+        })
+        continue
+
+      low, high = statistics.confidenceInterval(self.confidence)
+      report.append({
+        'replicates': statistics.count,
+        'mean': statistics.mean,
+        'low': low,
+        'high': high,
+        'width': high - low,
+        'precise': high - low <= self.width
+      })
+
+    return report
@@ -0,0 +1,346 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from random import Random
+
+from Ensemble import Ensemble # type: ignore
+from FrameSummary import FrameSummary # type: ignore
+from Interventions import Interventions # type: ignore
+from Params import Params # type: ignore
+from Simulation import Simulation # type: ignore
+
+class ScenarioTree:
+  '''Runs a sweep of lockdown scenarios which share the frames before their lockdowns differ.
+
+  The scenarios of a sweep only differ in their lockdown parameters,
+  so they run the same simulation until the first frame in which their lockdowns differ.
+  Each replicate runs the shared frames once, and copies the simulation
+  for each group of scenarios whose lockdowns differ in the next frame.
+  The groups are split again whenever their lockdowns differ, so the scenarios
+  form a tree whose root is the frames shared by every scenario.
+  Every scenario of a replicate uses the same random numbers until its branch,
+  so the differences between the scenarios are only caused by their lockdowns
+
+  Attributes
+  ----------
+  scenarios : List[Params]
+    The parameters of each scenario
+  replicates : int
+    The number of simulations of each scenario
+  maxWorkers : int
+    The number of processes, or None to use every core
+  randomSeed : int
+    The root seed from which the seed of each replicate is spawned
+  randomSeeds : List[int]
+    The seed of each replicate, which is shared by every scenario
+  outcome : Callable[[Dict[str, List[float]]], Dict[str, float]]
+    Finds values which summarize a whole simulation from its series, or None
+  stopConditions : List[Callable[[FrameSummary], bool]]
+    Conditions which end each branch early
+  ensembles : List[Ensemble]
+    The statistics of the replicates of each scenario
+  futures : List[Future]
+    The replicates which have been submitted but not collected
+
+  Methods
+  -------
+  __init__(scenarios, replicates, quantiles, maxWorkers, randomSeed, outcome, stopConditions)
+    Creates a sweep with no finished replicates
+  run(executor)
+    Runs all replicates of every scenario and aggregates their frames
+  submit(executor)
+    Starts all replicates in a process pool
+  collect()
+    Aggregates the replicates as they finish
+  findLockdownSchedule(params)
+    Finds whether there is a lockdown in each frame of a scenario
+  runReplicate(scenarios, randomSeed, outcome, stopConditions)
+    Runs one simulation of every scenario and finds the series of their frames
+  runBranch(simulation, frame, group, scenarios, schedules, summaries, results, stopConditions)
+    Continues a simulation for a group of scenarios, splitting it when their lockdowns differ
+  useScenario(simulation, params)
+    Changes the lockdown parameters of a simulation to those of a scenario
+  '''
+
+  # The parameters which may differ between the scenarios
+  SCENARIO_PARAMETERS = (
+    'LOCKDOWN_ENABLED',
+    'LOCKDOWN_STRATEGY',
+    'LOCKDOWN_START',
+    'LOCKDOWN_STOP',
+    'ALT_LOCKDOWN_FRAMES_ON',
+    'ALT_LOCKDOWN_FRAMES_OFF',
+    'DAY_LOCKDOWN',
+    'LOCKDOWN_SCHEDULE'
+  )
+
+  def __init__(self, scenarios, replicates, quantiles = (0.05, 0.5, 0.95), maxWorkers = None,
+               randomSeed = None, outcome = None, stopConditions = ()):
+    '''Creates a sweep with no finished replicates.
+
+    Parameters
+    ----------
+    scenarios : List[Params]
+      The parameters of each scenario, which may only differ in their lockdown parameters.
+      Local lockdowns depend on the simulation, so they cannot be used
+    replicates : int
+      The number of simulations of each scenario
+    quantiles : List[float]
+      The quantiles of each value which are estimated
+    maxWorkers : int
+      The number of processes, or None to use every core
+    randomSeed : int
+      The root seed of the simulations, or None to pick a new one
+    outcome : Callable[[Dict[str, List[float]]], Dict[str, float]]
+      Finds values which summarize a whole simulation from its series.
+      It runs in the worker processes, so it must be defined at the top level of a module
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions which end each branch early, so that its scenarios are not split any more
+
+    Returns
+    -------
+    None
+    '''
+
+    # Check that the scenarios can share their frames
+    shared = [
+      {name: value for name, value in params.__dict__.items()
+       if name not in ScenarioTree.SCENARIO_PARAMETERS}
+      for params in scenarios
+    ]
+    for params, parameters in zip(scenarios, shared):
+      if parameters != shared[0]:
+        raise ValueError('The scenarios may only differ in their lockdown parameters')
+      if params.LOCKDOWN_ENABLED and params.LOCAL_LOCKDOWN:
+        raise ValueError('The scenarios cannot use local lockdowns')
+
+    self.scenarios = scenarios
+    self.replicates = replicates
+    self.maxWorkers = maxWorkers
+    self.outcome = outcome
+    self.stopConditions = stopConditions
+    self.futures = []
+
+    # Every scenario uses the same seeds, so that their replicates can be compared
+    if randomSeed is None:
+      randomSeed = Random().randrange(Simulation.MAX_RANDOM_SEED)
+    self.randomSeed = randomSeed
+    self.randomSeeds = Ensemble.spawnSeeds(randomSeed, replicates)
+    self.ensembles = [
+      Ensemble(params, replicates, quantiles, maxWorkers, randomSeed, outcome, stopConditions)
+      for params in scenarios
+    ]
+
+  def run(self, executor = None):
+    '''Runs all replicates of every scenario and aggregates their frames.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+      The pool in which the replicates run, or None to create one
+
+    Returns
+    -------
+    List[Ensemble]
+      The statistics of the replicates of each scenario
+    '''
+
+    if executor is None:
+      with ProcessPoolExecutor(max_workers = self.maxWorkers) as executor:
+        self.submit(executor)
+        return self.collect()
+
+    self.submit(executor)
+    return self.collect()
+
+  def submit(self, executor):
+    '''Starts all replicates in a process pool.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+      The pool in which the replicates run
+
+    Returns
+    -------
+    None
+    '''
+
+    self.futures += [
+      executor.submit(
+        ScenarioTree.runReplicate,
+        self.scenarios,
+        randomSeed,
+        self.outcome,
+        self.stopConditions
+      )
+      for randomSeed in self.randomSeeds
+    ]
+
+  def collect(self):
+    '''Aggregates the replicates as they finish.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    List[Ensemble]
+      The statistics of the replicates of each scenario
+    '''
+
+    for future in as_completed(self.futures):
+      for ensemble, (series, outcomes) in zip(self.ensembles, future.result()):
+        ensemble.addReplicate(series, outcomes)
+    self.futures = []
+
+    return self.ensembles
+
+  @staticmethod
+  def findLockdownSchedule(params):
+    '''Finds whether there is a lockdown in each frame of a scenario.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the scenario
+
+    Returns
+    -------
+    List[bool]
+      Whether there is a lockdown in each frame
+    '''
+
+    return Interventions.compileLockdownSchedule(params, Params.LOCKDOWN_STRATEGIES)
+
+  @staticmethod
+  def runReplicate(scenarios, randomSeed, outcome, stopConditions = ()):
+    '''Runs one simulation of every scenario and finds the series of their frames.
+
+    Parameters
+    ----------
+    scenarios : List[Params]
+      The parameters of each scenario
+    randomSeed : int
+      The seed of the simulations
+    outcome : Callable[[Dict[str, List[float]]], Dict[str, float]]
+      Finds values which summarize a simulation from its series, or None
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions which end each branch early
+
+    Returns
+    -------
+    List[Tuple[Dict[str, List[float]], Dict[str, float]]]
+      The series of each scenario and the values returned by the outcome function
+    '''
+
+    # The simulation changes some parameters, so it gets its own copy
+    simulation = Simulation.create(deepcopy(scenarios[0]), randomSeed)
+    frame = simulation.start()
+    summaries = [FrameSummary(simulation.frameCount, frame, simulation.interventionCost)]
+
+    results = [None] * len(scenarios)
+    ScenarioTree.runBranch(
+      simulation,
+      frame,
+      list(range(len(scenarios))),
+      scenarios,
+      [ScenarioTree.findLockdownSchedule(params) for params in scenarios],
+      summaries,
+      results,
+      stopConditions
+    )
+
+    return [
+      (series, (outcome(series) if outcome is not None else {}))
+      for series in results
+    ]
+
+  @staticmethod
+  def runBranch(simulation, frame, group, scenarios, schedules, summaries, results,
+                stopConditions = ()):
+    '''Continues a simulation for a group of scenarios, splitting it when their lockdowns differ.
+
+    Parameters
+    ----------
+    simulation : Simulation
+      The simulation, which is changed
+    frame : Frame
+      The current frame of the simulation, which is changed
+    group : List[int]
+      The indices of the scenarios which share the simulation
+    scenarios : List[Params]
+      The parameters of each scenario
+    schedules : List[List[bool]]
+      Whether there is a lockdown in each frame of every scenario
+    summaries : List[FrameSummary]
+      The summaries of the frames of the simulation till the current frame, which is changed
+    results : List[Dict[str, List[float]]]
+      The series of each scenario, which are added when the branch of a scenario finishes
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions which end the branch early
+
+    Returns
+    -------
+    None
+    '''
+
+    ScenarioTree.useScenario(simulation, scenarios[group[0]])
+    try:
+      while (simulation.frameCount < simulation.params.SIMULATION_LENGTH and
+             not Simulation.shouldStop(summaries[-1], stopConditions)):
+        # Group the scenarios by the lockdown of the next frame,
+        # which is found from the number of calculated frames
+        lockdownFrame = len(simulation.infectionCountList)
+        branches = {}
+        for scenario in group:
+          branches.setdefault(schedules[scenario][lockdownFrame], []).append(scenario)
+
+        if len(branches) > 1:
+          # Copy the simulation for every branch but the last, which keeps the simulation
+          branches = list(branches.values())
+          for branch in branches[:-1]:
+            branchSimulation, branchFrame = deepcopy((simulation, frame))
+            ScenarioTree.runBranch(
+              branchSimulation,
+              branchFrame,
+              branch,
+              scenarios,
+              schedules,
+              list(summaries),
+              results,
+              stopConditions
+            )
+          group = branches[-1]
+          ScenarioTree.useScenario(simulation, scenarios[group[0]])
+
+        # Only keep the summary of each frame
+        simulation.advanceFrame(frame)
+        frame.stateCounts = simulation.countStates(frame)
+        summaries.append(FrameSummary(simulation.frameCount, frame, simulation.interventionCost))
+    finally:
+      # Each branch has its own threads for the contacts, which are stopped when it ends
+      simulation.stopContactWorkers()
+
+    series = Ensemble.findSeries(summaries)
+    for scenario in group:
+      results[scenario] = series
+
+  @staticmethod
+  def useScenario(simulation, params):
+    '''Changes the lockdown parameters of a simulation to those of a scenario.
+
+    Parameters
+    ----------
+    simulation : Simulation
+      The simulation
+    params : Params
+      The parameters of the scenario
+
+    Returns
+    -------
+    None
+    '''
+
+    for name in ScenarioTree.SCENARIO_PARAMETERS:
+      setattr(simulation.params, name, deepcopy(getattr(params, name)))
+    simulation.params.LOCKDOWN_DAYS = ScenarioTree.findLockdownSchedule(simulation.params)
@@ -1,14 +1,17 @@
-from random import random, uniform, randrange, seed
+from random import Random
 from bisect import bisect_left as insertLeft
-from copy import deepcopy
-from datetime import datetime
 from math import sqrt, log
 
+from AliasTable import AliasTable # type: ignore
+from Checkpoint import Checkpoint # type: ignore
 from Frame import Frame # type: ignore
+from FrameSummary import FrameSummary # type: ignore
 from Person import Person # type: ignore
 from Params import Params # type: ignore
 from Transitions import Transitions # type: ignore
 from Interventions import Interventions # type: ignore
+from StateGroups import StateGroups # type: ignore
+from TravelModel import TravelModel # type: ignore
 from Utils import Utils # type: ignore
 
 class Simulation:
@@ -22,18 +25,83 @@ class Simulation:
     The total cost of all interventions
   infectionCountList : List[int]
     The number of people infected at each frame (for calculating the doubling time)
+  randomSeed : int
+    The seed of the random number generator, or None to pick a new seed
+  rng : random.Random
+    The random number generator of the simulation
+  frameCount : int
+    The number of frames calculated after the first frame
+  cellTable : AliasTable
+    The table for drawing the home cell of a person
+  travelModel : TravelModel
+    Finds the destinations of people travelling from each cell
+  profiler : Profiler
+    Times the phases of each frame, or None to not profile the simulation
+  currentFrame : Frame
+    The latest frame of the simulation, from which checkpoints are saved, or None before it starts
+  contactExecutor : concurrent.futures.ThreadPoolExecutor
+    The threads which find the contacts in the cells with CONTACT_WORKERS,
+    which are started by the first frame and stopped when the simulation ends, or None
 
   Methods
   -------
-  __init__()
+  __init__(params, randomSeed)
     Initialized the simulation with some properties
-  run()
+  __getstate__()
+    Finds the attributes to copy, without the threads
+  create(params, randomSeed)
+    Creates a simulation using the engine selected in the parameters
+  ensemble(params, replicates, quantiles, maxWorkers)
+    Runs many simulations in parallel and aggregates their frames
+  run(metricsOnly, stopConditions)
     Runs the current simulation
+  start()
+    Prepares the simulation and creates its first frame
+  resume(frame, metricsOnly, stopConditions)
+    Continues the simulation from a frame
+  shouldStop(summary, stopConditions)
+    Checks whether any stop condition fires after a frame
+  saveCheckpoint(path)
+    Saves the state of the simulation after its latest frame to a checkpoint file
+  loadCheckpoint(path)
+    Restores a simulation and its current frame from a checkpoint file
+  getEngineState(frame)
+    Finds the state of the people and the random number generator
+  setEngineState(state, columns)
+    Restores the people and the random number generator
+  createAliasTables()
+    Creates the tables for drawing random cells
+  createFirstFrame()
+    Creates the population and the first frame of the simulation
   nextFrame(frame)
     Calculates the next frame of the simulation
+  advanceFrame(frame)
+    Calculates the next frame of the simulation in the current frame
+  startContactWorkers()
+    Starts the threads which find the contacts in the cells, if they are used
+  stopContactWorkers()
+    Stops the threads which find the contacts in the cells
+  countStates(frame)
+    Finds the current number of people in each state
+  updateMetrics(frame, infectedCount)
+    Calculates the metrics of the current frame
+  movePeople(frame)
+    Moves the people around
   '''
 
-  def __init__(self, params):
+  # New seeds are picked below this value, so that they are easy to write down
+  MAX_RANDOM_SEED = 1000000
+
+  # The metrics of each frame which are saved in checkpoints
+  METRICS = (
+    'effectiveReproductionNumber',
+    'averageContacts',
+    'doublingTime',
+    'hospitalOccupancy',
+    'peakInfection'
+  )
+
+  def __init__(self, params, randomSeed = None):
     '''Initialized the simulation
 
     Intializes the simulation with some basic properties
@@ -42,6 +110,8 @@ class Simulation:
     ----------
     params : Params
       The parameters of the simulation
+    randomSeed : int
+      The seed of the random number generator, or None to pick a new seed
 
     Returns
     -------
@@ -49,10 +119,89 @@ class Simulation:
     '''
 
     self.params = params
+    self.randomSeed = randomSeed
     self.interventionCost = 0
     self.infectionCountList = []
+    self.frameCount = 0
+    self.profiler = None
+    self.currentFrame = None
+    self.contactExecutor = None
+
+  def __getstate__(self):
+    '''Finds the attributes to copy, without the threads.
+
+    A copy of the simulation starts its own threads when it calculates a frame
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    Dict
+      The attributes of the simulation
+    '''
+
+    state = self.__dict__.copy()
+    state['contactExecutor'] = None
+    return state
+
+  @staticmethod
+  def create(params, randomSeed = None):
+    '''Create a simulation using the engine selected in the parameters.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the simulation
+    randomSeed : int
+      The seed of the random number generator, or None to pick a new seed
+
+    Returns
+    -------
+    Simulation
+      A Simulation for the object engine, an ArraySimulation for the array engine
+      or a DistributedSimulation for the distributed engine
+    '''
+
+    if params.ENGINE == 'array':
+      # The array engine depends on numpy, which is not available on the client
+      # So it is only imported when it is used
+      from ArraySimulation import ArraySimulation # type: ignore
+      return ArraySimulation(params, randomSeed)
+    if params.ENGINE == 'distributed':
+      # The distributed engine also depends on numpy and on worker processes
+      from DistributedSimulation import DistributedSimulation # type: ignore
+      return DistributedSimulation(params, randomSeed)
+    
+    return Simulation(params, randomSeed)
+
+  @staticmethod
+  def ensemble(params, replicates, quantiles = (0.05, 0.5, 0.95), maxWorkers = None):
+    '''Run many simulations in parallel and aggregate their frames.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of every simulation
+    replicates : int
+      The number of simulations
+    quantiles : List[float]
+      The quantiles of each value which are estimated
+    maxWorkers : int
+      The number of processes, or None to use every core
 
-  def run(self):
+    Returns
+    -------
+    Dict[str, List[SeriesStatistics]]
+      The statistics of each state count and metric in each frame
+    '''
+
+    # The ensemble depends on process pools, which are not available on the client
+    # So it is only imported when it is used
+    from Ensemble import Ensemble # type: ignore
+    return Ensemble(params, replicates, quantiles, maxWorkers).run()
+
+  def run(self, metricsOnly = False, stopConditions = ()):
     '''Run the simulation.
 
     Run an agent based simulation based on the
@@ -60,22 +209,55 @@ class Simulation:
 
     Parameters
     ----------
+    metricsOnly : bool
+      Whether to only yield the state counts and metrics of each frame.
+      The frame is then updated in place instead of building a new frame each step
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions on the summary of each frame, like the ones of StopCondition.
+      The simulation ends after the first frame for which any of them is true
 
     Yields
     ------
-    Frame
-      Constantly yields frames of simulation as they are calculated
+    Frame | FrameSummary
+      Constantly yields frames of simulation (or their summaries) as they are calculated
 
     Returns
     -------
     None
     '''
+
+    # Create the first frame
+    currFrame = self.start()
+    summary = FrameSummary(self.frameCount, currFrame, self.interventionCost)
+    if metricsOnly:
+      yield summary
+    else:
+      yield currFrame
+    if Simulation.shouldStop(summary, stopConditions):
+      return
+
+    for frame in self.resume(currFrame, metricsOnly, stopConditions):
+      yield frame
+
+  def start(self):
+    '''Prepare the simulation and create its first frame.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    Frame
+      The first frame of the simulation
+    '''
     
-    # Reset random seed to current system time
-    # Initalize and save seed
-    startTime = datetime.now()
-    self.params.RANDOM_SEED = startTime.hour * 10000 + startTime.minute * 100 + startTime.second
-    seed(self.params.RANDOM_SEED)
+    # Pick a new seed unless a seed was given
+    # Initalize the random number generator of the simulation and save the seed
+    if self.randomSeed is None:
+      self.params.RANDOM_SEED = Random().randrange(Simulation.MAX_RANDOM_SEED)
+    else:
+      self.params.RANDOM_SEED = self.randomSeed
+    self.rng = Random(self.params.RANDOM_SEED)
     
     # Set the contact radius
     # The contact radius is a function of the population density
@@ -84,36 +266,333 @@ class Simulation:
     pixelDensity = 1 / self.params.POPULATION_SIZE
     self.params.CONTACT_RADIUS = 0.7 * sqrt(pixelDensity)
     self.params.CONTACT_RADIUS_SQUARED = self.params.CONTACT_RADIUS ** 2
-    self.params.LOCKDOWN_DAYS = [False] * self.params.SIMULATION_LENGTH
+    self.params.LOCKDOWN_DAYS = Interventions.compileLockdownSchedule(self.params, Params.LOCKDOWN_STRATEGIES)
+
+    self.currentFrame = self.createFirstFrame()
+    return self.currentFrame
+
+  def resume(self, frame, metricsOnly = False, stopConditions = ()):
+    '''Continue the simulation from a frame.
+
+    Parameters
+    ----------
+    frame : Frame
+      The current frame of the simulation, which has already been yielded
+    metricsOnly : bool
+      Whether to only yield the state counts and metrics of each frame
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      Conditions on the summary of each frame, which end the simulation when any is true
+
+    Yields
+    ------
+    Frame | FrameSummary
+      Constantly yields the frames after the current frame (or their summaries)
+
+    Returns
+    -------
+    None
+    '''
+
+    # The threads of the contacts are stopped however the simulation ends,
+    # including when a stop condition fires or the caller stops iterating
+    currFrame = frame
+    self.currentFrame = frame
+    try:
+      while self.frameCount < self.params.SIMULATION_LENGTH:
+        if metricsOnly:
+          # Reuse the same frame and only yield its summary
+          self.advanceFrame(currFrame)
+          currFrame.stateCounts = self.countStates(currFrame)
+          summary = FrameSummary(self.frameCount, currFrame, self.interventionCost)
+          yield summary
+        else:
+          # Then we need to build the Frame object to yield
+          currFrame = self.nextFrame(currFrame)
+          self.currentFrame = currFrame
+          summary = FrameSummary(self.frameCount, currFrame, self.interventionCost)
+          yield currFrame
+
+        # End the simulation as soon as a stop condition fires
+        if Simulation.shouldStop(summary, stopConditions):
+          return
+    finally:
+      self.stopContactWorkers()
+
+  @staticmethod
+  def shouldStop(summary, stopConditions):
+    '''Check whether any stop condition fires after a frame.
+
+    Parameters
+    ----------
+    summary : FrameSummary
+      The summary of the frame
+    stopConditions : List[Callable[[FrameSummary], bool]]
+      The stop conditions
+
+    Returns
+    -------
+    bool
+      Whether the simulation should stop
+    '''
+
+    for condition in stopConditions:
+      if condition(summary):
+        return True
+    return False
+
+  def saveCheckpoint(self, path):
+    '''Save the state of the simulation after its latest frame to a checkpoint file.
+
+    The people are saved as columns by their id, and everything else
+    which the next frames depend on is saved in the header.
+    The simulation keeps its latest frame, so runs which only yield summaries can be saved too
+
+    Parameters
+    ----------
+    path : str
+      The path of the checkpoint file
+
+    Returns
+    -------
+    None
+    '''
+
+    frame = self.currentFrame
+    if frame is None:
+      raise ValueError('The simulation has not started, so there is nothing to save')
+    engineState, columns = self.getEngineState(frame)
+    Checkpoint.write(path, {
+      'params': self.params.__dict__,
+      'frameCount': self.frameCount,
+      'interventionCost': self.interventionCost,
+      'infectionCountList': self.infectionCountList,
+      'metrics': {metric: getattr(frame, metric) for metric in Simulation.METRICS},
+      'engine': engineState
+    }, columns)
+
+  @staticmethod
+  def loadCheckpoint(path):
+    '''Restore a simulation and its current frame from a checkpoint file.
+
+    The restored simulation continues exactly like the saved simulation,
+    by calling resume with the restored frame
+
+    Parameters
+    ----------
+    path : str
+      The path of the checkpoint file
+
+    Returns
+    -------
+    simulation : Simulation
+      The restored simulation, using the engine of the saved simulation
+    frame : Frame
+      The current frame of the simulation
+    '''
+
+    header, columns = Checkpoint.read(path)
+    params = Params()
+    params.__dict__.update(header['params'])
+
+    simulation = Simulation.create(params, params.RANDOM_SEED)
+    simulation.frameCount = header['frameCount']
+    simulation.interventionCost = header['interventionCost']
+    simulation.infectionCountList = header['infectionCountList']
+
+    frame = simulation.setEngineState(header['engine'], columns)
+    for metric, value in header['metrics'].items():
+      setattr(frame, metric, value)
+    simulation.currentFrame = frame
+
+    return simulation, frame
+
+  def getEngineState(self, frame):
+    '''Find the state of the people and the random number generator.
+
+    Parameters
+    ----------
+    frame : Frame
+      The current frame of the simulation
+
+    Returns
+    -------
+    state : Dict
+      The lockdowns, the state of the random number generator
+      and the size of each bucket of the event calendars
+    columns : Dict[str, numpy.ndarray]
+      The attributes of the people by id, the ids of the people in each state group
+      and the ids of the people in each event calendar
+    '''
+
+    # Numpy is not available on the client, so it is only imported here
+    import numpy as np
+
+    people = [None] * self.params.POPULATION_SIZE
+    for row in frame.grid:
+      for cell in row:
+        for person in cell:
+          people[person.id] = person
+
+    columns = {
+      'x': np.array([person.x for person in people], dtype = np.float64),
+      'y': np.array([person.y for person in people], dtype = np.float64),
+      'homeX': np.array([person.homeX for person in people], dtype = np.float64),
+      'homeY': np.array([person.homeY for person in people], dtype = np.float64),
+      'state': np.array([person.state for person in people], dtype = np.int8),
+      'stateFrame': np.array([person.stateFrame for person in people], dtype = np.int32),
+      'followsRules': np.array([person.followsRules for person in people], dtype = bool),
+      'age': np.array([person.age for person in people], dtype = np.int8),
+      'cell': np.array([person.cell for person in people], dtype = np.int32),
+      'isVisiting': np.array([person.isVisiting for person in people], dtype = bool),
+      'agentsInfected': np.array([person.agentsInfected for person in people], dtype = np.int32),
+      'agentsContacted': np.array([person.agentsContacted for person in people], dtype = np.int32)
+    }
+
+    # Keep the order of the state groups and the event calendars,
+    # because the people are drawn from them in that order
+    stateGroups = frame.stateGroups
+    calendarSizes = {}
+    for state in Person.states:
+      columns[f'group{state.id}'] = np.array(list(stateGroups.groups[state.id]), dtype = np.int32)
+    for stateID, calendar in stateGroups.calendars.items():
+      columns[f'calendar{stateID}'] = np.array([
+        person.id for bucket in calendar.buckets for person in bucket
+      ], dtype = np.int32)
+      calendarSizes[stateID] = [len(bucket) for bucket in calendar.buckets]
+
+    return {
+      'isLockedDown': frame.isLockedDown,
+      'rngState': self.rng.getstate(),
+      'calendarSizes': calendarSizes
+    }, columns
+
+  def setEngineState(self, state, columns):
+    '''Restore the people and the random number generator.
+
+    Parameters
+    ----------
+    state : Dict
+      The lockdowns, the state of the random number generator
+      and the size of each bucket of the event calendars
+    columns : Dict[str, numpy.ndarray]
+      The attributes of the people by id, the ids of the people in each state group
+      and the ids of the people in each event calendar
+
+    Returns
+    -------
+    Frame
+      The current frame of the simulation
+    '''
+
+    version, internalState, gaussNext = state['rngState']
+    self.rng = Random()
+    self.rng.setstate((version, tuple(internalState), gaussNext))
+    self.createAliasTables()
+
+    # Add the people to their cells in the order of their ids,
+    # which is the order in which they were created
+    grid = [[[] for i in range(self.params.GRID_SIZE)] for j in range(self.params.GRID_SIZE)]
+    people = []
+    values = {name: column.tolist() for name, column in columns.items()}
+    for personID in range(self.params.POPULATION_SIZE):
+      cellRow, cellCol = divmod(values['cell'][personID], self.params.GRID_SIZE)
+      person = Person(
+        personID,
+        values['cell'][personID],
+        values['homeX'][personID],
+        values['homeY'][personID],
+        values['followsRules'][personID],
+        Person.states[values['state'][personID]],
+        values['age'][personID]
+      )
+      person.x = values['x'][personID]
+      person.y = values['y'][personID]
+      person.stateFrame = values['stateFrame'][personID]
+      person.isVisiting = values['isVisiting'][personID]
+      person.agentsInfected = values['agentsInfected'][personID]
+      person.agentsContacted = values['agentsContacted'][personID]
+      grid[cellRow][cellCol].append(person)
+      people.append(person)
+
+    # Restore the order of the state groups and the event calendars
+    stateGroups = StateGroups(grid, self.params)
+    stateGroups.groups = [
+      {personID: people[personID] for personID in values[f'group{state.id}']}
+      for state in Person.states
+    ]
+    for stateID, calendar in stateGroups.calendars.items():
+      events = values[f'calendar{stateID}']
+      start = 0
+      for bucket, size in enumerate(state['calendarSizes'][str(stateID)]):
+        calendar.buckets[bucket] = [people[personID] for personID in events[start:start + size]]
+        start += size
+
+    frame = Frame(grid, self.params, stateGroups)
+    frame.isLockedDown[:] = state['isLockedDown']
+    frame.lockedCount = sum(frame.isLockedDown)
+    return frame
+
+  def createAliasTables(self):
+    '''Create the tables for drawing random cells.
+
+    The tables only contain the cells of the grid,
+    so a drawn cell never has to be drawn again.
+    The tables of the destinations are made by the travel model when they are used
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    gridSize = self.params.GRID_SIZE
+    self.cellTable = AliasTable.fromCumulative(self.params.GRID_PROBABILITIES, gridSize * gridSize)
+    self.travelModel = TravelModel(self.params)
+
+  def createFirstFrame(self):
+    '''Create the population and the first frame of the simulation.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    Frame
+      The first frame of the simulation
+    '''
+
+    self.createAliasTables()
 
-    # Create the first frame
     # Intialize the population list with people and whether they follow rules
     grid = [[[] for i in range(self.params.GRID_SIZE)] for j in range(self.params.GRID_SIZE)]
-    for _ in range(self.params.POPULATION_SIZE):
+    for personID in range(self.params.POPULATION_SIZE):
       # Find a random cell for the person
-      cellRow, cellCol = Utils.getRandomCell(self.params, self.params.GRID_PROBABILITIES)
+      cellRow, cellCol = Utils.getRandomCell(self.params, self.cellTable, self.rng)
 
       # Add the person to the grid
       grid[cellRow][cellCol].append(Person(
-        (cellRow, cellCol),
-        self.params.CELL_SIZE * cellCol + random() / self.params.GRID_SIZE,
-        self.params.CELL_SIZE * cellRow + random() / self.params.GRID_SIZE,
-        random() < self.params.RULE_COMPLIANCE_RATE,
+        personID,
+        cellRow * self.params.GRID_SIZE + cellCol,
+        self.params.CELL_SIZE * cellCol + self.rng.random() / self.params.GRID_SIZE,
+        self.params.CELL_SIZE * cellRow + self.rng.random() / self.params.GRID_SIZE,
+        self.rng.random() < self.params.RULE_COMPLIANCE_RATE,
         Person.SUSCEPTIBLE,
-        insertLeft(self.params.POPULATION_DEMOGRAPHICS, random())
+        insertLeft(self.params.POPULATION_DEMOGRAPHICS, self.rng.random())
       ))
 
     # There are some people who are exposed at the beginning
     done = set()
     for _ in range(self.params.INITIAL_INFECTED):
-      cellRow, cellCol = Utils.getRandomCell(self.params, self.params.GRID_PROBABILITIES)
-      personCount = randrange(len(grid[cellRow][cellCol]))
+      cellRow, cellCol = Utils.getRandomCell(self.params, self.cellTable, self.rng)
+      personCount = self.rng.randrange(len(grid[cellRow][cellCol]))
       key = (cellRow, cellCol, personCount)
 
       # Check for duplicates
       while key in done:
-        cellRow, cellCol = Utils.getRandomCell(self.params, self.params.GRID_PROBABILITIES)
-        personCount = randrange(len(grid[cellRow][cellCol]))
+        cellRow, cellCol = Utils.getRandomCell(self.params, self.cellTable, self.rng)
+        personCount = self.rng.randrange(len(grid[cellRow][cellCol]))
         key = (cellRow, cellCol, personCount)
       
       # Add the key
@@ -121,27 +600,22 @@ class Simulation:
       grid[cellRow][cellCol][personCount].state = Person.EXPOSED
     
     for _ in range(self.params.INITIAL_VACCINATED):
-      cellRow, cellCol = Utils.getRandomCell(self.params, self.params.GRID_PROBABILITIES)
-      personCount = randrange(len(grid[cellRow][cellCol]))
+      cellRow, cellCol = Utils.getRandomCell(self.params, self.cellTable, self.rng)
+      personCount = self.rng.randrange(len(grid[cellRow][cellCol]))
       key = (cellRow, cellCol, personCount)
 
       # Check for duplicates
       while key in done:
-        cellRow, cellCol = Utils.getRandomCell(self.params, self.params.GRID_PROBABILITIES)
-        personCount = randrange(len(grid[cellRow][cellCol]))
+        cellRow, cellCol = Utils.getRandomCell(self.params, self.cellTable, self.rng)
+        personCount = self.rng.randrange(len(grid[cellRow][cellCol]))
         key = (cellRow, cellCol, personCount)
       
       # Add the key
       done.add(key)
       grid[cellRow][cellCol][personCount].state = Person.VACCINATED
 
-    currFrame = Frame(grid, self.params)
-    yield currFrame
-
-    for _ in range(self.params.SIMULATION_LENGTH):
-      # Then we need to build the Frame object to yield
-      currFrame = self.nextFrame(currFrame)
-      yield currFrame
+    self.frameCount = 0
+    return Frame(grid, self.params, StateGroups(grid, self.params))
 
   def nextFrame(self, frame):
     '''Calculate the next frame of the simulation.
@@ -157,7 +631,44 @@ class Simulation:
       The next frame in the simulation
     '''
 
+    # Calculate the next frame in a new frame, so that the current frame
+    # and its lockdowns stay as they were when it was yielded
+    res = Frame(frame.grid, self.params, frame.stateGroups, frame)
+    res.effectiveReproductionNumber = frame.effectiveReproductionNumber
+    res.averageContacts = frame.averageContacts
+    res.doublingTime = frame.doublingTime
+    res.hospitalOccupancy = frame.hospitalOccupancy
+    res.peakInfection = frame.peakInfection
+    self.advanceFrame(res)
+
+    # Return the next frame with the state counts at its end
+    res.stateCounts = self.countStates(res)
+    return res
+
+  def advanceFrame(self, frame):
+    '''Calculate the next frame of the simulation in the current frame.
+
+    The people, lockdowns and metrics of the frame are updated,
+    but its state counts stay those of the start of the frame
+
+    Parameters
+    ----------
+    frame : Frame
+      The current frame of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
     # Move agents
+    self.frameCount += 1
+    profiler = self.profiler
+    frame.agentsTouched = 0
+    frame.contactsTested = 0
+    frame.infectionsDrawn = 0
+    if profiler is not None:
+      profiler.lap('movePeople', self, frame)
     self.movePeople(frame)
     
     # Initialize metrics
@@ -169,36 +680,114 @@ class Simulation:
     frame.hospitalOccupancy = 0
 
     # Run different intervention functions if they are enabled
+    if profiler is not None:
+      profiler.lap('vaccinate', self, frame)
     if (self.params.VACCINATION_ENABLED and 
         len(self.infectionCountList) >= self.params.VACCINATION_START):
-      self.interventionCost += Interventions.vaccinate(frame, self.params)
+      self.interventionCost += Interventions.vaccinate(frame, self.frameCount, self.params, self.rng)
+    if profiler is not None:
+      profiler.lap('lockdown', self, frame)
     if self.params.LOCKDOWN_ENABLED:
-      self.interventionCost += Interventions.lockdown(
-        frame, 
-        len(self.infectionCountList), 
-        self.params,
-        Params.LOCKDOWN_STRATEGIES
-      )
+      self.interventionCost += Interventions.lockdown(frame, len(self.infectionCountList), self.params)
 
-    # Iterate through all people and increment the frames since last state
-    for row in frame.grid:
-      for cell in row:
-        for person in cell:
-          person.framesSinceLastState += 1
-    
     # Find which agents can transition between infection states
-    self.interventionCost += Transitions.findExposed(frame, self.params)
-    Transitions.findInfected(frame, self.params)
-    Transitions.findRemoved(frame, self.params)
-    Transitions.findSusceptible(frame, self.params)
+    # Timed transitions are found from the event calendars of the state groups
+    if profiler is not None:
+      profiler.lap('findExposed', self, frame)
+    self.startContactWorkers()
+    self.interventionCost += Transitions.findExposed(
+      frame, self.frameCount, self.params, self.rng, self.contactExecutor
+    )
+    if profiler is not None:
+      profiler.lap('findInfected', self, frame)
+    Transitions.findInfected(frame, self.frameCount, self.params)
+    if profiler is not None:
+      profiler.lap('findRemoved', self, frame)
+    Transitions.findRemoved(frame, self.frameCount, self.params, self.rng)
+    if profiler is not None:
+      profiler.lap('findSusceptible', self, frame)
+    Transitions.findSusceptible(frame, self.frameCount, self.params)
     
     # Add to hospitalization cost
+    if profiler is not None:
+      profiler.lap('updateMetrics', self, frame)
     self.interventionCost += round(
-      len(frame.stateGroups[Person.INFECTED.id]) * 
+      frame.stateCounts[Person.INFECTED.id] * 
       self.params.HOSPITALIZATION_COST * 
       self.params.HOSPITALIZATION_RATE
     )
     
+    # Calculate metrics
+    self.updateMetrics(frame, frame.stateCounts[Person.INFECTED.id])
+    if profiler is not None:
+      profiler.lap(None, self, frame)
+
+  def startContactWorkers(self):
+    '''Start the threads which find the contacts in the cells, if they are used.
+
+    The threads are reused by every frame until they are stopped
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    if self.params.CONTACT_WORKERS is not None and self.contactExecutor is None:
+      # Threads are not available on the client, so the executor is only imported here
+      from concurrent.futures import ThreadPoolExecutor
+      self.contactExecutor = ThreadPoolExecutor(max_workers = self.params.CONTACT_WORKERS)
+
+  def stopContactWorkers(self):
+    '''Stop the threads which find the contacts in the cells.
+
+    They are started again if another frame is calculated
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    None
+    '''
+
+    if self.contactExecutor is not None:
+      self.contactExecutor.shutdown()
+      self.contactExecutor = None
+
+  def countStates(self, frame):
+    '''Finds the current number of people in each state.
+
+    Parameters
+    ----------
+    frame : Frame
+      The current frame of the simulation
+
+    Returns
+    -------
+    List[int]
+      The number of people in each state
+    '''
+
+    return frame.stateGroups.counts()
+  
+  def updateMetrics(self, frame, infectedCount):
+    '''Calculate the metrics of the current frame.
+
+    Parameters
+    ----------
+    frame : Frame
+      The current frame of the simulation
+    infectedCount : int
+      The number of infected agents at the start of the frame
+
+    Returns
+    -------
+    None
+    '''
+
     # Calculate metrics: 
     # - Effective reproductive number
     # - Hospital occupancy
@@ -214,41 +803,26 @@ class Simulation:
     
     # Hospital occupancy = number of infected agents in hospital / max hospital capacity
     if self.params.HOSPITAL_CAPACITY > 0:
-      hospitalizedAgents = len(frame.stateGroups[Person.INFECTED.id]) * self.params.HOSPITALIZATION_RATE
+      hospitalizedAgents = infectedCount * self.params.HOSPITALIZATION_RATE
       frame.hospitalOccupancy = hospitalizedAgents / (
                                 int(self.params.HOSPITAL_CAPACITY * self.params.POPULATION_SIZE))
       
     # Peak Hospitalization = max(Peak hospitalization, number of infected agents in hospital)
-    frame.peakInfection = max(
-      frame.peakInfection, 
-      len(frame.stateGroups[Person.INFECTED.id])
-    )
+    frame.peakInfection = max(frame.peakInfection, infectedCount)
     
     # Doubling time = time to double infected agents
     # T = (window length * log(2)) / (log(infected agents / infected agents at t - window length))
-    currentInfectedCount = len(frame.stateGroups[Person.INFECTED.id])
-    self.infectionCountList.append(currentInfectedCount)
+    self.infectionCountList.append(infectedCount)
     if len(self.infectionCountList) > self.params.DOUBLING_TIME_WINDOW_LENGTH:
       pastInfectedCount = self.infectionCountList[- 1 - self.params.DOUBLING_TIME_WINDOW_LENGTH]
-      if (currentInfectedCount > 0 and pastInfectedCount > 0 and 
-          currentInfectedCount != pastInfectedCount):
+      if (infectedCount > 0 and pastInfectedCount > 0 and 
+          infectedCount != pastInfectedCount):
         frame.doublingTime = (
           (self.params.DOUBLING_TIME_WINDOW_LENGTH * self.params.LOG_2) / (
-              log(currentInfectedCount / pastInfectedCount)
+              log(infectedCount / pastInfectedCount)
             )
         )
 
-    # Return the next frame
-    res = Frame(frame.grid, self.params)
-    res.isLockedDown = deepcopy(frame.isLockedDown)
-    res.effectiveReproductionNumber = frame.effectiveReproductionNumber
-    res.averageContacts = frame.averageContacts
-    res.doublingTime = frame.doublingTime
-    res.hospitalOccupancy = frame.hospitalOccupancy
-    res.peakInfection = frame.peakInfection
-
-    return res
-  
   def movePeople(self, frame):
     '''Move the people around
     
@@ -262,81 +836,89 @@ class Simulation:
     None
     '''
 
-    # Clear the visiting grid
-    for rowCount in range(self.params.GRID_SIZE):
-      for colCount in range(self.params.GRID_SIZE):
-        frame.visitingGrid[rowCount][colCount].clear()
+    # Clear the cells of the visiting grid which have visitors
+    for cellIndex in frame.visitedCells:
+      cellRow, cellCol = divmod(cellIndex, self.params.GRID_SIZE)
+      frame.visitingGrid[cellRow][cellCol].clear()
+    frame.visitedCells.clear()
+
+    # Every living person moves, which is counted for profiling
+    frame.agentsTouched += sum(frame.stateCounts) - frame.stateCounts[Person.DEAD.id]
     
     # Find the number of cells not under lockdown
-    cellsToTravelTo = sum(len(row) - sum(row) for row in frame.isLockedDown)
+    cellsToTravelTo = len(frame.isLockedDown) - frame.lockedCount
 
-    # Iterate through all cells
-    for rowCount, row in enumerate(frame.grid):
-      # Find the limits of the row
+    # Iterate through the cells where people live, in order
+    for cellIndex in frame.occupiedCells:
+      rowCount, colCount = divmod(cellIndex, self.params.GRID_SIZE)
+      cell = frame.grid[rowCount][colCount]
+
+      # Find the limits for the cell
+      xMin = colCount * self.params.CELL_SIZE
+      xMax = xMin + self.params.CELL_SIZE
       yMin = rowCount * self.params.CELL_SIZE
       yMax = yMin + self.params.CELL_SIZE
+      isLockedDown = frame.isLockedDown[cellIndex]
+
+      # Nobody can travel from cells which have no destination in the grid
+      canTravel = self.travelModel.hasDestinations(cellIndex)
       
-      for colCount, cell in enumerate(row):
-        # Find the limits for the cell
-        xMin = colCount * self.params.CELL_SIZE
-        xMax = xMin + self.params.CELL_SIZE
+      # Iterate through all people and move them to a random location in the same cell
+      for person in cell:
+        if person.state == Person.DEAD:
+          # Dead people do not move
+          continue
+
+        # Check if the person can travel
+        if (cellsToTravelTo - (not isLockedDown) > 0 and 
+            canTravel and
+            self.rng.random() < self.params.TRAVEL_RATE):
+            if person.followsRules and self.params.TRAVEL_RESTRICTIONS_ENABLED:
+              # The person cannot travel
+              # Update the cost
+              self.interventionCost += self.params.TRAVEL_RESTRICTIONS_COST
+              person.isVisiting = False
+            else:
+              # The person can travel
+              person.isVisiting = True
+
+              # The person is travelling to a different cell
+              cellRow, cellCol = self.travelModel.draw(cellIndex, self.rng)
+              if self.params.TRAVEL_RESTRICTIONS_ENABLED:
+                while frame.isLockedDown[cellRow * self.params.GRID_SIZE + cellCol]:
+                  cellRow, cellCol = self.travelModel.draw(cellIndex, self.rng)
+              
+              # Move the person to a random position in the new cell
+              # and remember which cells have visitors
+              visitors = frame.visitingGrid[cellRow][cellCol]
+              if not visitors:
+                frame.visitedCells.append(cellRow * self.params.GRID_SIZE + cellCol)
+              visitors.append(person)
+              xMinNewCell = cellCol * self.params.CELL_SIZE
+              xMaxNewCell = xMinNewCell + self.params.CELL_SIZE
+              yMinNewCell = cellRow * self.params.CELL_SIZE
+              yMaxNewCell = yMinNewCell + self.params.CELL_SIZE
+              person.x = self.rng.uniform(xMinNewCell, xMaxNewCell)
+              person.y = self.rng.uniform(yMinNewCell, yMaxNewCell)
+
+              # Continue to the next cell, because there is no movement
+              continue
+        else:
+          # The person does not travel
+          person.isVisiting = False
         
-        # Iterate through all people and move them to a random location in the same cell
-        for person in cell:
-          if person.state == Person.DEAD:
-            # Dead people do not move
-            continue
-
-          # Check if the person can travel
-          if (cellsToTravelTo - (not frame.isLockedDown[rowCount][colCount]) > 0 and 
-              random() < self.params.TRAVEL_RATE):
-              if person.followsRules and self.params.TRAVEL_RESTRICTIONS_ENABLED:
-                # The person cannot travel
-                # Update the cost
-                self.interventionCost += self.params.TRAVEL_RESTRICTIONS_COST
-                person.isVisiting = False
-              else:
-                # The person can travel
-                person.isVisiting = True
-
-                # The person is travelling to a different cell
-                cellRow, cellCol = Utils.getRandomCell(
-                  self.params, 
-                  self.params.TRAVEL_PROBABILITES[rowCount][colCount]
-                )
-                if self.params.TRAVEL_RESTRICTIONS_ENABLED:
-                  while frame.isLockedDown[cellCol][cellRow]:
-                    cellRow, cellCol = Utils.getRandomCell(
-                      self.params, 
-                      self.params.TRAVEL_PROBABILITES[rowCount][colCount]
-                    )
-                
-                # Move the person to a random position in the new cell
-                frame.visitingGrid[cellRow][cellCol].append(person)
-                xMinNewCell = cellCol * self.params.CELL_SIZE
-                xMaxNewCell = xMinNewCell + self.params.CELL_SIZE
-                yMinNewCell = cellRow * self.params.CELL_SIZE
-                yMaxNewCell = yMinNewCell + self.params.CELL_SIZE
-                person.x = uniform(xMinNewCell, xMaxNewCell)
-                person.y = uniform(yMinNewCell, yMaxNewCell)
-
-                # Continue to the next cell, because there is no movement
-                continue
-          else:
-            # The person does not travel
-            person.isVisiting = False
-          
-            # Reset the person's location to home
-            person.x, person.y = person.home
-
-            if (not person.followsRules) or (not frame.isLockedDown[rowCount][colCount]):
-              # Change the position of the person by a random amount
-              person.x += uniform(-self.params.MAX_MOVEMENT, self.params.MAX_MOVEMENT)
-              person.y += uniform(-self.params.MAX_MOVEMENT, self.params.MAX_MOVEMENT)
-
-              person.x = min(xMax, max(xMin, person.x))
-              person.y = min(yMax, max(yMin, person.y))
-  
+          # Reset the person's location to home
+          person.x = person.homeX
+          person.y = person.homeY
+
+          if (not person.followsRules) or (not isLockedDown):
+            # Change the position of the person by a random amount
+            person.x += self.rng.uniform(-self.params.MAX_MOVEMENT, self.params.MAX_MOVEMENT)
+            person.y += self.rng.uniform(-self.params.MAX_MOVEMENT, self.params.MAX_MOVEMENT)
+
+            person.x = min(xMax, max(xMin, person.x))
+            person.y = min(yMax, max(yMin, person.y))
+
 if __name__ == '__main__':
   # Only performed when this file is run directly
   # Used for testing locally
@@ -0,0 +1,155 @@
+from EventCalendar import EventCalendar # type: ignore
+from Person import Person # type: ignore
+
+class StateGroups:
+  '''Stores which people are in each state.
+
+  The groups are updated whenever a person changes state,
+  so they never have to be rebuilt by scanning the grid.
+  People in timed states are scheduled in an event calendar
+  for the frame in which their time in the state runs out
+
+  Attributes
+  ----------
+  groups : List[Dict[int, Person]]
+    The people in each state, by their id, in the order in which they entered the state
+  periods : Dict[int, int]
+    The number of frames people spend in each timed state
+  calendars : Dict[int, EventCalendar]
+    The people in each timed state by the frame in which their time runs out
+  cellCounts : List[List[int]]
+    The number of people in each state (row) whose home is in each cell (column),
+    with the cells numbered row by row
+
+  Methods
+  -------
+  __init__(grid, params)
+    Finds the people in each state
+  move(person, state, frameCount)
+    Changes the state of a person
+  members(state)
+    Finds the people in a state
+  due(state, frameCount)
+    Finds the people whose time in a state runs out in a frame
+  counts()
+    Finds the number of people in each state
+  '''
+
+  def __init__(self, grid, params):
+    '''Finds the people in each state.
+
+    Parameters
+    ----------
+    grid : List[List[List[Person]]]
+      list of people in each cell of the grid
+    params : Params
+      The parameters of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    self.periods = {
+      Person.EXPOSED.id: params.INCUBATION_PERIOD,
+      Person.INFECTED.id: params.INFECTION_PERIOD,
+      Person.RECOVERED.id: params.IMMUNITY_PERIOD,
+      Person.VACCINATED.id: params.IMMUNITY_PERIOD
+    }
+    self.calendars = {
+      stateID: EventCalendar(period + 1) for stateID, period in self.periods.items()
+    }
+
+    self.groups = [{} for _ in Person.states]
+    self.cellCounts = [[0] * (params.GRID_SIZE * params.GRID_SIZE) for _ in Person.states]
+    for row in grid:
+      for cell in row:
+        for person in cell:
+          self.groups[person.state][person.id] = person
+          self.cellCounts[person.state][person.cell] += 1
+          if person.state in self.calendars:
+            self.calendars[person.state].schedule(
+              person,
+              person.stateFrame + self.periods[person.state]
+            )
+
+  def move(self, person, state, frameCount):
+    '''Changes the state of a person.
+
+    Parameters
+    ----------
+    person : Person
+      The person whose state changes
+    state : Person.State
+      The new state of the person
+    frameCount : int
+      The frame in which the person enters the state
+
+    Returns
+    -------
+    None
+    '''
+
+    del self.groups[person.state][person.id]
+    self.groups[state][person.id] = person
+    self.cellCounts[person.state][person.cell] -= 1
+    self.cellCounts[state][person.cell] += 1
+    person.state = state
+    person.stateFrame = frameCount
+
+    # Schedule the end of the time in the state
+    if state in self.calendars:
+      self.calendars[state].schedule(person, frameCount + self.periods[state])
+
+  def members(self, state):
+    '''Finds the people in a state.
+
+    Parameters
+    ----------
+    state : Person.State
+      The state
+
+    Returns
+    -------
+    List[Person]
+      The people in the state
+    '''
+
+    return list(self.groups[state.id].values())
+
+  def due(self, state, frameCount):
+    '''Finds the people whose time in a state runs out in a frame.
+
+    Parameters
+    ----------
+    state : Person.State
+      The timed state
+    frameCount : int
+      The current frame count of the simulation
+
+    Returns
+    -------
+    List[Person]
+      The people whose time in the state runs out, in the order in which they entered it
+    '''
+
+    # Skip people who have left the state since they were scheduled
+    stateFrame = frameCount - self.periods[state.id]
+    return [
+      person for person in self.calendars[state.id].pop(frameCount)
+      if person.state == state and person.stateFrame == stateFrame
+    ]
+
+  def counts(self):
+    '''Finds the number of people in each state.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    List[int]
+      The number of people in each state
+    '''
+
+    return [len(group) for group in self.groups]
@@ -0,0 +1,134 @@
+from Person import Person # type: ignore
+
+class StopCondition:
+  '''Condition on the summary of a frame which ends a simulation early.
+
+  Simulation.run accepts these conditions and any other function
+  which takes a FrameSummary and returns whether to stop.
+  The conditions are plain objects, so they can be sent to the processes of an ensemble
+
+  Attributes
+  ----------
+  name : str
+    The name of the condition: 'extinction', 'postPeakDecline' or 'maxCost'
+  threshold : float
+    The ratio of the peak below which the infections fall, or the highest cost
+  minimumPeak : int
+    The smallest peak after which a decline ends the simulation
+
+  Methods
+  -------
+  __init__(name, threshold, minimumPeak)
+    Creates a condition
+  __call__(summary)
+    Checks whether the simulation should stop after a frame
+  extinction()
+    Stops when nobody is exposed or infected
+  postPeakDecline(ratio, minimumPeak)
+    Stops when the infections fall below a ratio of their peak
+  maxCost(cost)
+    Stops when the total intervention cost is above a limit
+  '''
+
+  def __init__(self, name, threshold = None, minimumPeak = 0):
+    '''Creates a condition.
+
+    Parameters
+    ----------
+    name : str
+      The name of the condition: 'extinction', 'postPeakDecline' or 'maxCost'
+    threshold : float
+      The ratio of the peak below which the infections fall, or the highest cost
+    minimumPeak : int
+      The smallest peak after which a decline ends the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    if name not in ('extinction', 'postPeakDecline', 'maxCost'):
+      raise ValueError(f'Unknown stop condition: {name}')
+
+    self.name = name
+    self.threshold = threshold
+    self.minimumPeak = minimumPeak
+
+  def __call__(self, summary):
+    '''Checks whether the simulation should stop after a frame.
+
+    Parameters
+    ----------
+    summary : FrameSummary
+      The summary of the frame
+
+    Returns
+    -------
+    bool
+      Whether the simulation should stop
+    '''
+
+    infectedCount = summary.stateCounts[Person.INFECTED.id]
+    if self.name == 'extinction':
+      return summary.stateCounts[Person.EXPOSED.id] == 0 and infectedCount == 0
+    if self.name == 'postPeakDecline':
+      return (
+        summary.peakInfection >= self.minimumPeak and
+        infectedCount < self.threshold * summary.peakInfection
+      )
+    return summary.interventionCost > self.threshold
+
+  @staticmethod
+  def extinction():
+    '''Stops when nobody is exposed or infected.
+
+    The disease cannot spread again after that, but the people
+    keep moving and losing their immunity until the end of the simulation
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    StopCondition
+      The condition
+    '''
+
+    return StopCondition('extinction')
+
+  @staticmethod
+  def postPeakDecline(ratio = 0.75, minimumPeak = 50):
+    '''Stops when the infections fall below a ratio of their peak.
+
+    Parameters
+    ----------
+    ratio : float
+      The ratio of the peak below which the infections fall
+    minimumPeak : int
+      The smallest peak after which a decline ends the simulation,
+      so that the small peaks at the start of the simulation are ignored
+
+    Returns
+    -------
+    StopCondition
+      The condition
+    '''
+
+    return StopCondition('postPeakDecline', ratio, minimumPeak)
+
+  @staticmethod
+  def maxCost(cost):
+    '''Stops when the total intervention cost is above a limit.
+
+    Parameters
+    ----------
+    cost : int
+      The highest total intervention cost
+
+    Returns
+    -------
+    StopCondition
+      The condition
+    '''
+
+    return StopCondition('maxCost', cost)
@@ -0,0 +1,141 @@
+from bisect import insort
+
+class StreamingQuantile:
+  '''Estimates a quantile of a stream of values without storing them.
+
+  Uses the P-squared algorithm, which keeps five markers whose heights
+  approximate the minimum, the maximum, the quantile and the quantiles halfway
+  to it, and moves them with a parabolic formula as values arrive.
+  The quantile is exact until more than five values have been added
+
+  Attributes
+  ----------
+  quantile : float
+    The quantile which is estimated, between 0 and 1
+  count : int
+    The number of values added
+  heights : List[float]
+    The heights of the markers (the sorted values until there are five)
+  positions : List[float]
+    The positions of the markers
+  desired : List[float]
+    The desired positions of the markers
+  increments : List[float]
+    The increments of the desired positions of the markers for each value
+
+  Methods
+  -------
+  __init__(quantile)
+    Creates an estimator with no values
+  add(value)
+    Adds a value to the stream
+  value()
+    Finds the estimate of the quantile
+  '''
+
+  def __init__(self, quantile):
+    '''Creates an estimator with no values.
+
+    Parameters
+    ----------
+    quantile : float
+      The quantile which is estimated, between 0 and 1
+
+    Returns
+    -------
+    None
+    '''
+
+    self.quantile = quantile
+    self.count = 0
+    self.heights = []
+    self.positions = [1, 2, 3, 4, 5]
+    self.desired = [1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5]
+    self.increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+  def add(self, value):
+    '''Adds a value to the stream.
+
+    Parameters
+    ----------
+    value : float
+      The value
+
+    Returns
+    -------
+    None
+    '''
+
+    self.count += 1
+    heights = self.heights
+    positions = self.positions
+
+    # Keep the first five values sorted
+    if self.count <= 5:
+      insort(heights, value)
+      return
+
+    # Find the cell of the value between the markers and extend the extreme markers
+    if value < heights[0]:
+      heights[0] = value
+      cell = 0
+    elif value >= heights[4]:
+      heights[4] = value
+      cell = 3
+    else:
+      cell = 0
+      while value >= heights[cell + 1]:
+        cell += 1
+
+    # Move the markers above the value and the desired positions
+    for marker in range(cell + 1, 5):
+      positions[marker] += 1
+    for marker in range(5):
+      self.desired[marker] += self.increments[marker]
+
+    # Adjust the middle markers which are too far from their desired positions
+    for marker in (1, 2, 3):
+      offset = self.desired[marker] - positions[marker]
+      if ((offset >= 1 and positions[marker + 1] - positions[marker] > 1) or
+          (offset <= -1 and positions[marker - 1] - positions[marker] < -1)):
+        step = 1 if offset > 0 else -1
+
+        # Try the parabolic formula, and use the linear one if it breaks the order of markers
+        height = heights[marker] + step / (positions[marker + 1] - positions[marker - 1]) * (
+          (positions[marker] - positions[marker - 1] + step) *
+          (heights[marker + 1] - heights[marker]) / (positions[marker + 1] - positions[marker]) +
+          (positions[marker + 1] - positions[marker] - step) *
+          (heights[marker] - heights[marker - 1]) / (positions[marker] - positions[marker - 1])
+        )
+        if not heights[marker - 1] < height < heights[marker + 1]:
+          height = heights[marker] + step * (
+            (heights[marker + step] - heights[marker]) /
+            (positions[marker + step] - positions[marker])
+          )
+
+        heights[marker] = height
+        positions[marker] += step
+
+  def value(self):
+    '''Finds the estimate of the quantile.
+
+    Parameters
+    ----------
+
+    Returns
+    -------
+    float
+      The estimate of the quantile, or None if no values have been added
+    '''
+
+    if self.count == 0:
+      return None
+
+    # Interpolate between the sorted values while there are at most five
+    if self.count <= 5:
+      index = self.quantile * (self.count - 1)
+      lower = int(index)
+      upper = min(lower + 1, self.count - 1)
+      return self.heights[lower] + (index - lower) * (self.heights[upper] - self.heights[lower])
+
+    return self.heights[2]
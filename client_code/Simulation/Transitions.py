@@ -1,5 +1,5 @@
-from random import random, uniform
 from math import sqrt
+from random import Random
 
 from Person import Person # type: ignore
 
@@ -11,26 +11,43 @@ class Transitions:
 
   Methods
   -------
-  findExposed(frame, params)
+  findExposed(frame, frameCount, params, rng, executor)
     Finds out who will be exposed to the virus
-  findInfected(frame, params)
+  findCellExposed(frame, frameCount, params, cellIndex, rng)
+    Finds out who will be exposed to the virus in one cell
+  findContacts(susceptibleGroup, infectedGroup, params)
+    Finds the susceptible agents who can be in contact with each infected agent
+  findInfected(frame, frameCount, params)
     Finds out who will be infected
-  findRemoved(frame, params)
+  findRemoved(frame, frameCount, params, rng)
     Finds out who will be recovered / dead
-  findSusceptible(frame, params)
+  findSusceptible(frame, frameCount, params)
     Find out who loses immunity
   '''
 
+  # The number of chunks of cells given to each thread when the cells are checked at once
+  CHUNKS_PER_WORKER = 4
+
   @staticmethod
-  def findExposed(frame, params):
+  def findExposed(frame, frameCount, params, rng, executor):
     '''Find out who will be exposed to the virus next
+
+    The cells are independent, so with CONTACT_WORKERS they are checked by the threads of the simulation.
+    Each cell then draws from its own stream, so the results do not depend on the number of threads.
+    The exposed people are moved in the order of the cells after every cell has been checked
     
     Parameters
     ----------
     frame : Frame
       The current frame of the simulation
+    frameCount : int
+      The current frame count of the simulation
     params : Params
       The parameters of the simulation
+    rng : random.Random
+      The random number generator of the simulation
+    executor : concurrent.futures.ThreadPoolExecutor
+      The threads which check the cells with CONTACT_WORKERS, or None
     
     Returns
     -------
@@ -38,98 +55,278 @@ class Transitions:
       Cost of hygiene measures if enabled
     '''
 
-    # Iterate through all cells
+    # Only the cells where people live or visit can have contacts
+    # They are checked in order, so the random numbers are drawn in the same order
+    activeCells = frame.occupiedCells
+    emptyVisitedCells = [
+      cellIndex for cellIndex in frame.visitedCells
+      if not frame.grid[cellIndex // params.GRID_SIZE][cellIndex % params.GRID_SIZE]
+    ]
+    if emptyVisitedCells:
+      activeCells = sorted(activeCells + emptyVisitedCells)
+
+    if params.CONTACT_WORKERS is None:
+      # Check the cells one at a time with the random number generator of the simulation
+      results = [
+        Transitions.findCellExposed(frame, frameCount, params, cellIndex, rng)
+        for cellIndex in activeCells
+      ]
+    else:
+      # Split the cells into a few chunks per thread, so that the threads stay busy
+      # without submitting a task for every cell
+      chunkCount = min(len(activeCells), params.CONTACT_WORKERS * Transitions.CHUNKS_PER_WORKER)
+      chunks = [activeCells[chunk::chunkCount] for chunk in range(chunkCount)]
+      chunkResults = list(executor.map(
+        lambda cells: [
+          Transitions.findCellExposed(frame, frameCount, params, cellIndex, None)
+          for cellIndex in cells
+        ],
+        chunks
+      ))
+
+      # Put the results back in the order of the cells
+      results = [None] * len(activeCells)
+      for chunk, cellResults in enumerate(chunkResults):
+        results[chunk::chunkCount] = cellResults
+
+    # The disease spreads to the susceptible people and they become exposed
+    # A person exposed by more than one infected agent is only moved once
+    cost = 0
+    for exposedGroup, cellCost, contactsTested, infectionsDrawn in results:
+      for susceptiblePerson in exposedGroup:
+        if susceptiblePerson.state == Person.SUSCEPTIBLE:
+          frame.stateGroups.move(susceptiblePerson, Person.EXPOSED, frameCount)
+          frame.agentsTouched += 1
+      cost += cellCost
+
+      # Count the work of the frame for profiling
+      frame.contactsTested += contactsTested
+      frame.infectionsDrawn += infectionsDrawn
+
+    # Return cost
+    return cost
+
+  @staticmethod
+  def findCellExposed(frame, frameCount, params, cellIndex, rng):
+    '''Find out who will be exposed to the virus next in one cell
+
+    Only the counters of the infected people in the cell are changed,
+    so cells can be checked at the same time
+
+    Parameters
+    ----------
+    frame : Frame
+      The current frame of the simulation
+    frameCount : int
+      The current frame count of the simulation
+    params : Params
+      The parameters of the simulation
+    cellIndex : int
+      The cell, numbered row by row
+    rng : random.Random
+      The random number generator of the simulation, or None to draw from the stream of the cell
+
+    Returns
+    -------
+    exposedGroup : List[Person]
+      The susceptible people to whom the disease spreads, once for every infected person
+    cost : int
+      Cost of hygiene measures if enabled
+    contactsTested : int
+      Number of pairs of susceptible and infected people checked for contact
+    infectionsDrawn : int
+      Number of random draws of whether a contact spreads the disease
+    '''
+
+    rowCount, colCount = divmod(cellIndex, params.GRID_SIZE)
+    cell = frame.grid[rowCount][colCount]
+
+    # Find the people who are susceptible and infected
+    susceptibleGroup = []
+    infectedGroup = []
+
+    # Find all susceptible and infected people from the current cell 
+    # in the grid and visiting grid
+    for person in cell:
+      if not person.isVisiting:
+        if person.state == Person.SUSCEPTIBLE:
+          susceptibleGroup.append(person)
+        elif person.state == Person.INFECTED:
+          infectedGroup.append(person)
+    
+    for person in frame.visitingGrid[rowCount][colCount]:
+      if person.state == Person.SUSCEPTIBLE:
+        susceptibleGroup.append(person)
+      elif person.state == Person.INFECTED:
+        infectedGroup.append(person)
+    
+    exposedGroup = []
     cost = 0
-    for rowCount, row in enumerate(frame.grid):
-      for colCount, cell in enumerate(row):
-        # Find the people who are susceptible and infected
-        susceptibleGroup = []
-        infectedGroup = []
-
-        # Find all susceptible and infected people from the current cell 
-        # in the grid and visiting grid
-        for person in cell:
-          if not person.isVisiting:
-            if person.state == Person.SUSCEPTIBLE:
-              susceptibleGroup.append(person)
-            elif person.state == Person.INFECTED:
-              infectedGroup.append(person)
+    contactsTested = 0
+    infectionsDrawn = 0
+    if not susceptibleGroup or not infectedGroup:
+      return exposedGroup, cost, contactsTested, infectionsDrawn
+
+    # The stream of the cell only depends on the seed, the frame and the cell
+    if rng is None:
+      rng = Random(
+        (params.RANDOM_SEED * (params.SIMULATION_LENGTH + 1) + frameCount) *
+        params.GRID_SIZE * params.GRID_SIZE + cellIndex
+      )
+
+    # Sort the groups by the x coordinate
+    susceptibleGroup.sort(key = lambda person: person.x)
+    infectedGroup.sort(key = lambda person: person.x)
+    
+    # Find the susceptible agents who can be in contact with each infected agent
+    for infectedPerson, contactGroup in Transitions.findContacts(
+        susceptibleGroup, infectedGroup, params):
+      contactsTested += len(contactGroup)
+      for susceptiblePerson in contactGroup:
+        # Calculate the distance between the two agents to check the y contact radius
+        dist = (
+          abs(susceptiblePerson.x - infectedPerson.x) ** 2 +
+          abs(susceptiblePerson.y - infectedPerson.y) ** 2
+        )
+
+        infectionRate = params.INFECTION_RATE
+        if (params.HYGIENE_ENABLED and 
+            (susceptiblePerson.followsRules and infectedPerson.followsRules)):
+          infectionRate *= params.HYGIENE_RATE
         
-        for person in frame.visitingGrid[rowCount][colCount]:
-          if person.state == Person.SUSCEPTIBLE:
-            susceptibleGroup.append(person)
-          elif person.state == Person.INFECTED:
-            infectedGroup.append(person)
+        # Check for lockdown
+        if (frame.isLockedDown[cellIndex] and 
+            infectedPerson.followsRules and susceptiblePerson.followsRules):
+          continue
+
+        if dist <= params.CONTACT_RADIUS_SQUARED:
+          # Increment the agents contacted counter of the infected agent
+          infectedPerson.agentsContacted += 1
+
+          infectionsDrawn += 1
+          if rng.random() < infectionRate:
+            # The disease spreads to the susceptible person
+            exposedGroup.append(susceptiblePerson)
+            
+            # Increment the agents infected counter of the infected agent
+            infectedPerson.agentsInfected += 1
+
+            # Add to cost
+            cost += params.HYGIENE_COST
+
+    return exposedGroup, cost, contactsTested, infectionsDrawn
+
+  @staticmethod
+  def findContacts(susceptibleGroup, infectedGroup, params):
+    '''Find the susceptible agents who can be in contact with each infected agent
+
+    Every method returns all susceptible agents in the x contact radius
+    which are in the contact radius, in the order of the sorted group,
+    so the exposed agents are the same for a fixed seed
+
+    Methods
+    -------
+      sweep : Uses the two pointer method over the groups sorted by the x coordinate
+      grid : Buckets the susceptible agents into squares with the side of the contact radius
+        and only checks the 3 x 3 squares around each infected agent
+      kdtree : Uses a scipy cKDTree to find the agents in the contact radius
+
+    Parameters
+    ----------
+    susceptibleGroup : List[Person]
+      The susceptible people in the cell sorted by the x coordinate
+    infectedGroup : List[Person]
+      The infected people in the cell sorted by the x coordinate
+    params : Params
+      The parameters of the simulation
+
+    Yields
+    ------
+    infectedPerson : Person
+      The infected person
+    contactGroup : List[Person]
+      The susceptible people who can be in contact with the infected person
+    '''
+
+    if params.CONTACT_INDEX == 'sweep':
+      # Use the two pointer method to find the exposed agents
+      # Maintain two pointers such that all susceptible agents between the two pointers
+      # are in the x contact radius of the current infected agent
+      leftPointer = 0
+      rightPointer = 0
+      susceptibleCount = len(susceptibleGroup)
+
+      for infectedPerson in infectedGroup:
+        # Move the right pointer to the first susceptible agent 
+        # that is not in the x contact radius
+        while (rightPointer < susceptibleCount and 
+                susceptibleGroup[rightPointer].x <= infectedPerson.x + params.CONTACT_RADIUS):
+          rightPointer += 1
         
-        # Sort the groups by the x coordinate to implement the two pointer method
-        susceptibleGroup.sort(key = lambda person: person.x)
-        infectedGroup.sort(key = lambda person: person.x)
+        # Similarly, move the left pointer to the first susceptible agent
+        # that is in the x contact radius
+        while (leftPointer < susceptibleCount and
+                susceptibleGroup[leftPointer].x < infectedPerson.x - params.CONTACT_RADIUS):
+          leftPointer += 1
         
-        # Use the two pointer method to find the exposed agents
-        # Maintain two pointers such that all susceptible agents between the two pointers
-        # are in the x contact radius of the current infected agent
-        leftPointer = 0
-        rightPointer = 0
-        susceptibleCount = len(susceptibleGroup)
-
-        for infectedPerson in infectedGroup:
-          # Move the right pointer to the first susceptible agent 
-          # that is not in the x contact radius
-          while (rightPointer < susceptibleCount and 
-                  susceptibleGroup[rightPointer].x <= infectedPerson.x + params.CONTACT_RADIUS):
-            rightPointer += 1
-          
-          # Similarly, move the left pointer to the first susceptible agent
-          # that is in the x contact radius
-          while (leftPointer < susceptibleCount and
-                  susceptibleGroup[leftPointer].x < infectedPerson.x - params.CONTACT_RADIUS):
-            leftPointer += 1
-          
-          # The infected agent is in contact with 
-          # all susceptible agents between the two pointers
-          for susceptiblePerson in susceptibleGroup[leftPointer: rightPointer]:
-            # Calculate the distance between the two agents to check the y contact radius
-            dist = (
-              abs(susceptiblePerson.x - infectedPerson.x) ** 2 +
-              abs(susceptiblePerson.y - infectedPerson.y) ** 2
-            )
-
-            infectionRate = params.INFECTION_RATE
-            if (params.HYGIENE_ENABLED and 
-                (susceptiblePerson.followsRules and infectedPerson.followsRules)):
-              infectionRate *= params.HYGIENE_RATE
-            
-            # Check for lockdown
-            if (frame.isLockedDown[rowCount][colCount] and 
-                infectedPerson.followsRules and susceptiblePerson.followsRules):
-                continue
-
-            if dist <= params.CONTACT_RADIUS_SQUARED:
-              # Increment the agents contacted counter of the infected agent
-              infectedPerson.agentsContacted += 1
-
-              if random() < infectionRate:
-                # The disease spreads to the susceptible person and he becomes exposed
-                susceptiblePerson.state = Person.EXPOSED
-                susceptiblePerson.framesSinceLastState = 0
-                
-                # Increment the agents infected counter of the infected agent
-                infectedPerson.agentsInfected += 1
-
-                # Add to cost
-                cost += params.HYGIENE_COST
+        # The infected agent is in contact with 
+        # all susceptible agents between the two pointers
+        yield infectedPerson, susceptibleGroup[leftPointer: rightPointer]
+      return
+
+    if len(susceptibleGroup) == 0 or len(infectedGroup) == 0:
+      return
+
+    if params.CONTACT_INDEX == 'grid':
+      # Bucket the susceptible agents into squares with the side of the contact radius
+      squares = {}
+      for rank, person in enumerate(susceptibleGroup):
+        square = (int(person.x / params.CONTACT_RADIUS), int(person.y / params.CONTACT_RADIUS))
+        squares.setdefault(square, []).append(rank)
+      
+      # All agents in contact with the infected agent are in the 3 x 3 squares around it
+      neighbourGroups = []
+      for infectedPerson in infectedGroup:
+        squareX = int(infectedPerson.x / params.CONTACT_RADIUS)
+        squareY = int(infectedPerson.y / params.CONTACT_RADIUS)
+        ranks = []
+        for xOffset in (-1, 0, 1):
+          for yOffset in (-1, 0, 1):
+            ranks.extend(squares.get((squareX + xOffset, squareY + yOffset), ()))
+        neighbourGroups.append(ranks)
+    elif params.CONTACT_INDEX == 'kdtree':
+      from scipy.spatial import cKDTree
+
+      # Slightly enlarge the radius so that rounding never drops a pair
+      # The exact contact radius is checked afterwards
+      tree = cKDTree([(person.x, person.y) for person in susceptibleGroup])
+      neighbourGroups = tree.query_ball_point(
+        [(person.x, person.y) for person in infectedGroup],
+        params.CONTACT_RADIUS * (1 + 1e-9)
+      )
+    else:
+      raise ValueError(f'Unknown contact index: {params.CONTACT_INDEX}')
     
-    # Return cost
-    return cost
+    # Keep the susceptible agents in the x contact radius in the order of the sorted group
+    for infectedPerson, ranks in zip(infectedGroup, neighbourGroups):
+      contactGroup = []
+      for rank in sorted(ranks):
+        susceptiblePerson = susceptibleGroup[rank]
+        if (infectedPerson.x - params.CONTACT_RADIUS <= susceptiblePerson.x and
+            susceptiblePerson.x <= infectedPerson.x + params.CONTACT_RADIUS):
+          contactGroup.append(susceptiblePerson)
+      yield infectedPerson, contactGroup
 
   @staticmethod
-  def findInfected(frame, params):
+  def findInfected(frame, frameCount, params):
     '''Find out who will be infected in the next frame.
 
     Parameters
     ----------
     frame : Frame
       The current frame of the simulation
+    frameCount : int
+      The current frame count of the simulation
     params : Params
       The parameters of the simulation
     
@@ -138,27 +335,29 @@ class Transitions:
     None
     '''
 
-    # Iterate through all people and find those who are exposed
-    # Find if they become infected
-    for row, col, personCount in frame.stateGroups[Person.EXPOSED.id]:
-      person = frame.grid[row][col][personCount]
-      if person.framesSinceLastState >= params.INCUBATION_PERIOD:
-        # The person becomes symptomatic
-        person.state = Person.INFECTED
-        person.framesSinceLastState = 0
-        person.agentsInfected = 0
-        person.agentsContacted = 0
+    # Find the exposed people whose incubation period is over
+    # They become symptomatic
+    infected = frame.stateGroups.due(Person.EXPOSED, frameCount)
+    for person in infected:
+      frame.stateGroups.move(person, Person.INFECTED, frameCount)
+      person.agentsInfected = 0
+      person.agentsContacted = 0
+    frame.agentsTouched += len(infected)
   
   @staticmethod
-  def findRemoved(frame, params):
+  def findRemoved(frame, frameCount, params, rng):
     '''Find out who will be recovered / dead next
     
     Parameters
     ----------
     frame : Frame
       The current frame of the simulation
+    frameCount : int
+      The current frame count of the simulation
     params : Params
       The parameters of the simulation
+    rng : random.Random
+      The random number generator of the simulation
     
     Returns
     -------
@@ -167,7 +366,7 @@ class Transitions:
     
     # If no. of hospitalized agents is more than hospital capacity
     # Increase the mortality rate
-    numInfected = len(frame.stateGroups[Person.INFECTED.id])
+    numInfected = frame.stateCounts[Person.INFECTED.id]
     numHospitalized = int(numInfected * params.HOSPITALIZATION_RATE)
     totalHospitalCapacity = int(params.HOSPITAL_CAPACITY * params.POPULATION_SIZE)
     if numHospitalized > totalHospitalCapacity:
@@ -181,33 +380,31 @@ class Transitions:
     else:
       mortalityRate = params.MORTALITY_RATE
 
-    # Iterate through all people and find those who are infected
-    # Find if they have no time left for disease
-    for row, col, personCount in frame.stateGroups[Person.INFECTED.id]:
-      person = frame.grid[row][col][personCount]
-      if person.framesSinceLastState >= params.INFECTION_PERIOD:
-        # Find if the person recovers or dies
-        person.framesSinceLastState = 0
-        
-        # Add to the total agents infected for this frame
-        frame.reproductiveSum += person.agentsInfected
-        frame.contactSum += person.agentsContacted
-        frame.removedAgents += 1
-        
-        # Find if the person recovers or dies
-        if random() < (mortalityRate * params.COMORBIDITY_COEFFICIENTS[person.age]):
-          person.state = Person.DEAD
-        else:
-          person.state = Person.RECOVERED
+    # Find the infected people who have no time left for disease
+    removed = frame.stateGroups.due(Person.INFECTED, frameCount)
+    frame.agentsTouched += len(removed)
+    for person in removed:
+      # Add to the total agents infected for this frame
+      frame.reproductiveSum += person.agentsInfected
+      frame.contactSum += person.agentsContacted
+      frame.removedAgents += 1
+      
+      # Find if the person recovers or dies
+      if rng.random() < (mortalityRate * params.COMORBIDITY_COEFFICIENTS[person.age]):
+        frame.stateGroups.move(person, Person.DEAD, frameCount)
+      else:
+        frame.stateGroups.move(person, Person.RECOVERED, frameCount)
   
   @staticmethod
-  def findSusceptible(frame, params):
+  def findSusceptible(frame, frameCount, params):
     '''Find out who loses immunity from recovery or vaccination
     
     Parameters
     ----------
     frame : Frame
       The current frame of the simulation
+    frameCount : int
+      The current frame count of the simulation
     params : Params
       The parameters of the simulation
     
@@ -216,12 +413,10 @@ class Transitions:
     None
     '''
 
-    # Iterate through all people and find those who are recovered or vaccinated
-    # Find if they have lost immunity
-    for row, col, personCount in (frame.stateGroups[Person.RECOVERED.id] + 
-                                  frame.stateGroups[Person.VACCINATED.id]):
-      person = frame.grid[row][col][personCount]
-      if person.framesSinceLastState >= params.IMMUNITY_PERIOD:
-        # The person loses immunity and becomes susceptible again
-        person.state = Person.SUSCEPTIBLE
-        person.framesSinceLastState = 0
+    # Find the recovered and vaccinated people who have lost immunity
+    # They become susceptible again
+    susceptible = (frame.stateGroups.due(Person.RECOVERED, frameCount) + 
+                   frame.stateGroups.due(Person.VACCINATED, frameCount))
+    for person in susceptible:
+      frame.stateGroups.move(person, Person.SUSCEPTIBLE, frameCount)
+    frame.agentsTouched += len(susceptible)
@@ -0,0 +1,289 @@
+from AliasTable import AliasTable # type: ignore
+
+class TravelModel:
+  '''Finds the destinations of people travelling from each cell of the grid.
+
+  The destinations of each origin cell are a sparse row, which only lists
+  the cells which can be travelled to, with a table for drawing from them.
+  The rows are made when they are first used and the most recently used rows are cached,
+  so the memory does not grow with the square of the number of cells.
+  The 'matrix' model reads the rows from TRAVEL_PROBABILITES.
+  The 'gravity' model generates them from the probability of living in each cell,
+  divided by a power of the distance, for the cells within the cutoff distance
+
+  Attributes
+  ----------
+  params : Params
+    The parameters of the simulation
+  gridSize : int
+    The number of rows and columns of the grid
+  cellWeights : List[float]
+    The probability of a person living in each cell, numbered row by row
+  cacheSize : int
+    The number of rows which are kept
+  cache : Dict[int, Tuple[List[int], AliasTable]]
+    The destinations and table of the most recently used rows, by origin cell,
+    from the least to the most recently used, or None if the row has no destination
+  hasRow : List[bool]
+    Whether each cell has a destination, or None if its row has not been made yet
+
+  Methods
+  -------
+  __init__(params)
+    Creates a model with no cached rows
+  findRow(origin)
+    Finds the destinations of an origin cell and their weights
+  row(origin)
+    Finds the destinations of an origin cell and the table for drawing from them
+  hasDestinations(origin)
+    Checks whether people can travel from a cell
+  draw(origin, rng)
+    Draws the destination of a person travelling from a cell
+  toArrays(origins)
+    Stores the rows of some origin cells as numpy arrays
+  '''
+
+  # The models which can find the destinations
+  MODELS = ('matrix', 'gravity')
+
+  # The number of origin cells whose rows are generated at once by toArrays
+  BLOCK_SIZE = 1024
+
+  def __init__(self, params):
+    '''Creates a model with no cached rows.
+
+    Parameters
+    ----------
+    params : Params
+      The parameters of the simulation
+
+    Returns
+    -------
+    None
+    '''
+
+    if params.TRAVEL_MODEL not in TravelModel.MODELS:
+      raise ValueError(f'Unknown travel model: {params.TRAVEL_MODEL}')
+
+    # Check that there are travel probabilities for every cell of the grid
+    gridSize = params.GRID_SIZE
+    if params.TRAVEL_MODEL == 'matrix' and (
+        len(params.TRAVEL_PROBABILITES) < gridSize or
+        any(len(row) < gridSize for row in params.TRAVEL_PROBABILITES[:gridSize])):
+      raise ValueError(f'The travel probabilities do not cover a grid of size {gridSize}')
+
+    self.params = params
+    self.gridSize = gridSize
+    self.cellWeights = AliasTable.weightsFromCumulative(params.GRID_PROBABILITIES, gridSize * gridSize)
+    self.cacheSize = params.TRAVEL_CACHE_SIZE
+    self.cache = {}
+    self.hasRow = [None] * (gridSize * gridSize)
+
+  def findRow(self, origin):
+    '''Finds the destinations of an origin cell and their weights.
+
+    Parameters
+    ----------
+    origin : int
+      The origin cell, numbered row by row
+
+    Returns
+    -------
+    destinations : List[int]
+      The cells which can be travelled to, in order
+    weights : List[float]
+      The weight of each destination
+    '''
+
+    originRow, originCol = divmod(origin, self.gridSize)
+
+    # The matrix lists every cell of the grid, and keeps their order
+    # so that the tables draw the same cells as a table of the whole grid
+    if self.params.TRAVEL_MODEL == 'matrix':
+      weights = AliasTable.weightsFromCumulative(
+        self.params.TRAVEL_PROBABILITES[originRow][originCol],
+        self.gridSize * self.gridSize
+      )
+      return list(range(len(weights))), weights
+
+    # Only look at the cells within the cutoff distance
+    cutoff = self.params.TRAVEL_CUTOFF
+    exponent = self.params.TRAVEL_DISTANCE_EXPONENT
+    reach = min(int(cutoff), self.gridSize - 1)
+    destinations = []
+    weights = []
+    for cellRow in range(max(0, originRow - reach), min(self.gridSize, originRow + reach + 1)):
+      for cellCol in range(max(0, originCol - reach), min(self.gridSize, originCol + reach + 1)):
+        squaredDistance = (cellRow - originRow) ** 2 + (cellCol - originCol) ** 2
+        if squaredDistance == 0 or squaredDistance > cutoff ** 2:
+          continue
+
+        # More people travel to cells where more people live, and fewer to cells further away
+        weight = self.cellWeights[cellRow * self.gridSize + cellCol] / squaredDistance ** (exponent / 2)
+        if weight > 0:
+          destinations.append(cellRow * self.gridSize + cellCol)
+          weights.append(weight)
+
+    return destinations, weights
+
+  def row(self, origin):
+    '''Finds the destinations of an origin cell and the table for drawing from them.
+
+    Parameters
+    ----------
+    origin : int
+      The origin cell, numbered row by row
+
+    Returns
+    -------
+    Tuple[List[int], AliasTable]
+      The cells which can be travelled to and the table for drawing one of them,
+      or None if nobody can travel from the cell
+    '''
+
+    # Move the row to the end of the cache, which is the most recently used
+    if origin in self.cache:
+      row = self.cache.pop(origin)
+      self.cache[origin] = row
+      return row
+
+    destinations, weights = self.findRow(origin)
+    row = (destinations, AliasTable(weights)) if sum(weights) > 0 else None
+    self.hasRow[origin] = row is not None
+
+    # Remove the least recently used row
+    if len(self.cache) >= self.cacheSize:
+      del self.cache[next(iter(self.cache))]
+    self.cache[origin] = row
+
+    return row
+
+  def hasDestinations(self, origin):
+    '''Checks whether people can travel from a cell.
+
+    The answer is kept after the row is removed from the cache,
+    so the row is only made again when somebody travels
+
+    Parameters
+    ----------
+    origin : int
+      The origin cell, numbered row by row
+
+    Returns
+    -------
+    bool
+      Whether the cell has a destination
+    '''
+
+    if self.hasRow[origin] is None:
+      self.row(origin)
+    return self.hasRow[origin]
+
+  def draw(self, origin, rng):
+    '''Draws the destination of a person travelling from a cell.
+
+    Parameters
+    ----------
+    origin : int
+      The origin cell, numbered row by row, from which people can travel
+    rng : random.Random
+      The random number generator used for the draw
+
+    Returns
+    -------
+    cellRow : int
+      The row of the destination
+    cellCol : int
+      The column of the destination
+    '''
+
+    destinations, table = self.row(origin)
+    return divmod(destinations[table.draw(rng)], self.gridSize)
+
+  def toArrays(self, origins):
+    '''Stores the rows of some origin cells as numpy arrays.
+
+    The rows are stored like a compressed sparse row matrix.
+    Each row is drawn from by its cumulative weights, which go from the origin cell
+    to one more than the origin cell, so a draw from any row is one binary search.
+    The rows of the gravity model are generated for every origin cell at once,
+    so the rows are not cached
+
+    Parameters
+    ----------
+    origins : List[int]
+      The origin cells whose rows are stored, numbered row by row and in order.
+      The rows of the other cells are empty
+
+    Returns
+    -------
+    rowStart : numpy.ndarray[int]
+      The position of the first destination of each cell, and the number of destinations at the end
+    destinations : numpy.ndarray[int]
+      The destinations of every row
+    weights : numpy.ndarray[float]
+      The probability of each destination in its row
+    cumulative : numpy.ndarray[float]
+      The origin cell of each destination plus the cumulative probability of its row
+    '''
+
+    # Numpy is not available on the client, so it is only imported here
+    import numpy as np
+
+    cellCount = self.gridSize * self.gridSize
+    origins = np.asarray(origins, dtype = np.int64)
+    if self.params.TRAVEL_MODEL == 'matrix':
+      # The matrix is only given for small grids, so the rows are found one at a time
+      rows = [self.findRow(origin) for origin in origins.tolist()]
+      rowOrigins = np.repeat(origins, [len(destinations) for destinations, _ in rows])
+      destinations = np.array([cell for destinations, _ in rows for cell in destinations], dtype = np.int64)
+      weights = np.array([weight for _, weights in rows for weight in weights], dtype = np.float64)
+    else:
+      # Find every offset within the cutoff distance, in the same order as findRow
+      cutoff = self.params.TRAVEL_CUTOFF
+      reach = min(int(cutoff), self.gridSize - 1)
+      offsets = np.arange(-reach, reach + 1)
+      rowOffset, colOffset = np.meshgrid(offsets, offsets, indexing = 'ij')
+      squaredDistance = rowOffset ** 2 + colOffset ** 2
+      inRange = (squaredDistance > 0) & (squaredDistance <= cutoff ** 2)
+      rowOffset, colOffset, squaredDistance = rowOffset[inRange], colOffset[inRange], squaredDistance[inRange]
+
+      distanceWeights = squaredDistance ** (-self.params.TRAVEL_DISTANCE_EXPONENT / 2)
+      cellWeights = np.array(self.cellWeights, dtype = np.float64)
+
+      # Find the destinations of a block of origins at a time, one origin per row,
+      # so that the cells out of the grid are only stored for one block
+      rowOrigins, destinations, weights = [], [], []
+      for blockStart in range(0, origins.size, TravelModel.BLOCK_SIZE):
+        blockOrigins = origins[blockStart:blockStart + TravelModel.BLOCK_SIZE]
+        cellRow = blockOrigins[:, None] // self.gridSize + rowOffset
+        cellCol = blockOrigins[:, None] % self.gridSize + colOffset
+        inGrid = (cellRow >= 0) & (cellRow < self.gridSize) & (cellCol >= 0) & (cellCol < self.gridSize)
+        cells = np.where(inGrid, cellRow * self.gridSize + cellCol, 0)
+
+        # More people travel to cells where more people live, and fewer to cells further away
+        blockWeights = np.where(inGrid, cellWeights[cells] * distanceWeights, 0)
+        isDestination = blockWeights > 0
+        rowOrigins.append(np.repeat(blockOrigins, isDestination.sum(axis = 1)))
+        destinations.append(cells[isDestination])
+        weights.append(blockWeights[isDestination])
+
+      rowOrigins = np.concatenate(rowOrigins + [np.zeros(0, dtype = np.int64)])
+      destinations = np.concatenate(destinations + [np.zeros(0, dtype = np.int64)])
+      weights = np.concatenate(weights + [np.zeros(0)])
+
+    # Cells with no destination have empty rows
+    rowLength = np.bincount(rowOrigins, minlength = cellCount)
+    rowTotal = np.bincount(rowOrigins, weights = weights, minlength = cellCount)
+    keep = rowTotal[rowOrigins] > 0
+    rowOrigins, destinations, weights = rowOrigins[keep], destinations[keep], weights[keep]
+    rowLength[rowTotal <= 0] = 0
+    rowStart = np.concatenate(([0], np.cumsum(rowLength)))
+
+    # Scale each row so that it adds up to one, and end each row at exactly one
+    weights = weights / rowTotal[rowOrigins]
+    cumulative = np.cumsum(weights)
+    cumulative -= np.concatenate(([0], cumulative))[rowStart[rowOrigins]]
+    cumulative[rowStart[1:][rowLength > 0] - 1] = 1
+
+    return rowStart, destinations, weights, rowOrigins + cumulative
@@ -1,5 +1,4 @@
-from random import random
-from bisect import bisect_left as insertLeft
+from math import log
 
 from Person import Person # type: ignore
 
@@ -13,8 +12,10 @@ class Utils:
   -------
   drawFramesMatplotlib(frames, params)
     Creates a matplotlib graph and displays it locally
-  getRandomCell(params)
+  getRandomCell(params, cellTable, rng)
     Gets a random cell from the grid
+  sampleBernoulli(items, probability, rng)
+    Picks each item independently with a probability
   '''
   
   @staticmethod
@@ -45,8 +46,8 @@ class Utils:
     # Get the data for the X and Y axes
     for frameCount, frame in enumerate(frames):
       graphXData.append(frameCount)
-      for stateID, stateGroup in enumerate(frame.stateGroups):
-        graphYData[stateID].append(len(stateGroup))
+      for stateID, stateCount in enumerate(frame.stateCounts):
+        graphYData[stateID].append(stateCount)
 
     # Add the plots to the graph
     for stateID, stateCountData in enumerate(graphYData):
@@ -62,15 +63,17 @@ class Utils:
     plt.show()
 
   @staticmethod
-  def getRandomCell(params, probabilities):
+  def getRandomCell(params, cellTable, rng):
     '''Generates a random cell in the grid
 
     Parameters
     ----------
     params : Params   
       The parameters of the simulation
-    Probabilities
-      The list of probabilities to choose a cell from
+    cellTable : AliasTable
+      The alias table of the probabilities to choose a cell from
+    rng : random.Random
+      The random number generator of the simulation
     
     Returns
     -------
@@ -80,12 +83,43 @@ class Utils:
       The column of the generated cell
     '''
 
-    cellNum = insertLeft(probabilities, random())
-    cellRow = cellNum // params.GRID_SIZE
-    cellCol = cellNum % params.GRID_SIZE
-    while cellRow >= params.GRID_SIZE or cellCol >= params.GRID_SIZE:
-      cellNum = insertLeft(probabilities, random())
-      cellRow = cellNum // params.GRID_SIZE
-      cellCol = cellNum % params.GRID_SIZE
+    cellNum = cellTable.draw(rng)
+    return cellNum // params.GRID_SIZE, cellNum % params.GRID_SIZE
 
-    return cellRow, cellCol
+  @staticmethod
+  def sampleBernoulli(items, probability, rng):
+    '''Picks each item independently with a probability
+
+    Instead of drawing a random number for every item,
+    the number of items skipped before the next picked item
+    is drawn from a geometric distribution
+
+    Parameters
+    ----------
+    items : List
+      The items to choose from
+    probability : float
+      The probability of picking each item
+    rng : random.Random
+      The random number generator of the simulation
+
+    Returns
+    -------
+    List
+      The picked items, in the order of the items
+    '''
+
+    if probability <= 0:
+      return []
+    if probability >= 1:
+      return list(items)
+
+    # Jump from one picked item to the next
+    logMiss = log(1 - probability)
+    picked = []
+    index = int(log(1 - rng.random()) / logMiss)
+    while index < len(items):
+      picked.append(items[index])
+      index += 1 + int(log(1 - rng.random()) / logMiss)
+
+    return picked
@@ -118,7 +118,7 @@ class RunSimulation(RunSimulationTemplate):
     for rowCount, row in enumerate(frame.grid):
       for colCount, cell in enumerate(row):
         # If the cell is locked down, shade it gray
-        if frame.isLockedDown[rowCount][colCount]:
+        if frame.isLockedDown[rowCount * self.params.GRID_SIZE + colCount]:
           self.canvas.fill_style = 'grey'
           self.canvas.fill_rect(
             colCount * self.params.CELL_SIZE * self.canvasWidth, 
@@ -136,16 +136,16 @@ class RunSimulation(RunSimulationTemplate):
     # Plot the result on the graph
     self.graphXData.append(frameCount)
     currPlot = 0
-    for stateID, stateGroup in enumerate(frame.stateGroups):
+    for stateID, stateCount in enumerate(frame.stateCounts):
       state = Person.states[stateID]
       if not state.toGraph:
         # Do not plot this infection state
         continue
 
       # Add the new data
-      self.graphYData[stateID].append(len(stateGroup))
+      self.graphYData[stateID].append(stateCount)
       self.graph.data[currPlot].x.append(frameCount)
-      self.graph.data[currPlot].y.append(len(stateGroup))
+      self.graph.data[currPlot].y.append(stateCount)
       currPlot += 1
     
     # Add the hospital capacity data
@@ -158,7 +158,7 @@ class RunSimulation(RunSimulationTemplate):
       
       self.graph.data[currPlot].x.append(frameCount)
       self.graph.data[currPlot].y.append(
-        int(self.params.HOSPITALIZATION_RATE * len(frame.stateGroups[Person.INFECTED.id]))
+        int(self.params.HOSPITALIZATION_RATE * frame.stateCounts[Person.INFECTED.id])
       )
       currPlot += 1
       
@@ -328,10 +328,8 @@ class RunSimulation(RunSimulationTemplate):
     
     # Created a simulation object and runs the simulation
     simulation = Simulation(self.params)
-    self.simulationFrames = []
     startTime = time()
     for frameCount, frame in enumerate(simulation.run()):
-      self.simulationFrames.append(frame)
       self.drawFrame(frame, frameCount)
       endTime = time()
       sleep(max(0, self.params.TIME_PER_FRAME - (endTime - startTime)))
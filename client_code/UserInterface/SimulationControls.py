@@ -150,6 +150,20 @@ class SimulationControls(SimulationControlsTemplate):
     
     self.params.GRID_SIZE = int(round(self.gridSizeSlider.value))
     self.params.CELL_SIZE = 1 / self.params.GRID_SIZE
+
+    # The default home and travel probabilities only cover the grid they were made for,
+    # so other grids have uniform homes and use the gravity model
+    defaults = Params()
+    gridSize = self.params.GRID_SIZE
+    cellCount = gridSize * gridSize
+    if (len(defaults.TRAVEL_PROBABILITES) == gridSize and
+        all(len(row) == gridSize for row in defaults.TRAVEL_PROBABILITES) and
+        len(defaults.GRID_PROBABILITIES) == cellCount):
+      self.params.TRAVEL_MODEL = defaults.TRAVEL_MODEL
+      self.params.GRID_PROBABILITIES = defaults.GRID_PROBABILITIES
+    else:
+      self.params.TRAVEL_MODEL = 'gravity'
+      self.params.GRID_PROBABILITIES = [(cell + 1) / cellCount for cell in range(cellCount)]
     self.gridSizeLabel.text = f'Grid Size: {int(round(self.gridSizeSlider.value))}'
 
   def onInfectionRateChange(self, **event_args):
@@ -0,0 +1,275 @@
+# Edit path to import files
+from time import perf_counter
+from sys import path
+path.insert(1, '../client_code/Simulation')
+
+# Import files
+import argparse
+import json
+import platform
+import resource
+import sys
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from Params import Params
+from Profiler import Profiler
+from Simulation import Simulation
+
+# Set initial variables
+presets = {
+	'quick': {
+		'populationSizes': [2500, 10000],
+		'gridSizes': [3, 10],
+		'frames': 50
+	},
+	'full': {
+		'populationSizes': [2500, 10000, 100000, 1000000],
+		'gridSizes': [3, 10, 30, 100],
+		'frames': 100
+	}
+}
+interventions = {
+	'vaccination': {'VACCINATION_ENABLED': True, 'VACCINATION_START': 0},
+	'lockdown': {'LOCKDOWN_ENABLED': True, 'LOCKDOWN_START': 0},
+	'localLockdown': {'LOCKDOWN_ENABLED': True, 'LOCAL_LOCKDOWN': True, 'LOCKDOWN_LEVEL': 0.01},
+	'hygiene': {'HYGIENE_ENABLED': True},
+	'travelRestrictions': {'TRAVEL_RESTRICTIONS_ENABLED': True}
+}
+interventionPopulationSize = 10000
+
+# The object engine takes too long above this population
+objectEngineMaxPopulation = 100000
+
+# The travel matrix grows with the square of the number of cells,
+# so larger grids use the gravity model
+matrixMaxGridSize = 30
+
+def createScenarios(preset, engines):
+	'''Create the standard scenarios of a preset for each engine'''
+
+	scenarios = []
+	for engine in engines:
+		# Scale the population with the default grid and no interventions
+		for populationSize in preset['populationSizes']:
+			scenarios.append({'name': f'population-{populationSize}', 'engine': engine,
+				'populationSize': populationSize, 'gridSize': 3, 'interventions': {}})
+
+		# Scale the grid with a fixed population and no interventions
+		for gridSize in preset['gridSizes']:
+			scenarios.append({'name': f'grid-{gridSize}', 'engine': engine,
+				'populationSize': interventionPopulationSize, 'gridSize': gridSize, 'interventions': {}})
+
+		# Turn on each intervention by itself
+		for intervention, overrides in interventions.items():
+			scenarios.append({'name': f'intervention-{intervention}', 'engine': engine,
+				'populationSize': interventionPopulationSize, 'gridSize': 3, 'interventions': overrides})
+
+	return scenarios
+
+def createParams(scenario, frames):
+	'''Create the parameters of a scenario, with uniform home probabilities and uniform or gravity travel'''
+
+	gridSize = scenario['gridSize']
+	cellCount = gridSize * gridSize
+	uniform = [(cell + 1) / cellCount for cell in range(cellCount)]
+	travel = {'TRAVEL_PROBABILITES': [[uniform] * gridSize for _ in range(gridSize)]}
+	if gridSize > matrixMaxGridSize:
+		travel = {'TRAVEL_MODEL': 'gravity'}
+	params = Params(
+		ENGINE = scenario['engine'],
+		POPULATION_SIZE = scenario['populationSize'],
+		INITIAL_INFECTED = max(2, scenario['populationSize'] // 1000),
+		SIMULATION_LENGTH = frames,
+		GRID_SIZE = gridSize,
+		CELL_SIZE = 1 / gridSize,
+		GRID_PROBABILITIES = uniform,
+		LOCKDOWN_STOP = frames,
+		**travel,
+		**scenario['interventions']
+	)
+	return params
+
+def runScenario(scenario, frames, warmup, traceMemory, tracePath):
+	'''Run a scenario in the current process, after some untimed warmup runs, and measure it'''
+
+	# The warmup runs import the modules and fill the caches of the process, and are not measured
+	for _ in range(warmup):
+		simulation = Simulation.create(createParams(scenario, frames), 1)
+		for _ in simulation.run(metricsOnly = True):
+			pass
+		if hasattr(simulation, 'close'):
+			simulation.close()
+
+	params = createParams(scenario, frames)
+	simulation = Simulation.create(params, 1)
+	simulation.profiler = Profiler(trace = tracePath is not None)
+	if traceMemory:
+		tracemalloc.start()
+
+	# Time the first frame and the other frames separately
+	startTime = perf_counter()
+	frame = simulation.start()
+	setupTime = perf_counter() - startTime
+	startTime = perf_counter()
+	for _ in simulation.resume(frame, metricsOnly = True):
+		pass
+	runTime = perf_counter() - startTime
+	if hasattr(simulation, 'close'):
+		simulation.close()
+	if tracePath is not None:
+		simulation.profiler.exportTrace(tracePath)
+
+	tracemallocPeak = None
+	if traceMemory:
+		tracemallocPeak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+
+	# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+	peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform != 'darwin':
+		peakRss *= 1024
+
+	result = dict(scenario)
+	result.update({
+		'frames': simulation.frameCount,
+		'setupTime': setupTime,
+		'runTime': runTime,
+		'framesPerSecond': simulation.frameCount / runTime,
+		'agentFramesPerSecond': simulation.frameCount * params.POPULATION_SIZE / runTime,
+		'phases': {phase: statistics['time'] for phase, statistics in simulation.profiler.phases.items()},
+		'work': {
+			phase: {name: value for name, value in statistics.items() if name != 'time'}
+			for phase, statistics in simulation.profiler.phases.items()
+		},
+		'peakRss': peakRss,
+		'tracemallocPeak': tracemallocPeak,
+		'skipped': False
+	})
+	return result
+
+def combineRepeats(repeats):
+	'''Combine the results of the repeats of a scenario into the fastest repeat and the spread of the repeats'''
+
+	# The fastest repeat is the one which is the least slowed down by the rest of the machine
+	framesPerSecondRuns = [repeat['framesPerSecond'] for repeat in repeats]
+	result = dict(max(repeats, key = lambda repeat: repeat['framesPerSecond']))
+	result.update({
+		'framesPerSecondRuns': framesPerSecondRuns,
+		'spread': (max(framesPerSecondRuns) - min(framesPerSecondRuns)) / result['framesPerSecond'],
+		'peakRss': max(repeat['peakRss'] for repeat in repeats)
+	})
+	return result
+
+def compareResults(baseline, results, threshold):
+	'''Compare the fastest results with a baseline, and find the scenarios which are slower
+	than both the threshold and the spread of the repeats of either run'''
+
+	baselineScenarios = {
+		(scenario['name'], scenario['engine']): scenario
+		for scenario in baseline['scenarios'] if not scenario['skipped']
+	}
+	comparison = []
+	for scenario in results['scenarios']:
+		key = (scenario['name'], scenario['engine'])
+		if scenario['skipped'] or key not in baselineScenarios:
+			continue
+		old = baselineScenarios[key]
+		speedup = scenario['framesPerSecond'] / old['framesPerSecond']
+
+		# Baselines from before the repeats have no spread
+		noise = max(scenario.get('spread', 0), old.get('spread', 0))
+		comparison.append({
+			'name': scenario['name'],
+			'engine': scenario['engine'],
+			'speedup': speedup,
+			'noise': noise,
+			'phaseSpeedups': {
+				phase: old['phases'][phase] / time
+				for phase, time in scenario['phases'].items()
+				if time > 0 and old['phases'].get(phase, 0) > 0
+			},
+			'peakRssRatio': scenario['peakRss'] / old['peakRss'],
+			'regression': 1 - speedup > max(threshold, noise)
+		})
+	return comparison
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description = 'Benchmark the simulation engines on standard scenarios')
+	parser.add_argument('--preset', choices = list(presets), default = 'quick')
+	parser.add_argument('--engines', nargs = '+', choices = ['object', 'array', 'distributed'], default = ['object', 'array'])
+	parser.add_argument('--frames', type = int, help = 'The number of frames, instead of that of the preset')
+	parser.add_argument('--warmup', type = int, default = 1, help = 'The number of untimed runs of each scenario before each repeat is timed')
+	parser.add_argument('--repeats', type = int, default = 3, help = 'The number of timed runs of each scenario, of which the fastest is reported')
+	parser.add_argument('--only', help = 'Only run the scenarios whose name contains this text')
+	parser.add_argument('--tracemalloc', action = 'store_true', help = 'Also measure the peak traced memory, which is slower')
+	parser.add_argument('--trace', help = 'A directory in which the Chrome trace of each scenario is saved')
+	parser.add_argument('--output', default = 'benchmark.json', help = 'The file in which the results are saved')
+	parser.add_argument('--compare', help = 'A results file to compare with')
+	parser.add_argument('--threshold', type = float, default = 0.1, help = 'The slowdown which is a regression')
+	arguments = parser.parse_args()
+	if arguments.repeats < 1:
+		parser.error('--repeats must be at least 1')
+
+	preset = presets[arguments.preset]
+	frames = arguments.frames or preset['frames']
+	results = {
+		'version': 2,
+		'preset': arguments.preset,
+		'warmup': arguments.warmup,
+		'repeats': arguments.repeats,
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'processor': platform.processor(),
+		'scenarios': []
+	}
+
+	scenarios = []
+	for scenario in createScenarios(preset, arguments.engines):
+		if arguments.only and arguments.only not in scenario['name']:
+			continue
+		if scenario['engine'] == 'object' and scenario['populationSize'] > objectEngineMaxPopulation:
+			results['scenarios'].append(dict(scenario, skipped = True))
+			continue
+		scenarios.append(scenario)
+
+	# Run each repeat of each scenario in a new process, so that its peak memory is its own.
+	# Every scenario is run once before any is repeated, so that the spread of the repeats
+	# includes how the speed of the machine changes during the whole benchmark
+	repeats = {index: [] for index in range(len(scenarios))}
+	for repeat in range(arguments.repeats):
+		for index, scenario in enumerate(scenarios):
+			tracePath = None
+			if arguments.trace and repeat == 0:
+				tracePath = f'{arguments.trace}/{scenario["engine"]}-{scenario["name"]}.json'
+			with ProcessPoolExecutor(max_workers = 1) as executor:
+				repeats[index].append(executor.submit(
+					runScenario, scenario, frames, arguments.warmup, arguments.tracemalloc, tracePath
+				).result())
+
+	for index in range(len(scenarios)):
+		result = combineRepeats(repeats[index])
+		results['scenarios'].append(result)
+		print(
+			f'{result["engine"]:11} {result["name"]:32} {result["framesPerSecond"]:10.2f} frames/s '
+			f'{result["agentFramesPerSecond"]:14.0f} agent frames/s {result["spread"]:7.1%} spread '
+			f'{result["peakRss"] / 2 ** 20:8.1f} MiB'
+		)
+
+	# Compare with the baseline
+	regressions = []
+	if arguments.compare:
+		with open(arguments.compare) as baselineFile:
+			results['comparison'] = compareResults(json.load(baselineFile), results, arguments.threshold)
+		for comparison in results['comparison']:
+			print(
+				f'{comparison["engine"]:11} {comparison["name"]:32} {comparison["speedup"]:6.2f}x '
+				f'{comparison["noise"]:7.1%} noise'
+				+ (' REGRESSION' if comparison['regression'] else '')
+			)
+		regressions = [comparison for comparison in results['comparison'] if comparison['regression']]
+
+	with open(arguments.output, 'w') as outputFile:
+		json.dump(results, outputFile, indent = 2)
+
+	sys.exit(1 if regressions else 0)
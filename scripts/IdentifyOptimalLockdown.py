@@ -4,8 +4,10 @@ from sys import path
 path.insert(1, '../client_code/Simulation')
 
 # Import files
-from Simulation import Simulation
 from Params import Params
+from ReplicateController import ReplicateController
+from ScenarioTree import ScenarioTree
+from StopCondition import StopCondition
 from Utils import Utils
 from Person import Person
 
@@ -15,55 +17,73 @@ peakInfectedDay = 74
 startDays = [-20, -15, -10, -5, 0]
 lockdownLengths = [15, 30, 45, 60, 75]
 simulationLength = 200
+confidenceWidth = 50
+budget = 125
 finalData = [[0 for _ in startDays] for _ in lockdownLengths]
 
-# Calculate all values
-for i, daysFromPeak in enumerate(startDays):
-	for j, lockdownLength in enumerate(lockdownLengths):
-		# Parameters for running the simulation
-		lockdownStart = peakInfectedDay + daysFromPeak
-		lockdownStop = lockdownStart + lockdownLength
+def findPeakInfection(series):
+	'''Find the peak infection of a run until infections fall to 75% of the peak'''
 
-		# Take average of 5 runs
-		finalValue = 0
-		runs = 5
-		for _ in range(runs):
-			params = Params(
+	peakInfection = 0
+	for infectedCount, framePeakInfection in zip(series[Person.INFECTED.name], series['peakInfection']):
+		if (peakInfection * 0.75 > infectedCount and 
+			peakInfection >= 50):
+			break
+		peakInfection = framePeakInfection
+
+	return {'peakInfection': peakInfection}
+
+if __name__ == '__main__':
+	startTime = time()
+	scenarios = []
+	indices = []
+	for i, daysFromPeak in enumerate(startDays):
+		for j, lockdownLength in enumerate(lockdownLengths):
+			# Parameters for running the simulation
+			lockdownStart = peakInfectedDay + daysFromPeak
+			lockdownStop = lockdownStart + lockdownLength
+			scenarios.append(Params(
 				LOCKDOWN_ENABLED = True,
 				LOCKDOWN_START = lockdownStart,
 				LOCKDOWN_STOP = lockdownStop,
 				SIMULATION_LENGTH = simulationLength
-			)
-			simulation = Simulation(params)
-			startTime = time()
-			
-			# Run simulation
-			peakInfection = 0
-			frames = list(simulation.run())
-			for frame in frames:
-				if (peakInfection * 0.75 > len(frame.stateGroups[Person.INFECTED.id]) and 
-					peakInfection >= 50):
-					break
-				peakInfection = frame.peakInfection
+			))
+			indices.append((i, j))
 
-			print(lockdownStart, lockdownStop, peakInfection)
-			# Utils.drawFramesMatplotlib(frames, params)
-			finalValue += peakInfection
-			print(f'Time taken: {time() - startTime:.2f}s')
+	# Take the average of runs until the 95% confidence interval of each scenario
+	# is narrower than the confidence width, or the budget of runs is spent
+	# The scenarios of each run share the frames before their lockdowns differ
+	# Each run stops once infections fall to 75% of the peak, because the later frames are not used
+	tree = ScenarioTree(
+		scenarios,
+		0,
+		outcome = findPeakInfection,
+		stopConditions = [StopCondition.postPeakDecline(0.75, 50)]
+	)
+	report = ReplicateController(tree, 'peakInfection', confidenceWidth, budget = budget).run()
 
-		# Calculate final value 
-		finalValue = int(round(finalValue / runs))
-		print(finalValue)
+	# Calculate all values
+	for (i, j), ensemble, precision in zip(indices, tree.ensembles, report):
+		finalValue = int(round(precision['mean']))
+		print(
+			ensemble.params.LOCKDOWN_START,
+			ensemble.params.LOCKDOWN_STOP,
+			finalValue,
+			f'[{precision["low"]:.1f}, {precision["high"]:.1f}]',
+			precision['replicates']
+		)
 		finalData[i][j] = finalValue
 
-# Write data to csv file
-with open('output.csv', 'w') as outputFile:
-	# Write one row with start days
-	outputFile.write(',' + ','.join(map(str, startDays)) + '\n')
+	print(f'Time taken: {time() - startTime:.2f}s')
+
+	# Write data to csv file
+	with open('output.csv', 'w') as outputFile:
+		# Write one row with start days
+		outputFile.write(',' + ','.join(map(str, startDays)) + '\n')
 
-	# Write other lines
-	for i, row in enumerate(finalData):
-		outputFile.write(str(lockdownLengths[i]) + ',' + ','.join(map(str, row)) + '\n')
+		# Write other lines
+		for i, row in enumerate(finalData):
+			outputFile.write(str(lockdownLengths[i]) + ',' + ','.join(map(str, row)) + '\n')
 
-# Visualize the data
-exec(open('VisualizeLockdownHeatmap.py').read())
+	# Visualize the data
+	exec(open('VisualizeLockdownHeatmap.py').read())
@@ -0,0 +1,47 @@
+# Edit path to import files
+from time import time
+from sys import path
+path.insert(1, '../client_code/Simulation')
+
+# Import files
+from Optimizer import Optimizer
+from Params import Params
+from Person import Person
+
+# Set initial variables
+simulationLength = 200
+evaluations = 40
+replicates = 2
+
+# The intervention cost which is worth one less infected person at the peak
+costPerInfection = 100000
+
+def findObjective(series):
+	'''Find the objective of a run, combining its peak infection and its total intervention cost'''
+
+	return max(series[Person.INFECTED.name]) + series['interventionCost'][-1] / costPerInfection
+
+if __name__ == '__main__':
+	startTime = time()
+
+	# Search the start and stop of a block lockdown
+	params = Params(
+		LOCKDOWN_ENABLED = True,
+		SIMULATION_LENGTH = simulationLength
+	)
+	optimizer = Optimizer(
+		params,
+		{
+			'LOCKDOWN_START': (20, 120),
+			'LOCKDOWN_STOP': (40, 200)
+		},
+		findObjective,
+		replicates = replicates
+	)
+	parameters, value = optimizer.run(evaluations)
+
+	# Print every candidate and the best one
+	for point, candidateValue in zip(optimizer.points, optimizer.values):
+		print(optimizer.findParameters(point), round(candidateValue, 1))
+	print(f'Best: {parameters}, expected objective {value:.1f}')
+	print(f'Time taken: {time() - startTime:.2f}s')